@@ -0,0 +1,268 @@
+import struct  # Import struct for the server busy message
+import threading  # Import threading for the lock of the connection count
+from typing import Dict, List, NamedTuple, Optional  # Import type hints for better code readability
+from metrics import METRICS, SHED_LOAD  # Import the metrics which count the rejected connections and requests
+from log import LOG  # Import the logger, records are written by a background thread
+
+DEFAULT_BACKLOG = 128  # Connections the kernel queues until they are accepted
+DEFAULT_MAX_CONNECTIONS = 4096  # Open client connections per process, a thread each with the threaded engine
+
+# Reasons of a server busy message (0x1E)
+TOO_MANY_CONNECTIONS = 0x01
+TOO_MANY_PLAYERS = 0x02
+RATE_LIMITED = 0x03
+
+BUSY = struct.Struct('>BBI')  # 0x1E, reason, milliseconds until a retry may succeed
+RETRY_AFTER = 1.0  # Seconds a rejected connection or authorization should wait before it tries again
+
+
+class Rate(NamedTuple):
+    """
+    A token bucket: requests are admitted at `per_second` on average and up to `burst` at once.
+    """
+    per_second: float
+    burst: float
+
+
+# The requests limited together, by control byte. Other control bytes are not limited.
+REQUEST_CLASSES = {
+    'auth': (0x02,),
+    'lobby': (0x05, 0x14, 0x16, 0x1F, 0x21),
+    'match': (0x07, 0x18, 0x1A),
+    'play': (0x0B, 0x0E, 0x11),
+    'watch': (0x1B, 0x1D),
+}
+CLASS_NAMES = tuple(REQUEST_CLASSES)
+
+
+def _class_table() -> tuple:
+    table: List[Optional[int]] = [None] * 256
+    for index, name in enumerate(CLASS_NAMES):
+        for control_byte in REQUEST_CLASSES[name]:
+            table[control_byte] = index
+    return tuple(table)
+
+
+CLASS_OF = _class_table()  # Control byte -> index into CLASS_NAMES, None if not limited
+
+DEFAULT_RATES = {
+    'auth': Rate(2, 5),
+    'lobby': Rate(50, 100),
+    'match': Rate(20, 40),
+    'play': Rate(200, 400),
+    'watch': Rate(20, 40),
+}
+
+
+class Limits(NamedTuple):
+    """
+    The admission control of the server, 0 disables a limit.
+
+    Attributes:
+        backlog (int): The listen backlog, connections the kernel queues until they are accepted.
+        max_connections (int): Open client connections, further ones get 0x1E and are closed.
+        max_players (int): Authorized clients, further authorizations get 0x1E and are closed.
+        rates (Dict[str, Rate]): The request rate of one connection per request class, see REQUEST_CLASSES.
+    """
+    backlog: int = DEFAULT_BACKLOG
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_players: int = 0
+    rates: Dict[str, Rate] = DEFAULT_RATES
+
+
+def parse_rates(text: str) -> Dict[str, Rate]:
+    """
+    Parses the request rates, classes which are not given keep their default.
+
+    Args:
+        text (str): e.g. 'lobby=10/20,play=0', requests per second and burst, 0 for no limit.
+            Without a burst the burst is twice the rate, at least 1. A limited class needs a burst of at
+            least 1, a request takes a whole token.
+
+    Returns:
+        Dict[str, Rate]: The rate per request class, classes without a limit are left out.
+
+    Raises:
+        ValueError: If a class is unknown, a rate is negative or the burst of a limited class is below 1.
+    """
+    rates = dict(DEFAULT_RATES)
+    for item in filter(None, text.split(',')):
+        name, _, value = item.partition('=')
+        if name not in REQUEST_CLASSES:
+            raise ValueError(f"Unknown request class '{name}', one of {', '.join(CLASS_NAMES)}")
+        per_second, _, burst = value.partition('/')
+        rate = Rate(float(per_second), float(burst) if burst else max(2 * float(per_second), 1.0))
+        if rate.per_second < 0 or rate.burst < 0:
+            raise ValueError(f"The rate of '{name}' must not be negative")
+        if rate.per_second and rate.burst < 1:
+            raise ValueError(f"The burst of '{name}' must be at least 1, every request takes a whole token")
+        if rate.per_second:
+            rates[name] = rate
+        else:
+            rates.pop(name, None)
+    return rates
+
+
+def busy_message(reason: int, retry_after: float) -> bytes:
+    """
+    Encodes a 0x1E server busy message.
+
+    Args:
+        reason (int): TOO_MANY_CONNECTIONS, TOO_MANY_PLAYERS or RATE_LIMITED.
+        retry_after (float): Seconds until a retry may succeed.
+
+    Returns:
+        bytes: e.g. b'\\x1E\\x03\\x00\\x00\\x00\\x14' rate limited, retry after 20 ms.
+    """
+    return BUSY.pack(0x1E, reason, min(int(retry_after * 1000) + 1, 0xFFFFFFFF))
+
+
+class TokenBucket:
+    """
+    The tokens of one request class of one connection.
+
+    The bucket is refilled lazily from the time of the request, so an idle connection costs nothing.
+    """
+    __slots__ = ('rate', 'tokens', 'updated')
+
+    def __init__(self, rate: Rate, now: float):
+        self.rate = rate
+        self.tokens = rate.burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token for a request.
+
+        Args:
+            now (float): The time of the request (time.monotonic()).
+
+        Returns:
+            float: 0 if the request is admitted, otherwise the seconds until the next token.
+        """
+        rate = self.rate
+        tokens = min(rate.burst, self.tokens + (now - self.updated) * rate.per_second)
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = tokens - 1
+            return 0.0
+        self.tokens = tokens
+        return (1 - tokens) / rate.per_second
+
+
+class RequestLimiter:
+    """
+    The token buckets of one connection, a bucket is created with the first request of its class.
+
+    Only the thread (or the event loop) reading the connection uses it, so it needs no lock.
+    """
+    __slots__ = ('_rates', '_buckets')
+
+    def __init__(self, rates: tuple):
+        self._rates = rates  # Optional[Rate] per request class
+        self._buckets: List[Optional[TokenBucket]] = [None] * len(rates)
+
+    def check(self, control_byte: int, now: float) -> float:
+        """
+        Admits a request or tells when a request of its class will be admitted again.
+
+        Args:
+            control_byte (int): The control byte of the request.
+            now (float): The time of the request (time.monotonic()).
+
+        Returns:
+            float: 0 if the request is admitted, otherwise the seconds until a retry may succeed.
+        """
+        index = CLASS_OF[control_byte]
+        if index is None:
+            return 0.0
+        bucket = self._buckets[index]
+        if bucket is None:
+            rate = self._rates[index]
+            if rate is None:
+                return 0.0
+            bucket = self._buckets[index] = TokenBucket(rate, now)
+        return bucket.take(now)
+
+
+class Admission:
+    """
+    Decides which connections, authorizations and requests the server takes on.
+
+    Overload is answered on the protocol level with 0x1E instead of queuing work without bound:
+    a connection beyond the limit is closed before a thread or handler is created for it, and a
+    request beyond the rate of its class is dropped. Every rejection is counted by reason in SHED_LOAD.
+
+    Attributes:
+        limits (Limits): The configured limits.
+        connections (int): The open client connections.
+    """
+
+    def __init__(self, limits: Limits):
+        """
+        Initializes the admission control.
+
+        Args:
+            limits (Limits): The limits.
+        """
+        self.limits = limits
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._rates = tuple(limits.rates.get(name) for name in CLASS_NAMES)
+
+    def admit_connection(self) -> bool:
+        """
+        Counts a new connection unless the server has too many, release it with `release_connection`.
+
+        Returns:
+            bool: False if the connection has to be turned away.
+        """
+        with self._lock:
+            if self.limits.max_connections and self.connections >= self.limits.max_connections:
+                return False
+            self.connections += 1
+            return True
+
+    def release_connection(self):
+        with self._lock:
+            self.connections -= 1
+
+    def admit_player(self, players: int) -> bool:
+        """
+        Checks whether one more client may authorize.
+
+        Args:
+            players (int): The number of authorized clients.
+        """
+        return not self.limits.max_players or players < self.limits.max_players
+
+    def limiter(self) -> Optional[RequestLimiter]:
+        """
+        Returns the request limiter of a new connection, None if no request class is limited.
+        """
+        return RequestLimiter(self._rates) if any(self._rates) else None
+
+    def shed(self, reason: str):
+        """
+        Counts a rejected connection, authorization or request.
+
+        Args:
+            reason (str): e.g. 'connections', 'players', 'rate_lobby'.
+        """
+        METRICS.count(SHED_LOAD, reason)
+
+    def turn_away(self, client_address) -> bytes:
+        """
+        Counts a connection beyond the limit, which is closed right after the returned message.
+
+        The message is not framed, the client didn't select a protocol yet.
+
+        Args:
+            client_address: The address of the client.
+
+        Returns:
+            bytes: The 0x1E message for the client.
+        """
+        self.shed('connections')
+        LOG.warning('connection', "Turned away %s, %d connections are open.", client_address, self.connections)
+        return busy_message(TOO_MANY_CONNECTIONS, RETRY_AFTER)
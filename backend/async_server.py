@@ -0,0 +1,141 @@
+import asyncio  # Import asyncio for the event loop based connection engine
+import socket  # Import the socket module for type hints
+from typing import Optional  # Import type hints for better code readability
+from client_handler import ClientHandler  # Import the ClientHandler class which implements the protocol
+from connection import TransportConnection  # Import the connection wrapper for asyncio transports
+from log import LOG  # Import the logger, records are written by a background thread
+
+try:
+    import resource  # Unix only, used to raise the open file limit
+except ImportError:  # pragma: no cover - e.g. Windows
+    resource = None
+
+
+class ClientProtocol(asyncio.Protocol):
+    """
+    asyncio protocol driving one ClientHandler per connection.
+
+    Instead of a thread blocked in `recv`, every connection costs one protocol object, one transport
+    and one ClientHandler, which keeps the memory flat with thousands of idle clients.
+
+    Attributes:
+        server: The server instance that manages all clients and games.
+        handler (ClientHandler): The handler of the connected client.
+    """
+    __slots__ = ('server', 'handler')
+
+    def __init__(self, server):
+        """
+        Initializes a new ClientProtocol instance.
+
+        Args:
+            server: The server instance that manages all clients and games.
+        """
+        self.server = server
+        self.handler: Optional[ClientHandler] = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        """
+        Called by the loop when a client connects, sends the welcome message.
+
+        Args:
+            transport (asyncio.Transport): The transport of the connected client.
+        """
+        client_address = transport.get_extra_info('peername') or self.server.HOST  # Unix sockets have no peer name
+        if not self.server.admission.admit_connection():  # No handler for connections beyond the limit
+            transport.write(self.server.admission.turn_away(client_address))
+            transport.close()
+            return
+        LOG.info('connection', "Accepted connection from %s", client_address)
+        connection = TransportConnection(transport, self.server.max_queued_bytes, self.server.overflow_policy)
+        self.handler = ClientHandler(connection, client_address, self.server)
+        try:
+            self.handler.on_connect()
+        except Exception as e:
+            LOG.error('connection', "Error handling client %s: %s", client_address, e)
+            transport.close()
+
+    def data_received(self, data: bytes):
+        """
+        Called by the loop whenever data from the client arrives.
+
+        Args:
+            data (bytes): The received data.
+        """
+        try:
+            self.handler.handle_data(data)
+        except Exception as e:
+            LOG.error('connection', "Error handling client %s: %s", self.handler.client_address, e)
+            self.handler.client_socket.close()
+
+    def connection_lost(self, exc: Optional[Exception]):
+        """
+        Called by the loop when the connection is closed by either side.
+
+        Args:
+            exc (Optional[Exception]): The error which closed the connection, None on a regular EOF.
+        """
+        if self.handler is None:  # Turned away
+            return
+        if exc is not None:
+            LOG.error('connection', "Error handling client %s: %s", self.handler.client_address, exc)
+        try:
+            self.handler.on_disconnect()
+        finally:
+            self.server.admission.release_connection()
+
+
+def raise_open_file_limit():
+    """
+    Raises the soft limit of open file descriptors to the hard limit.
+
+    Every connection is a file descriptor, the common default soft limit of 1024 would stop the
+    event loop engine long before memory does.
+    """
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            return
+        LOG.info('server', "Raised open file limit from %d to %d", soft, hard)
+
+
+async def serve(server, server_socket: socket.socket):
+    """
+    Serves the clients accepted on the listening socket until the loop is stopped.
+
+    Args:
+        server: The server instance that manages all clients and games.
+        server_socket (socket.socket): The already bound and listening socket (TCP or Unix).
+    """
+    loop = asyncio.get_running_loop()
+    server.timers.dispatch = loop.call_soon_threadsafe  # The timeouts use the transports, so they run on the loop
+    if server.cluster is not None:
+        server.cluster.dispatch = loop.call_soon_threadsafe  # So do the messages of the other worker processes
+        server.cluster.start()
+
+    if server_socket.family == socket.AF_UNIX:
+        aio_server = await loop.create_unix_server(lambda: ClientProtocol(server), sock=server_socket,
+                                                   backlog=server.admission.limits.backlog)
+    else:
+        aio_server = await loop.create_server(lambda: ClientProtocol(server), sock=server_socket,
+                                              backlog=server.admission.limits.backlog)
+
+    async with aio_server:
+        await aio_server.serve_forever()
+
+
+def run_event_loop(server, server_socket: socket.socket):
+    """
+    Runs the asyncio connection engine in the calling thread.
+
+    Args:
+        server: The server instance that manages all clients and games.
+        server_socket (socket.socket): The already bound and listening socket (TCP or Unix).
+    """
+    raise_open_file_limit()
+    LOG.info('server', "Using the asyncio connection engine")
+    asyncio.run(serve(server, server_socket))
@@ -0,0 +1,278 @@
+import itertools  # Import itertools for the connection numbers
+import os  # Import os for the default capture file and its permissions
+import struct  # Import struct for the binary layout of the capture file
+import tempfile  # Import tempfile for the directory of the default capture file
+import threading  # Import threading for the writer thread
+import time  # Import time for the start of a capture
+from collections import deque  # Import deque for the lock-free hand-off to the writer
+from typing import BinaryIO, Deque, Iterator, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from log import LOG  # Import the logger, records are written by a background thread
+
+# A capture file is a header followed by records, both big endian:
+# header: magic, Unix time the capture started
+# record: kind, connection number, seconds since the start, length of the data, the data
+MAGIC = b'GGCAP1'
+FILE_HEADER = struct.Struct('>6sd')
+RECORD_HEADER = struct.Struct('>BIdI')
+
+# Kinds of a record
+OPEN = 0x01  # A client connected, no data
+DATA = 0x02  # Bytes read from the client, exactly as one read returned them
+PLAYER = 0x03  # The client was authorized, the data is its 4-byte player ID
+CLOSE = 0x04  # The connection was closed, no data
+
+KIND_NAMES = {OPEN: 'open', DATA: 'data', PLAYER: 'player', CLOSE: 'close'}
+PLAYER_ID = struct.Struct('>I')
+
+MAX_PENDING = 65536  # Records waiting for the writer, further records are dropped
+FLUSH_INTERVAL = 0.05  # Seconds between two writes of the writer thread
+WRITE_BUFFER = 1 << 20  # Bytes buffered by the capture file
+FILE_MODE = 0o600  # The captures contain the passwords of the clients, only the server's user may read them
+
+Pending = Tuple[int, int, float, bytes]  # (kind, connection number, time.monotonic(), data)
+
+
+class CaptureRecord(NamedTuple):
+    """
+    One record of a capture file.
+
+    Attributes:
+        kind (int): OPEN, DATA, PLAYER or CLOSE.
+        connection (int): The number of the connection within the capture.
+        offset (float): Seconds since the capture started.
+        data (bytes): The read bytes (DATA), the player ID (PLAYER), empty otherwise.
+    """
+    kind: int
+    connection: int
+    offset: float
+    data: bytes
+
+
+class TrafficCapture:
+    """
+    Records what the clients send, so a period of real traffic can be replayed against a server.
+
+    Every connection opened while the capture runs gets a number, its reads are recorded with the
+    time they were read, together with the opening, the authorization (the player ID the server
+    handed out, so a replay can map the IDs within the requests) and the closing of the
+    connection. Connections opened before the start are not recorded.
+
+    Like the logger, the handler threads (or the event loop) only append a tuple to a deque; a
+    writer thread packs the records and writes them to the file. The times are those the handler
+    already took, so recording costs no extra clock call. If the writer falls behind by more than
+    MAX_PENDING records, further records are dropped and counted, a replay of such a capture is
+    not exact.
+
+    Attributes:
+        path (Optional[str]): The file of the current or last capture.
+        records (int): The records written by the current or last capture.
+        dropped (int): The records dropped because the writer fell behind.
+    """
+
+    def __init__(self):
+        """
+        Initializes a stopped capture.
+        """
+        self.path: Optional[str] = None
+        self.records = 0
+        self.dropped = 0
+        self._file: Optional[BinaryIO] = None
+        self._started = 0.0  # time.monotonic() at the start
+        self._pending: Deque[Pending] = deque()  # append and popleft are atomic, no lock needed
+        self._connections = itertools.count(1)  # next() is atomic, no lock needed
+        self._lock = threading.Lock()  # Guards starting and stopping
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        """
+        bool: Whether the capture records.
+        """
+        return self._file is not None
+
+    def start(self, path: Optional[str] = None) -> bool:
+        """
+        Starts recording to a new file.
+
+        Args:
+            path (Optional[str]): The capture file, overwritten if it exists, a new file in the temporary directory if None.
+                A new file is readable by the server's user only.
+
+        Returns:
+            bool: False if the capture was already running.
+
+        Raises:
+            OSError: If the file can't be created.
+        """
+        with self._lock:
+            if self._file is not None:
+                return False
+            self.path = path or os.path.join(tempfile.gettempdir(), f'guess_game-{int(time.time())}.cap')
+            descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+            capture_file = os.fdopen(descriptor, 'wb', buffering=WRITE_BUFFER)
+            capture_file.write(FILE_HEADER.pack(MAGIC, time.time()))
+            self.records = 0
+            self.dropped = 0
+            self._pending.clear()
+            self._started = time.monotonic()
+            self._stop.clear()
+            self._file = capture_file
+            self._thread = threading.Thread(target=self._run, args=(capture_file,), name='traffic-capture', daemon=True)
+            self._thread.start()
+        LOG.info('server', "Capturing the client traffic to %s", self.path)
+        return True
+
+    def stop(self) -> bool:
+        """
+        Stops recording, the pending records are written and the file is closed.
+
+        Returns:
+            bool: False if the capture was not running.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return False
+            capture_file = self._file
+            self._file = None  # No new records from here on
+            self._thread = None
+        self._stop.set()
+        thread.join()
+        # Drained after the writer is gone, so the records put while it wrote its last batch are in the file too
+        self._write_pending(capture_file)
+        capture_file.close()
+        if self.dropped:
+            LOG.warning('server', "Capture %s is incomplete, %d records were dropped.", self.path, self.dropped)
+        LOG.info('server', "Capture stopped after %d records", self.records)
+        return True
+
+    def open(self, now: float) -> Optional[int]:
+        """
+        Records a new connection.
+
+        Args:
+            now (float): When the client connected (time.monotonic()).
+
+        Returns:
+            Optional[int]: The number of the connection, pass it to `record`. None if the capture is stopped.
+        """
+        if self._file is None:
+            return None
+        connection = next(self._connections)
+        self._put((OPEN, connection, now, b''))
+        return connection
+
+    def record(self, kind: int, connection: int, data: bytes, now: float):
+        """
+        Records a read, an authorization or the closing of a connection.
+
+        Args:
+            kind (int): DATA, PLAYER or CLOSE.
+            connection (int): The number returned by `open`.
+            data (bytes): The data of the record.
+            now (float): When it happened (time.monotonic()).
+        """
+        if self._file is not None:
+            self._put((kind, connection, now, data))
+
+    def _put(self, record: Pending):
+        if len(self._pending) >= MAX_PENDING:
+            self.dropped += 1
+            return
+        self._pending.append(record)
+
+    def _run(self, capture_file: BinaryIO):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._write_pending(capture_file)
+
+    def _write_pending(self, capture_file: BinaryIO):
+        """
+        Packs the pending records and writes them with one write.
+        """
+        chunks = []
+        pending = self._pending
+        started = self._started
+        pack = RECORD_HEADER.pack
+        while pending:
+            kind, connection, now, data = pending.popleft()
+            chunks.append(pack(kind, connection, now - started, len(data)))
+            chunks.append(data)
+        if not chunks:
+            return
+        try:
+            capture_file.write(b''.join(chunks))
+            capture_file.flush()
+        except (OSError, ValueError) as e:
+            LOG.error('server', "Writing the capture %s failed: %s", self.path, e)
+            return
+        self.records += len(chunks) // 2
+
+    def status(self) -> dict:
+        """
+        Returns the state of the capture, e.g. {'running': True, 'path': '/tmp/guess_game-1700000000.cap', 'records': 1200, 'dropped': 0}.
+        """
+        return {'running': self.running, 'path': self.path, 'records': self.records, 'dropped': self.dropped}
+
+
+def read_capture(path: str) -> Tuple[float, Iterator[CaptureRecord]]:
+    """
+    Opens a capture file.
+
+    Args:
+        path (str): The capture file.
+
+    Returns:
+        Tuple[float, Iterator[CaptureRecord]]: The Unix time the capture started and its records in
+        the order they were recorded. A record torn by a crash ends the iteration.
+
+    Raises:
+        ValueError: If the file is not a capture.
+    """
+    capture_file = open(path, 'rb')
+    header = capture_file.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header)[0] != MAGIC:
+        capture_file.close()
+        raise ValueError(f"{path} is not a capture file")
+
+    def records() -> Iterator[CaptureRecord]:
+        with capture_file:
+            while True:
+                record_header = capture_file.read(RECORD_HEADER.size)
+                if len(record_header) < RECORD_HEADER.size:
+                    return
+                kind, connection, offset, length = RECORD_HEADER.unpack(record_header)
+                data = capture_file.read(length)
+                if len(data) < length:
+                    return
+                yield CaptureRecord(kind, connection, offset, data)
+
+    return FILE_HEADER.unpack(header)[1], records()
+
+
+def summarize(path: str) -> dict:
+    """
+    Counts the records of a capture file by kind, e.g. for a first look before a replay.
+    """
+    started_at, records = read_capture(path)
+    counts = dict.fromkeys(KIND_NAMES.values(), 0)
+    data_bytes = 0
+    duration = 0.0
+    for record in records:
+        name = KIND_NAMES.get(record.kind, 'unknown')
+        counts[name] = counts.get(name, 0) + 1
+        if record.kind == DATA:
+            data_bytes += len(record.data)
+        duration = record.offset
+    return {'started_at': started_at, 'duration': round(duration, 3), 'records': counts, 'data_bytes': data_bytes}
+
+
+if __name__ == "__main__":
+    import argparse  # Import the argparse module for command-line argument handling
+    parser = argparse.ArgumentParser(description='Summarizes a capture of the client traffic, replay it with python3 -m loadgen.replay')
+    parser.add_argument('path', help='the capture file')
+    summary = summarize(parser.parse_args().path)
+    print(f"Started at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['started_at']))}, "
+          f"{summary['duration']:g} s, {summary['data_bytes']} bytes read")
+    for name, count in summary['records'].items():
+        print(f"  {name:<8}{count:>10}")
@@ -1,26 +1,53 @@
-import socket
-from typing import Tuple, Dict
-
-# For better readability and understanding, i've kept the string messages and control bytes directly in the code,
-# instead of replacing them with variables
+import time
+from typing import Callable, Tuple, Dict, Optional
+from connection import Connection
+from game_registry import GameKey
+from framing import FrameDecoder, PROTOCOL_VERSION_FRAMED, PROTOCOL_VERSION_UNFRAMED, SUPPORTED_VERSIONS
+from metrics import METRICS, OPCODE_LABELS, REQUESTS, REQUEST_ERRORS, REQUEST_DURATION, RECEIVED_BYTES
+from metrics import CONNECTIONS_OPENED, CONNECTIONS_CLOSED
+from log import LOG
+from lobby import DEFAULT_PAGE_SIZE, IDLE_PLAYERS, MAX_PAGE_SIZE, PAGE_REQUEST
+from matchmaking import GUESSER, SETTER, Match
+from dictionary import auto_hint, normalize
+from timers import Timer
+from capture import DATA as CAPTURE_DATA, PLAYER as CAPTURE_PLAYER, CLOSE as CAPTURE_CLOSE
+from player_stats import BY_WINS, BY_WIN_RATE, DEFAULT_TOP, MAX_TOP
+from admission import RequestLimiter, CLASS_NAMES, CLASS_OF, RATE_LIMITED, TOO_MANY_PLAYERS, RETRY_AFTER, busy_message
+from codec import GAME_KEY, PLAYER_ID, read_id, read_text, to_bytes, dispatch_table
+from codec import encode_client_id, encode_opponents, encode_lobby_page, encode_guess_results, encode_player_stats, encode_leaderboard
+from codec import WELCOME, WRONG_PASSWORD, MATCH_CONFIRMED, OPPONENT_BUSY, OPPONENT_UNAVAILABLE, VERSION_IN_EFFECT, NOT_QUEUED
+from codec import SELF_MATCH, UNKNOWN_WORD, FOLLOW_UNAUTHORIZED, QUEUE_UNAUTHORIZED, ALREADY_IN_GAME, ALREADY_QUEUED
+from codec import QUEUE_ROLE_INVALID, WATCH_UNAUTHORIZED, NO_GAME_TO_WATCH, TOO_MANY_WATCHED, NO_MORE_HINTS, NO_GAME_FOR_HINT
+from codec import GAVE_UP, OPPONENT_GAVE_UP, ONLY_GUESSER_GIVES_UP, NO_GAME_TO_GIVE_UP, OPPONENT_LOST_CONNECTION
+from codec import STATS_UNAUTHORIZED, UNKNOWN_ORDER
+
+RECV_BUFFER_SIZE = 65536  # Maximum amount of data read from the client socket at once
+
+# The fixed messages are encoded once in the codec module, the control byte starts each of them
 
 class ClientHandler:
     """
     Handles communication between the server and a connected client.
 
     Attributes:
-        client_socket (socket.socket): The socket object for communication with the client.
+        client_socket (Connection): The connection object for communication with the client.
         client_address (Tuple[str, int]): The client's address and port.
         server: Reference to the server instance that manages all clients and games.
         client_id (int): Unique identifier for the connected client.
+        decoder (Optional[FrameDecoder]): The frame decoder, None until the client selects the framed protocol.
+        connected_at (float): When the client connected (time.monotonic()).
+        last_active (float): When the client sent its last request (time.monotonic()).
+        timer (Optional[Timer]): The timer checking the authorization and idle timeouts.
+        limiter (Optional[RequestLimiter]): The request rates of the client, None if they are not limited.
+        capture_id (Optional[int]): The number of the connection in the traffic capture, None if it isn't recorded.
     """
     
-    def __init__(self, client_socket: socket.socket, client_address: Tuple[str, int], server):
+    def __init__(self, client_socket: Connection, client_address: Tuple[str, int], server):
         """
         Initializes a new ClientHandler instance.
 
         Args:
-            client_socket (socket.socket): The socket object for communication with the client.
+            client_socket (Connection): The connection object for communication with the client.
             client_address (Tuple[str, int]): The client's address and port.
             server: The server instance that manages all clients and games.
         """
@@ -28,6 +55,11 @@ class ClientHandler:
         self.client_address = client_address
         self.server = server
         self.client_id = None
+        self.decoder: Optional[FrameDecoder] = None
+        self.connected_at = self.last_active = time.monotonic()
+        self.timer: Optional[Timer] = None
+        self.limiter: Optional[RequestLimiter] = server.admission.limiter()
+        self.capture_id: Optional[int] = None
 
     def handle(self):
         """
@@ -37,226 +69,605 @@ class ClientHandler:
         if an error occurs or when the connection is closed.
         """
         try:
-            self.client_socket.send(b'\x01Welcome to the server!')  # Send a welcome message to the client
-            print("Welcome message sent to client")
+            self.on_connect()  # Greet the client
 
             while True:  # Infinite loop to handle communication
-                request = self.client_socket.recv(1024)  # Receive data from the client, MAX_SIZE 1024 bytes
+                request = self.client_socket.recv(RECV_BUFFER_SIZE)  # Receive data from the client, MAX_SIZE 64 KiB
                 if not request:  # If no data is received, break the loop
                     break
-                print(f"Received request: {request}")
 
-                # Call handle_request which handle client's request(s)
-                self.handle_request(request)
+                # Call handle_data which handle client's request(s)
+                self.handle_data(request)
 
         except Exception as e:
-            print(f"Error handling client {self.client_address}: {e}")
+            LOG.error('connection', "Error handling client %s: %s", self.client_address, e)
         finally:
-            # Check if the client was part of an active game
-            game_key = [key for key in self.server.games.keys() if self.client_id in key]
-            
-            if game_key:  # If the game is found
-                game = self.server.games[game_key[0]]  # Get the game details
-                opponent_id = game_key[0][0] if game_key[0][1] == self.client_id else game_key[0][1]
+            self.on_disconnect()
 
-                # Set game result to 'connection lost'
-                game['result'] = 'connection lost'
-                
-                # Inform the opponent that they won because their opponent lost connection
-                opponent_message = 'Your opponent lost connection. You win.'.encode('utf-8')
-                if opponent_id in self.server.clients:
-                    self.server.clients[opponent_id].send(b'\x0C' + opponent_message)
+    def on_connect(self):
+        """
+        Sends the welcome message to a freshly connected client.
 
-                # Move the game to completed games
-                if game_key[0] in self.server.completed_games:
-                    self.server.completed_games[game_key[0]].append(game)
-                else:
-                    self.server.completed_games[game_key[0]] = [game]
-                
-                del self.server.games[game_key[0]]  # Remove the game from the active games list
+        Shared by the threaded loop in `handle` and the asyncio engine, which calls it from
+        `connection_made`.
+        """
+        METRICS.count(CONNECTIONS_OPENED)
+        self.capture_id = self.server.capture.open(self.connected_at)
+        self.client_socket.send(WELCOME)  # Send a welcome message to the client
+        LOG.debug('connection', "Welcome message sent to client")
+        self.schedule_expiry()
+
+    def schedule_expiry(self):
+        """
+        Schedules the next check of the authorization and idle timeouts, if any of them is enabled.
+        """
+        timeouts = self.server.timeouts
+        deadlines = []
+        if self.client_id is None and timeouts.auth:
+            deadlines.append(self.connected_at + timeouts.auth)
+        if timeouts.idle:
+            deadlines.append(self.last_active + timeouts.idle)
+        if deadlines:
+            self.timer = self.server.timers.schedule(min(deadlines) - time.monotonic(), self.expire)
+
+    def expire(self):
+        """
+        Disconnects the client if it didn't authorize in time or was idle too long, called by the timer wheel.
+
+        Requests only record their time, so the timer is not moved on every request. Instead it
+        checks when it fires whether the client was really idle and otherwise waits for the new
+        deadline. A client in a game, in the matchmaking queue or watching a game is never idle.
+        """
+        if self.timer is not None and self.timer.cancelled:  # Disconnected meanwhile
+            return
+        timeouts = self.server.timeouts
+        now = time.monotonic()
+        if self.client_id is None and timeouts.auth and now >= self.connected_at + timeouts.auth:
+            self.reap(b'Authorization timed out.')
+            return
+        if timeouts.idle and now >= self.last_active + timeouts.idle:
+            if self.client_id is None or not (self.is_player_in_game(self.client_id)
+                                              or self.server.matchmaker.is_queued(self.client_id)
+                                              or self.server.spectators.is_watching(self.client_id)):
+                self.reap(b'Disconnected after a long time without a request.')
+                return
+            self.last_active = now  # Busy, check again after another idle timeout
+        self.schedule_expiry()
+
+    def reap(self, reason: bytes):
+        """
+        Tells the client why and closes its connection, the reading side notices and cleans up.
+
+        Args:
+            reason (bytes): The message for the client.
+        """
+        LOG.info('connection', "Closing connection with client %s: %s", self.client_address, reason.decode('utf-8'))
+        self.client_socket.send(b'\x0F' + reason)
+        self.client_socket.abort()
 
-                print(f"Game ended due to connection loss of player {self.client_id}.")
+    def handle_data(self, data: bytes):
+        """
+        Handles a chunk of data read from the client socket.
+
+        In the unframed (compatibility) protocol every read is one message. Once the client selected
+        the framed protocol, the read may hold several messages or only a part of one, the decoder
+        pulls out every complete message and they are handled in the order they were sent.
+
+        Args:
+            data (bytes): The raw bytes received from the client.
+
+        Raises:
+            FrameError: If the client sent an invalid frame, the connection has to be closed.
+        """
+        METRICS.count(RECEIVED_BYTES, value=len(data))
+        self.last_active = time.monotonic()  # Checked when the idle timer fires
+        LOG.debug('request', "Received request: %r", data)
+        if self.capture_id is not None:
+            self.server.capture.record(CAPTURE_DATA, self.capture_id, data, self.last_active)
+
+        if self.decoder is not None:  # Framed protocol
+            with self.client_socket.corked():  # The responses to pipelined requests leave in one write
+                for message in self.decoder.feed(data):
+                    self.handle_message(message)
+        elif data.startswith(b'\x12'):  # Protocol version selection, fixed size of 2 bytes
+            self.select_protocol_version(data[1:2])
+            if len(data) > 2 and self.decoder is not None:  # Pipelined frames right behind the selection
+                with self.client_socket.corked():
+                    for message in self.decoder.feed(data[2:]):
+                        self.handle_message(message)
+        else:
+            self.handle_request(data)
+
+    def handle_message(self, message: bytes):
+        """
+        Handles one complete message of the framed protocol.
+
+        Args:
+            message: The message without the frame header, bytes or a view into the read data.
+        """
+        if message[0] == 0x12:  # Already framed, just confirm the version in use
+            self.client_socket.send(VERSION_IN_EFFECT[PROTOCOL_VERSION_FRAMED])
+        else:
+            self.handle_request(message)
+
+    def select_protocol_version(self, version: bytes):
+        """
+        Handles the 0x12 protocol version selection.
+
+        The server answers with 0x13 + the version in effect. When the framed protocol is selected,
+        the answer and every following message in both directions are length-prefixed.
+
+        Args:
+            version (bytes): One byte with the requested version.
+        """
+        requested = version[0] if version else PROTOCOL_VERSION_UNFRAMED
+
+        if requested == PROTOCOL_VERSION_FRAMED:
+            self.decoder = FrameDecoder()
+            self.client_socket.framed = True
+            LOG.debug('connection', "Client %s switched to the framed protocol.", self.client_address)
+        elif requested not in SUPPORTED_VERSIONS:
+            LOG.warning('connection', "Client %s requested unsupported protocol version %d.", self.client_address, requested)
+
+        current = PROTOCOL_VERSION_FRAMED if self.decoder is not None else PROTOCOL_VERSION_UNFRAMED
+        self.client_socket.send(VERSION_IN_EFFECT[current])  # Confirm the version in effect
+
+    def on_disconnect(self):
+        """
+        Cleans up after the client disconnected.
+
+        If the client was part of an active game, the game is finished with the 'connection lost'
+        result and the opponent is informed. The client is then removed from the server's client
+        list and its socket is closed.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+
+        if self.client_id is not None:
+            self.leave_game()  # End the game the client was part of
+            self.server.matchmaker.remove(self.client_id)  # Stop waiting for an opponent
+            self.server.spectators.unwatch(self.client_id)  # Stop watching games
 
             # Remove the client from the clients dictionary
-            if self.client_id in self.server.clients:
-                del self.server.clients[self.client_id]
-            
-            self.client_socket.close()  # Close the client socket
-            print(f"Connection with client {self.client_address} closed.")
+            self.server.unregister_client(self.client_id)
+
+        self.client_socket.close()  # Close the client socket
+        if self.capture_id is not None:
+            self.server.capture.record(CAPTURE_CLOSE, self.capture_id, b'', time.monotonic())
+        METRICS.count(CONNECTIONS_CLOSED)
+        LOG.info('connection', "Connection with client %s closed.", self.client_address)
+
+    def leave_game(self):
+        """
+        Finishes the active game of the client with the 'connection lost' result and informs the opponent.
+        """
+        # Check if the client was part of an active game
+        with self.server.registry.locked_game(self.client_id) as (game_key, game):
+            if game_key:  # If the game is found
+                opponent_id = game_key[0] if game_key[1] == self.client_id else game_key[1]
+
+                # Set game result to 'connection lost' and move the game to completed games
+                self.server.registry.finish(game_key, 'connection lost', self.client_id)
+
+                # Inform the opponent that they won because their opponent lost connection
+                self.server.send_to(opponent_id, OPPONENT_LOST_CONNECTION)
+
+                LOG.info('game', "Game ended due to connection loss of player %d.", self.client_id)
 
-    def handle_request(self, request: bytes):
+    def handle_request(self, request):
         """
         Handles a single request from the client.
-        
-        This method processes various types of requests such as password submission, match requests,
-        guesses, hints, and the give-up command. It manages game state, updates the server's game
-        records, and communicates results back to the clients.
+
+        The control byte selects the handler from the `DISPATCH` table, requests with an unknown
+        control byte are ignored. The handlers decode the request in place, see `codec`.
+
+        Every request is counted and timed per control byte, see `metrics.Metrics`. A request
+        beyond the rate of its class is answered with 0x1E and not handled, see `admission.Admission`.
 
         Args:
-            request (bytes): The binary request data received from the client.
+            request: The binary request data received from the client, bytes or a view into the read data.
         """
+        if self.limiter is not None and request:
+            retry_after = self.limiter.check(request[0], self.last_active)  # The time of the read, no clock call
+            if retry_after:
+                self.server.admission.shed('rate_' + CLASS_NAMES[CLASS_OF[request[0]]])
+                self.client_socket.send(busy_message(RATE_LIMITED, retry_after))
+                LOG.debug('request', "Client %s exceeded the request rate of 0x%02X.", self.client_address, request[0])
+                return
+
+        if self.server.cluster is not None and self.server.cluster.forward(self, request):
+            return  # The game is kept by another worker process, which handles and counts the request
+
+        opcode = OPCODE_LABELS[request[0]] if request else ''
+        started = time.perf_counter()
         try:
-            print(f"Handling request: {request}")
+            handler = DISPATCH[request[0]] if request else None
+            if handler is not None:
+                handler(self, request)
+        except Exception as e:
+            METRICS.count(REQUEST_ERRORS, opcode)
+            LOG.error('request', "Error handling request %r: %s", bytes(request), e)  # Log the error
+        finally:
+            METRICS.count(REQUESTS, opcode)
+            METRICS.observe(REQUEST_DURATION, opcode, time.perf_counter() - started)
 
-            if request.startswith(b'\x02'):  # Check if the data and its first (control byte) starts with 0x02 (password submission)
-                password = request[1:]  # Extract the password
-                print(f"Received password: {password}")
+    def on_password(self, request):
+        """
+        Handles the 0x02 password submission, e.g. b'\x02mysecretpw'.
+        """
+        if request[1:] == self.server.PASSWORD:  # Check if the password is correct
+            # Assign a unique ID to the client and store the client socket in the clients dictionary,
+            # e.g. first client ID 1, second ID 2 etc..
+            client_id = self.server.register_client(self.client_socket)
+            if client_id is None:  # The server has the maximum number of authorized clients
+                self.server.admission.shed('players')
+                self.client_socket.send(busy_message(TOO_MANY_PLAYERS, RETRY_AFTER))
+                self.client_socket.close()
+                LOG.warning('connection', "Password correct, but client %s turned away, too many players.", self.client_address)
+                return
+            self.client_id = client_id
+            if self.capture_id is not None:  # A replay maps the player IDs within the requests with it
+                self.server.capture.record(CAPTURE_PLAYER, self.capture_id, PLAYER_ID.pack(client_id), self.last_active)
+
+            # '\x03' control byte + integer (4 bytes - 32 bits), big endian format, e.g. ID 1 ==> b'\x03\x00\x00\x00\x01'
+            self.client_socket.send(encode_client_id(self.client_id))  # Send the client ID to the client
+            LOG.info('connection', "Password correct. Client %d authorized.", self.client_id)
+        else:
+            self.client_socket.send(WRONG_PASSWORD)  # Send a message indicating wrong pw
+            self.client_socket.close()  # Close the connection
+            LOG.info('connection', "Password incorrect. Connection closed.")
+
+    def on_list_opponents(self, request):
+        """
+        Handles the 0x05 request for the list of opponents, answered with 0x06, the number of IDs and the IDs.
+        """
+        LOG.debug('request', "Request for list of opponents received.")
+        opponent_ids = [cid for cid in self.server.client_ids() if cid != self.client_id]  # Get the list of opponent IDs
+        self.client_socket.send(encode_opponents(opponent_ids))  # All IDs are packed with one call
 
-                if password == self.server.PASSWORD:  # Check if the password is correct
-                    self.client_id = self.server.client_id_counter  # Assign a unique ID to the client
-                    self.server.client_id_counter += 1  # Increment the counter for the next client, e.g. first client ID 1, second ID 2 etc..
-                    self.server.clients[self.client_id] = self.client_socket  # Store the client socket in the clients dictionary
+    def on_lobby_page(self, request):
+        """
+        Handles the 0x14 request for a page of the lobby, e.g. b'\x14\x01\x00\x00\x00\x00\x00\x64'
+        -> 1 byte filter (0x00 all players, 0x01 idle players only), 4 bytes cursor, 2 bytes page size.
+        """
+        if len(request) > PAGE_REQUEST.size:
+            player_filter, after_id, limit = PAGE_REQUEST.unpack_from(request, 1)
+        else:  # A short request is padded with zeros
+            player_filter, after_id, limit = PAGE_REQUEST.unpack(bytes(request[1:]).ljust(PAGE_REQUEST.size, b'\x00'))
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        LOG.debug('request', "Lobby page requested: filter=%d, after_id=%d, limit=%d", player_filter, after_id, limit)
 
-                    # '\x03' control byte + integer (4 bytes - 32 bits), 'big' - big endian format, e.g. int 1 '\x00\x00\x00\x01' ==>
-                    # => b'\x03\x00\x00\x00\x01' ==> control byte + int ID
-                    self.client_socket.send(b'\x03' + self.client_id.to_bytes(4, 'big'))  # Send the client ID to the client
-                    print("Password correct. Client authorized.")
-                else:
-                    self.client_socket.send(b'\x04')  # Send a message indicating wrong pw
-                    self.client_socket.close()  # Close the connection
-                    print("Password incorrect. Connection closed.")
-                    return
-
-            if request.startswith(b'\x05'):  # Check if the request is for the list of opponents
-                print("Request for list of opponents received.")
-
-                opponent_ids = [cid for cid in self.server.clients.keys() if cid != self.client_id]  # Get the list of opponent IDs
-
-                # 'len' => length converted to bytes using to_bytes, ID is an int -> 4 bytes, 'big endian' format
-                # The first control byte is the most important as it indicates the type of message
-                response = b'\x06' + len(opponent_ids).to_bytes(4, 'big')  # Create a response with the number of opponents
-                
-                for opp_id in opponent_ids:  # Loop through each opponent
-                    response += opp_id.to_bytes(4, 'big')  # Add each opponent ID (4 bytes) to the response
-                self.client_socket.send(response)  # Send the completed response to the client
-
-            elif request.startswith(b'\x07'):  # Check if the request is for a match, e.g., cmd ID word -> (match 2 test -> 1 control byte, 4 bytes, x bytes) -> 
-                # -> match, ID (opponent ID) and word to guess
-                # e.g. b'\x07\x00\x00\x00\x02test'
-                opponent_id = int.from_bytes(request[1:5], 'big')  # Read bytes 2, 3, 4, and 5 to get the opponent ID in big-endian format
-                word_to_guess = request[5:].decode('utf-8')  # Read from byte 6 till the end and decode it as a UTF-8 string (word to guess)
-
-                print(f"Match request received: opponent_id={opponent_id}, word_to_guess={word_to_guess}")
-                
-                if opponent_id == self.client_id:
-                    self.client_socket.send(b'\x0F' + b'You cannot play against yourself.')  # Send an error if the opponent is the same as the client
-                    print(f"Error: Player {self.client_id} cannot play against themselves.")  # Log the error
-
-                elif self.is_player_in_game(self.client_id) or self.is_player_in_game(opponent_id): # Check if the player is busy 
-                    self.client_socket.send(b'\x09' + b'Opponent is currently in another game.')  # Send an error if the opponent or client is in another game
-                    print(f"Error: Opponent {opponent_id} or player {self.client_id} is currently in another game.")
-
-                elif opponent_id in self.server.clients:  # Check if the opponent is available
-                    self.server.games[(self.client_id, opponent_id)] = {  # Create a new game entry
-                        'word': word_to_guess,
-                        'attempts': [], # list for attempts
-                        'hints': [] # list for hints
-                    }
-
-                    self.server.clients[opponent_id].send(b'\x0A' + word_to_guess.encode('utf-8'))  # Inform the opponent of the new game
-                    self.client_socket.send(b'\x08')  # Confirm the match
-                    print(f"Match confirmed with opponent_id={opponent_id}")
-                else:
-                    self.client_socket.send(b'\x09' + b'Opponent not available.')  # Send an error if the opponent is not available
-                    print(f"Error: Opponent {opponent_id} not available.")
-                    
-            elif request.startswith(b'\x0B'):  # Check if the request is a guess
-                # self.server.games = {
-                #   (1, 2): {"word": "python", "attempts": [], "hints": []},
-                #   (3, 4): {"word": "coding", "attempts": [], "hints": []},
-                #   (2, 3): {"word": "developer", "attempts": [], "hints": []},
-                # }
-                # dict_keys([(1, 2), (3, 4), (2, 3)])
-
-                game_key = [key for key in self.server.games.keys() if key[1] == self.client_id]  # Find the game the client is participating in
-                
-                if game_key:  # If the game is found
-                    game = self.server.games[game_key[0]]  # Get the game details
-                    guess = request[1:].decode('utf-8')  # Extract the guess from the request, again get rid of 1 control byte
-                    game['attempts'].append(guess)  # Add the guess to the attempts list
-                    print(f"Guess received: {guess}")  # Log the guess
-
-                if guess == game['word']:  # Check if the guess is correct
-                    opponent_message = f'The opponent guessed the word "{guess}" correctly. You lost the game.'.encode('utf-8')
-                    self.server.clients[game_key[0][0]].send(b'\x0C' + opponent_message)  # Inform client A of the successful guess
-
-                    success_message = f'The word "{guess}" is correct. You won the game.'.encode('utf-8')
-                    self.client_socket.send(b'\x0C' + success_message)  # Inform client B of the successful guess
-
-                    
-                    # Move the game to completed games
-                    # Set the success result
-                    game['result'] = 'success'
-                    
-                    # Check if there is already an entry for players (with these IDs), if yes, append a new entry to the list, be aware about duplications
-                    if game_key[0] in self.server.completed_games:
-                        self.server.completed_games[game_key[0]].append(game)
+        ids, total, next_id = self.server.lobby.page(player_filter == IDLE_PLAYERS, after_id, limit)
+        self.client_socket.send(encode_lobby_page(ids, total, next_id))
+
+    def on_follow_lobby(self, request):
+        """
+        Handles the 0x16 request to follow the presence of the players, 0x01 on, 0x00 off.
+        """
+        if self.client_id is None:
+            self.client_socket.send(FOLLOW_UNAUTHORIZED)
+        elif request[1:2] == b'\x00':
+            self.server.lobby.unsubscribe(self.client_id)
+            LOG.debug('request', "Player %d stopped following the lobby.", self.client_id)
+        else:
+            self.server.lobby.subscribe(self.client_id, self.client_socket)
+            LOG.debug('request', "Player %d follows the lobby.", self.client_id)
+
+    def on_match(self, request):
+        """
+        Handles the 0x07 match request, e.g. b'\x07\x00\x00\x00\x02test'
+        -> 1 control byte, 4 bytes opponent ID, the word to guess.
+        """
+        opponent_id = read_id(request, 1)
+        word_to_guess = read_text(request, 5)
+        game_word = self.game_word(word_to_guess)
+
+        LOG.debug('request', "Match request received: opponent_id=%d, word_to_guess=%s", opponent_id, word_to_guess)
+
+        if opponent_id == self.client_id:
+            self.client_socket.send(SELF_MATCH)  # Send an error if the opponent is the same as the client
+            LOG.info('game', "Error: Player %s cannot play against themselves.", self.client_id)  # Log the error
+
+        elif game_word is None:
+            self.client_socket.send(UNKNOWN_WORD)
+            LOG.info('game', "Error: Player %s set the unknown word %r.", self.client_id, word_to_guess)
+
+        elif self.is_player_in_game(self.client_id) or self.is_player_in_game(opponent_id):  # Check if the player is busy
+            self.client_socket.send(OPPONENT_BUSY)  # Send an error if the opponent or client is in another game
+            LOG.info('game', "Error: Opponent %d or player %s is currently in another game.", opponent_id, self.client_id)
+
+        elif self.server.connection(opponent_id) is None:  # Check if the opponent is available
+            self.client_socket.send(OPPONENT_UNAVAILABLE)  # Send an error if the opponent is not available
+            LOG.info('game', "Error: Opponent %d not available.", opponent_id)
+
+        else:
+            self.start_game(self.client_id, opponent_id, game_word, lambda: self.match_busy(opponent_id))  # Create a new game entry
+
+    def match_busy(self, opponent_id: int):
+        """
+        Answers a 0x07 match request whose game couldn't be created, another player matched one of us in the meantime.
+        """
+        self.client_socket.send(OPPONENT_BUSY)
+        LOG.info('game', "Error: Opponent %d or player %s is currently in another game.", opponent_id, self.client_id)
+
+    def on_join_queue(self, request):
+        """
+        Handles the 0x18 request to join the matchmaking queue, e.g. b'\x18\x01test' as setter with
+        the word 'test', b'\x18\x02\x04\x08' as guesser of words with 4 to 8 characters.
+        """
+        role = request[1] if len(request) > 1 else 0
+        if self.client_id is None:
+            self.client_socket.send(QUEUE_UNAUTHORIZED)
+        elif self.is_player_in_game(self.client_id):
+            self.client_socket.send(ALREADY_IN_GAME)
+        elif self.server.matchmaker.is_queued(self.client_id):
+            self.client_socket.send(ALREADY_QUEUED)
+        elif role == SETTER and len(request) > 2:
+            game_word = self.game_word(read_text(request, 2))
+            if game_word is not None:
+                self.queued(self.server.matchmaker.enqueue_setter(self.client_id, game_word), role)
+            else:
+                self.client_socket.send(UNKNOWN_WORD)
+        elif role == GUESSER:
+            try:
+                match = self.server.matchmaker.enqueue_guesser(self.client_id, *request[2:4])
+            except ValueError as e:
+                self.client_socket.send(b'\x0F' + str(e).encode('utf-8'))
+            else:
+                self.queued(match, role)
+        else:
+            self.client_socket.send(QUEUE_ROLE_INVALID)
+
+    def on_leave_queue(self, request):
+        """
+        Handles the 0x1A request to leave the matchmaking queue.
+        """
+        if self.client_id is not None:
+            self.server.matchmaker.remove(self.client_id)
+        self.client_socket.send(NOT_QUEUED)
+        LOG.debug('request', "Player %s left the queue.", self.client_id)
+
+    def on_watch(self, request):
+        """
+        Handles the 0x1B request to watch a game, e.g. b'\x1B\x00\x00\x00\x01\x00\x00\x00\x02'
+        -> 4 bytes ID of the player who set the word, 4 bytes ID of the player who guesses it.
+        """
+        game_key = (read_id(request, 1), read_id(request, 5))
+        if self.client_id is None:
+            self.client_socket.send(WATCH_UNAUTHORIZED)
+            return
+        with self.server.registry.locked_game(game_key[0]) as (active_key, game):  # Hold the game lock, so no event slips in before the state
+            if active_key != game_key:
+                self.client_socket.send(NO_GAME_TO_WATCH)
+            elif not self.server.spectators.watch(self.client_id, self.client_socket, game_key, game):
+                self.client_socket.send(TOO_MANY_WATCHED)
+            else:
+                LOG.debug('request', "Player %d watches game %s.", self.client_id, game_key)
+
+    def on_unwatch(self, request):
+        """
+        Handles the 0x1D request to stop watching one game (same data as 0x1B) or all games.
+        """
+        if self.client_id is not None:
+            game_keys = None
+            if len(request) >= 1 + GAME_KEY.size:
+                game_keys = [GAME_KEY.unpack_from(request, 1)]
+            self.server.spectators.unwatch(self.client_id, game_keys)
+
+    def on_guess(self, request):
+        """
+        Handles the 0x0B guess, e.g. b'\x0Bpython'.
+        """
+        # self.server.games = {
+        #   (1, 2): {"word": "python", "attempts": [], "hints": []},
+        #   (3, 4): {"word": "coding", "attempts": [], "hints": []},
+        #   (2, 3): {"word": "developer", "attempts": [], "hints": []},
+        # }
+        # self.server.registry.players = {1: (1, 2), 2: (1, 2), 3: (3, 4), ...}
+
+        with self.server.registry.locked_game(self.client_id) as (game_key, game):  # Find and lock the game the client is participating in
+            if not game_key or game_key[1] != self.client_id:  # Only the player who is guessing can guess
+                LOG.info('game', "No game found for guess.")
+                return
+
+            guess = read_text(request)  # Extract the guess from the request, again get rid of 1 control byte
+            self.server.registry.add_attempt(game_key, guess)  # Add the guess to the attempts list
+            LOG.debug('request', "Guess received: %s", guess)  # Log the guess
+            self.handle_guess(game_key, game, guess, request[1:])
+
+    def on_hint(self, request):
+        """
+        Handles the 0x0E hint, e.g. b'\x0Ete__'. An empty one asks the server for a hint like 'te__'.
+        """
+        hint = read_text(request)  # Extract the hint from the request, again get rid of 1 control byte
+        with self.server.registry.locked_game(self.client_id) as (game_key, game):
+            if game_key and game_key[0] == self.client_id:  # Only the player who set the word can send hints
+                opponent_id = game_key[1]
+                opponent = self.server.connection(opponent_id)
+                if not hint:
+                    hint = auto_hint(game['word'], game['hints'], self.server.dictionary)  # Reveal one more letter
+                if hint is None:
+                    self.client_socket.send(NO_MORE_HINTS)
+                elif opponent is not None:
+                    if len(request) > 1:
+                        opponent.send(to_bytes(request))  # The request is the message for the opponent
                     else:
-                        self.server.completed_games[game_key[0]] = [game]
-                    
-                    # finished game e.g. {'word': 'test', 'attempts': ['a', 'b', 'test'], 'hints': ['te__', 'tes_'], 'result': 'success'}
-                    print('finished game', game)
-                    del self.server.games[game_key[0]]  # Remove the game from the games dictionary
-                    print("Guess is correct. Game ended.")  # Log the correct guess and end of the game
+                        message = b'\x0E' + hint.encode('utf-8')
+                        opponent.send(message)
+                        self.client_socket.send(message)  # Show the setter which letter was revealed
+                    self.server.registry.add_hint(game_key, hint)  # Add the hint to the hints list
+                    LOG.debug('request', "Hint sent to opponent %d: %s", opponent_id, hint)
+
                 else:
-                    incorrect_message = f'The guess "{guess}" is incorrect.'.encode('utf-8')
-                    self.server.clients[game_key[0][0]].send(b'\x0D' + incorrect_message)  # Inform client A of the incorrect guess
-                    self.client_socket.send(b'\x0D' + incorrect_message)  # Inform client B of the incorrect guess
-                    
-                    print("Guess is incorrect.")
-            
-            elif request.startswith(b'\x0E'):  # Check if the request is a hint
-                hint = request[1:].decode('utf-8')  # Extract the hint from the request, again get rid of 1 control byte
-                game_key = [key for key in self.server.games.keys() if key[0] == self.client_id]
-                
-                if game_key:
-                    opponent_id = game_key[0][1]
-                    if opponent_id in self.server.clients:
-                        self.server.clients[opponent_id].send(b'\x0E' + hint.encode('utf-8'))
-                        self.server.games[game_key[0]]['hints'].append(hint)  # Add the hint to the hints list
-                        print(f"Hint sent to opponent {opponent_id}: {hint}")
+                    LOG.info('game', "Opponent %d not connected.", opponent_id)
+            else:
+                self.client_socket.send(NO_GAME_FOR_HINT)  # Send an error if no game found
+                LOG.info('game', "No game found for sending hint.")
 
-                    else:
-                        print(f"Opponent {opponent_id} not connected.")
+    def on_give_up(self, request):
+        """
+        Handles the 0x11 request to give up.
+        """
+        with self.server.registry.locked_game(self.client_id) as (game_key, game):  # Find and lock the game the client is participating in
+            LOG.debug('request', "Give up in game %s", game_key)  # e.g. (1, 2) - 0 requestor of the game, 1 player who guess the hidden word
+
+            if game_key:  # If the game is found
+                if self.client_id == game_key[1]:  # Only the player who is guessing can give up (second el in the key)
+                    # Set the 'gave up' result and move the game to completed games
+                    self.server.registry.finish(game_key, 'gave up')
+
+                    self.client_socket.send(GAVE_UP)  # Send message to the player who gave up
+                    self.server.send_to(game_key[0], OPPONENT_GAVE_UP)  # Send message to the opponent who won
+
+                    LOG.info('game', "Player %d has given up. Game ended.", self.client_id)  # Log the give up action
                 else:
-                    self.client_socket.send(b'\x10' + b'No game found for sending hint.')  # Send an error if no game found
-                    print("No game found for sending hint.")
-                    
-            elif request.startswith(b'\x11'):  # Check if the request is to give up
-                game_key = [key for key in self.server.games.keys() if key[0] == self.client_id or key[1] == self.client_id]  # Find the game the client is participating in
+                    self.client_socket.send(ONLY_GUESSER_GIVES_UP)  # Inform that only the guessing player can give up
+                    LOG.info('game', "Only the player who is guessing can give up.")
+            else:
+                self.client_socket.send(NO_GAME_TO_GIVE_UP)  # Inform if no active game is found
+                LOG.info('game', "No active game found to give up.")
 
-                print(game_key) # e.g. [(1, 2)] - 0 requestor of the game, 1 player who guess the hidden word
+    def on_stats(self, request):
+        """
+        Handles the 0x1F request for the statistics of a player, e.g. b'\x1F\x00\x00\x00\x02'
+        -> 4 bytes player ID, the own statistics without it.
+        """
+        if len(request) >= 5:
+            player_id = read_id(request, 1)
+        elif self.client_id is not None:
+            player_id = self.client_id
+        else:
+            self.client_socket.send(STATS_UNAUTHORIZED)
+            return
+        LOG.debug('request', "Statistics of player %d requested.", player_id)
+        self.client_socket.send(encode_player_stats(self.server.stats.get(player_id)))
+
+    def on_leaderboard(self, request):
+        """
+        Handles the 0x21 request for a leaderboard, e.g. b'\x21\x02\x0A'
+        -> 1 byte order (0x01 wins, 0x02 win rate), 1 byte number of players (0 for the default).
+        """
+        order = request[1] if len(request) > 1 else BY_WINS
+        count = min((request[2] if len(request) > 2 else 0) or DEFAULT_TOP, MAX_TOP)
+        if order != BY_WINS and order != BY_WIN_RATE:
+            self.client_socket.send(UNKNOWN_ORDER)
+            return
+        LOG.debug('request', "Leaderboard requested: order=%d, count=%d", order, count)
+        self.client_socket.send(encode_leaderboard(order, self.server.stats.top(order, count)))
+
+    def start_game(self, setter_id: int, guesser_id: int, word_to_guess: str, busy: Callable[[], None]):
+        """
+        Creates a game and informs both players, shared by the 0x07 match request and the matchmaking queue.
 
-                if game_key:  # If the game is found
-                    game = self.server.games[game_key[0]]  # Get the game details
+        The guesser gets 0x0A with the word, the setter the 0x08 confirmation. A guesser of another
+        worker process is reserved there first; with the asyncio engine the game is created once
+        that worker replied, the event loop doesn't wait for it.
 
-                    if self.client_id == game_key[0][1]:  # Only the player who is guessing can give up (second el in the list)
-                        game['result'] = 'gave up'
-                        give_up_message = 'You gave up. The game is over. You lose.'.encode('utf-8')
-                        self.client_socket.send(b'\x0C' + give_up_message)  # Send message to the player who gave up
+        Args:
+            setter_id (int): The ID of the player who set the word.
+            guesser_id (int): The ID of the player who guesses it.
+            word_to_guess (str): The word to guess.
+            busy (Callable[[], None]): Called instead if one of the players is already in a game.
+        """
+        game_key = (setter_id, guesser_id)
+        cluster = self.server.cluster
+        if cluster is None:
+            self.create_game(game_key, word_to_guess, busy)
+        else:
+            cluster.reserve(game_key, lambda reserved: self.create_game(game_key, word_to_guess, busy) if reserved else busy())
+
+    def create_game(self, game_key: GameKey, word_to_guess: str, busy: Callable[[], None]):
+        """
+        Creates the game of `start_game` once the players of other workers are reserved.
+        """
+        setter_id, guesser_id = game_key
+        if self.server.connection(setter_id) is None or self.server.registry.create(setter_id, guesser_id, word_to_guess) is None:
+            if self.server.cluster is not None:
+                self.server.cluster.release(game_key)
+            busy()
+            return
+        self.server.send_to(guesser_id, b'\x0A' + word_to_guess.encode('utf-8'))  # Inform the opponent of the new game
+        self.server.send_to(setter_id, MATCH_CONFIRMED)  # Confirm the match
+        LOG.info('game', "Match confirmed between setter %d and guesser %d", setter_id, guesser_id)
+
+    def queued(self, match: Optional[Match], role: int):
+        """
+        Confirms that the client waits in the matchmaking queue, or starts the game of the pair it was matched into.
 
-                        opponent_message = 'The player has given up. The game is over. You won.'.encode('utf-8')
-                        self.server.clients[game_key[0][0]].send(b'\x0C' + opponent_message)  # Send message to the opponent who won
+        If the game can't be started, the players which are still free go back to the head of the queue.
 
-                        # Move the game to completed games, be aware of duplications
-                        if game_key[0] in self.server.completed_games:
-                            self.server.completed_games[game_key[0]].append(game)
-                        else:
-                            self.server.completed_games[game_key[0]] = [game]
+        Args:
+            match (Optional[Match]): The pair, None if the client was queued.
+            role (int): The role the client queued as.
+        """
+        if match is None:
+            self.client_socket.send(b'\x19' + bytes([role]))  # Queued, waiting for an opponent
+            LOG.debug('request', "Player %d queued as %s.", self.client_id, 'setter' if role == SETTER else 'guesser')
+            return
+
+        waiting = match.guesser if role == SETTER else match.setter
+        if waiting.player_id in self.server.clients:
+            self.start_game(match.setter.player_id, match.guesser.player_id, match.setter.word,
+                            lambda: self.requeue(match, role))
+        else:
+            self.requeue(match, role)
+
+    def requeue(self, match: Match, role: int):
+        """
+        Puts whoever is still free of a pair back to the head of the queue, the waiting player went
+        away or one of the two started another game meanwhile.
+        """
+        for ticket in match:
+            if ticket.player_id in self.server.clients and not self.is_player_in_game(ticket.player_id):
+                self.server.matchmaker.requeue(ticket)
+        if self.server.matchmaker.is_queued(self.client_id):
+            self.client_socket.send(b'\x19' + bytes([role]))
 
-                        del self.server.games[game_key[0]]  # Remove the game from the games dictionary
+    def handle_guess(self, game_key: GameKey, game: dict, guess: str, encoded):
+        """
+        Evaluates a guess and informs both players, the caller holds the game lock.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            game (dict): The game.
+            guess (str): The guess of the client.
+            encoded: The guess as the client sent it, the messages embed it without encoding it again.
+        """
+        if self.server.dictionary is not None:
+            guess = normalize(guess)  # The word was stored in the form of the dictionary
+        correct = guess == game['word']  # Check if the guess is correct
+        if correct:
+            # Set the success result and move the game to completed games
+            self.server.registry.finish(game_key, 'success')
+        setter_message, guesser_message = encode_guess_results(encoded, correct)
+        self.server.send_to(game_key[0], setter_message)  # Inform client A of the guess
+        self.client_socket.send(guesser_message)  # Inform client B of the guess
+
+        if correct:
+            # finished game e.g. {'word': 'test', 'attempts': ['a', 'b', 'test'], 'hints': ['te__', 'tes_'], 'result': 'success'}
+            LOG.debug('game', "finished game %s", game)
+            LOG.info('game', "Guess is correct. Game ended.")  # Log the correct guess and end of the game
+        else:
+            LOG.debug('game', "Guess is incorrect.")
+
+    def game_word(self, word: str) -> Optional[str]:
+        """
+        Checks if a word may be set, any word if the server has no dictionary.
+
+        With a dictionary the game stores the word in the normalized form of the dictionary, e.g.
+        'Test ' ==> 'test', and `handle_guess` normalizes the guesses the same way.
+
+        Args:
+            word (str): The word to guess as the setter sent it.
+
+        Returns:
+            Optional[str]: The word to store in the game, None if it is not in the dictionary.
+        """
+        dictionary = self.server.dictionary
+        if dictionary is None:
+            return word
+        return normalize(word) if word in dictionary else None
 
-                        print(f"Player {self.client_id} has given up. Game ended.")  # Log the give up action
-                    else:
-                        self.client_socket.send(b'\x0F' + b'Only the player who is guessing can give up.')  # Inform that only the guessing player can give up
-                        print("Only the player who is guessing can give up.")
-                else:
-                    self.client_socket.send(b'\x0F' + b'No active game found to give up.')  # Inform if no active game is found
-                    print("No active game found to give up.")
-    
-        except Exception as e:
-            print(f"Error handling request {request}: {e}")  # Log the error
-            
     def is_player_in_game(self, player_id):
         """
         Checks if a given player is currently in an active game.
@@ -267,7 +678,23 @@ class ClientHandler:
         Returns:
             bool: True if the player is in an active game, False otherwise.
         """
-        for game in self.server.games.keys():
-            if player_id in game:
-                return True
-        return False
+        return self.server.registry.is_player_in_game(player_id)
+
+
+# Handlers of the requests by their control byte, see `ClientHandler.handle_request`
+DISPATCH = dispatch_table({
+    0x02: ClientHandler.on_password,
+    0x05: ClientHandler.on_list_opponents,
+    0x07: ClientHandler.on_match,
+    0x0B: ClientHandler.on_guess,
+    0x0E: ClientHandler.on_hint,
+    0x11: ClientHandler.on_give_up,
+    0x14: ClientHandler.on_lobby_page,
+    0x16: ClientHandler.on_follow_lobby,
+    0x18: ClientHandler.on_join_queue,
+    0x1A: ClientHandler.on_leave_queue,
+    0x1B: ClientHandler.on_watch,
+    0x1D: ClientHandler.on_unwatch,
+    0x1F: ClientHandler.on_stats,
+    0x21: ClientHandler.on_leaderboard,
+})
@@ -0,0 +1,652 @@
+import heapq  # Import heapq to merge the exports of the workers by the time the games finished
+import itertools  # Import itertools for the request IDs
+import os  # Import os to hand the inherited sockets over and to clean up the Unix socket file
+import pickle  # Import pickle to encode the messages between the workers
+import queue  # Import queue for the outboxes of the writer threads
+import signal  # Import signal to stop the workers together with the supervisor
+import socket  # Import socket for the socket pairs between the workers and the shared Unix socket
+import struct  # Import struct for the header of the messages between the workers
+import subprocess  # Import subprocess to start the worker processes
+import threading  # Import threading for the reader and writer threads of the bus
+import time  # Import time to wait for the workers to stop
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from client_handler import ClientHandler  # Import the ClientHandler which runs the requests forwarded by other workers
+from codec import read_id, to_bytes  # Import the codec to read the game of a forwarded request and to pickle it
+from completed_store import CompletedGame  # Import the CompletedGame record, renumbered across the workers
+from connection import Connection  # Import the Connection base class of the remote players
+from game_registry import GameEvent, GameKey  # Import the events which release the players of other workers
+from lobby import LEFT  # Import the presence delta which ends the games of a player of another worker
+from log import LOG  # Import the logger, records are written by a background thread
+from player_stats import Outcome  # Import the outcome of a game for a player, relayed to the statistics of all workers
+from timers import Timer  # Import the Timer of the timeout of a request which doesn't block
+
+BUS_HEADER = struct.Struct('>IBI')  # Length of the payload, kind, request ID (0 if no reply is expected)
+REQUEST_TIMEOUT = 5.0  # Seconds a worker waits for the reply of another worker
+EXPORT_PAGE = 500  # Completed games a worker returns per export query
+MAX_BATCH = 256  # Messages written to another worker with one sendall
+
+# Kinds of the messages between the workers, the payload is a pickled tuple
+DELIVER = 1  # (player ID, message): send a protocol message to a player of the receiving worker
+FORWARD = 2  # (player ID, request): handle a request of a player for a game of the receiving worker
+PRESENCE = 3  # (kind, player ID): a lobby change, see `Lobby.apply`
+RESERVE = 4  # (player ID, game key): reserve a player of the receiving worker for a game, replied with a bool
+RELEASE = 5  # (player ID, game key): the game of a reserved player finished
+QUERY = 6  # (name, args): read the games for the dashboard, see `Cluster.answer`
+REPLY = 7  # The value of a RESERVE or QUERY
+OUTCOMES = 8  # (outcomes,): players' outcomes of games finished in the sending worker, see `StatsBoard.apply`
+
+FORWARDED_OPCODES = (0x0B, 0x11)  # Requests of a guesser, handled where its game is
+SPECTATOR_OPCODES = (0x1B, 0x1D)  # Requests for the game of a setter, handled where the setter is
+
+
+class WorkerSpec(NamedTuple):
+    """
+    What a worker process inherits from the supervisor, passed as `--worker` on its command line.
+
+    Attributes:
+        index (int): The number of the worker, from 0.
+        count (int): The number of workers.
+        listen_fd (int): The shared listening Unix socket, -1 in the network mode (every worker binds the port itself).
+        peer_fds (Dict[int, int]): The socket to every other worker, by worker index.
+    """
+    index: int
+    count: int
+    listen_fd: int
+    peer_fds: Dict[int, int]
+
+    def format(self) -> str:
+        """
+        Returns the command line form, e.g. '1/3/5/0=6,2=7'.
+        """
+        peers = ','.join(f'{index}={fd}' for index, fd in sorted(self.peer_fds.items()))
+        return f'{self.index}/{self.count}/{self.listen_fd}/{peers}'
+
+    @classmethod
+    def parse(cls, text: str) -> 'WorkerSpec':
+        index, count, listen_fd, peers = text.split('/')
+        peer_fds = dict(tuple(int(number) for number in peer.split('=')) for peer in peers.split(',') if peer)
+        return cls(int(index), int(count), int(listen_fd), peer_fds)
+
+
+class RemoteConnection(Connection):
+    """
+    Stands in for the connection of a player served by another worker process.
+
+    Messages are passed over the bus to the worker of the player, which queues them on the real
+    connection (and frames them, if the player selected the framed protocol). That worker applies
+    the bound of the outbound queue, so nothing is counted here.
+    """
+    __slots__ = ('cluster', 'player_id')
+
+    def __init__(self, cluster: 'Cluster', player_id: int):
+        super().__init__()
+        self.cluster = cluster
+        self.player_id = player_id
+
+    def send(self, message: bytes) -> int:
+        self.cluster.post(self.cluster.home(self.player_id), DELIVER, (self.player_id, message))
+        return len(message)
+
+    @property
+    def queued_bytes(self) -> int:
+        return 0
+
+    def abort(self):
+        pass  # The socket belongs to the worker of the player
+
+    def close(self):
+        pass
+
+
+class Cluster:
+    """
+    Connects one worker process of a multi-process server to the other workers.
+
+    Every worker accepts clients on its own, so a single process can't see all players and games.
+    Instead the state is partitioned:
+
+    - Player IDs are handed out with the number of workers as step, worker i gives out i + 1,
+      i + 1 + count, ..., so the worker of a player (`home`) follows from its ID.
+    - A game lives in the worker of its setter, like it lives in the shard of its setter within a
+      registry. The guesser is reserved in its own worker first (`GameRegistry.reserve`), so it
+      can't start another game there, and its guesses and give-ups are forwarded to the game.
+    - Every worker keeps a copy of the lobby, the presence changes are relayed to all workers.
+      So it does of the player statistics, the outcomes of every finished game are relayed.
+      Messages for a player of another worker are sent through a `RemoteConnection`.
+
+    The workers are connected pairwise by Unix socket pairs. Each socket has a reader thread and a
+    writer thread with an unbounded outbox, so posting a message never blocks, even when both
+    sides post to each other at the same time. Messages from one worker arrive in the order they
+    were posted. Reservations, dashboard queries and outcomes are handled on the reader thread,
+    the registry and the statistics are thread-safe; everything else is passed to `dispatch`.
+
+    Attributes:
+        server: The server instance of this worker.
+        index (int): The number of this worker.
+        count (int): The number of workers.
+        listen_fd (int): The listening Unix socket shared by the workers, -1 in the network mode.
+        dispatch (Optional[Callable[[Callable[[], None]], None]]): Runs the handling of a message,
+            on the reader thread if None (e.g. `loop.call_soon_threadsafe` of the asyncio engine).
+    """
+
+    def __init__(self, server, spec: WorkerSpec):
+        """
+        Initializes the bus of a worker, the threads start with `start`.
+
+        Args:
+            server: The server instance of this worker.
+            spec (WorkerSpec): The sockets inherited from the supervisor.
+        """
+        self.server = server
+        self.index = spec.index
+        self.count = spec.count
+        self.listen_fd = spec.listen_fd
+        self.dispatch: Optional[Callable[[Callable[[], None]], None]] = None
+        self._peers = {index: socket.socket(fileno=fd) for index, fd in spec.peer_fds.items()}
+        self._outboxes: Dict[int, 'queue.SimpleQueue[bytes]'] = {index: queue.SimpleQueue() for index in self._peers}
+        self._request_ids = itertools.count(1)  # next() is atomic, no lock needed
+        self._waiting: Dict[int, list] = {}  # request ID -> [threading.Event, reply]
+        self._callbacks: Dict[int, Tuple[Callable, Timer]] = {}  # request ID -> callback of `request_later`, its timeout
+        self._remotes: Dict[int, RemoteConnection] = {}  # player ID -> connection, players of other workers
+        self._proxies: Dict[int, ClientHandler] = {}  # player ID -> handler of its forwarded requests
+        self._lock = threading.Lock()
+
+    def home(self, player_id: int) -> int:
+        """
+        Returns the index of the worker which serves the player.
+        """
+        return (player_id - 1) % self.count
+
+    def is_local(self, player_id: int) -> bool:
+        return self.home(player_id) == self.index
+
+    def start(self):
+        """
+        Starts the reader and writer threads of the sockets to the other workers.
+        """
+        for index, peer in self._peers.items():
+            threading.Thread(target=self._write, args=(index, peer), name=f'bus-writer-{index}', daemon=True).start()
+            threading.Thread(target=self._read, args=(index, peer), name=f'bus-reader-{index}', daemon=True).start()
+
+    def post(self, index: int, kind: int, payload: tuple, request_id: int = 0):
+        """
+        Queues a message for another worker without waiting.
+
+        Args:
+            index (int): The worker.
+            kind (int): The kind of the message, e.g. DELIVER.
+            payload (tuple): The payload of the kind.
+            request_id (int): The request a REPLY answers, 0 otherwise.
+        """
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)  # Only ever exchanged with the own worker processes
+        self._outboxes[index].put(BUS_HEADER.pack(len(data), kind, request_id) + data)
+
+    def broadcast(self, kind: int, payload: tuple):
+        for index in self._peers:
+            self.post(index, kind, payload)
+
+    def request(self, indexes: List[int], kind: int, payload: tuple) -> list:
+        """
+        Sends the same request to several workers and waits for all replies.
+
+        Args:
+            indexes (List[int]): The workers.
+            kind (int): RESERVE or QUERY.
+            payload (tuple): The payload of the kind.
+
+        Returns:
+            list: The replies in the order of the workers.
+
+        Raises:
+            TimeoutError: If a worker didn't reply within REQUEST_TIMEOUT seconds.
+        """
+        pending = []
+        for index in indexes:
+            request_id = next(self._request_ids)
+            waiting = self._waiting[request_id] = [threading.Event(), None]
+            pending.append((request_id, waiting))
+            self.post(index, kind, payload, request_id)
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+        try:
+            for _, waiting in pending:
+                if not waiting[0].wait(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"No reply from the other workers within {REQUEST_TIMEOUT:g} seconds")
+            return [waiting[1] for _, waiting in pending]
+        finally:
+            for request_id, _ in pending:
+                self._waiting.pop(request_id, None)
+
+    def request_later(self, index: int, kind: int, payload: tuple, callback: Callable):
+        """
+        Sends a request to another worker without waiting, for the asyncio engine, whose event loop must not block.
+
+        The callback runs through `dispatch` with the reply, or with None if the worker didn't reply
+        within REQUEST_TIMEOUT seconds.
+
+        Args:
+            index (int): The worker.
+            kind (int): RESERVE or QUERY.
+            payload (tuple): The payload of the kind.
+            callback (Callable): Called with the reply.
+        """
+        request_id = next(self._request_ids)
+        timeout = self.server.timers.schedule(REQUEST_TIMEOUT, lambda: self._call_back(request_id, None))
+        self._callbacks[request_id] = (callback, timeout)
+        self.post(index, kind, payload, request_id)
+
+    def _call_back(self, request_id: int, reply):
+        waiting = self._callbacks.pop(request_id, None)  # The reply or the timeout, whichever comes first
+        if waiting is not None:
+            callback, timeout = waiting
+            timeout.cancel()
+            callback(reply)
+
+    def _write(self, index: int, peer: socket.socket):
+        outbox = self._outboxes[index]
+        try:
+            while True:
+                frames = [outbox.get()]
+                while len(frames) < MAX_BATCH and not outbox.empty():  # Whatever queued up meanwhile leaves in one write
+                    frames.append(outbox.get())
+                peer.sendall(b''.join(frames))
+        except OSError as e:
+            LOG.error('server', "Lost the connection to worker %d: %s", index, e)
+
+    def _read(self, index: int, peer: socket.socket):
+        stream = peer.makefile('rb')
+        try:
+            while True:
+                header = stream.read(BUS_HEADER.size)
+                if len(header) < BUS_HEADER.size:
+                    break
+                length, kind, request_id = BUS_HEADER.unpack(header)
+                self._received(index, kind, request_id, pickle.loads(stream.read(length)))
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            LOG.error('server', "Lost the connection to worker %d: %s", index, e)
+            return
+        LOG.error('server', "Worker %d is gone.", index)
+
+    def _received(self, index: int, kind: int, request_id: int, payload):
+        """
+        Handles a message of another worker, on the reader thread of its socket.
+        """
+        if kind == REPLY:
+            waiting = self._waiting.get(request_id)
+            if waiting is not None:
+                waiting[1] = payload
+                waiting[0].set()
+            elif request_id in self._callbacks:
+                self.dispatch(lambda: self._call_back(request_id, payload))
+        elif kind == RESERVE:
+            self.post(index, REPLY, self.server.registry.reserve(*payload), request_id)
+        elif kind == RELEASE:
+            self.server.registry.release(*payload)
+        elif kind == OUTCOMES:
+            self.server.stats.apply(*payload)
+        elif kind == QUERY:
+            try:
+                reply = self.answer(*payload)
+            except Exception as e:
+                LOG.error('server', "Query %r of worker %d failed: %s", payload, index, e)
+                reply = None
+            self.post(index, REPLY, reply, request_id)
+        elif self.dispatch is not None:
+            self.dispatch(lambda: self._handle(kind, payload))
+        else:
+            self._handle(kind, payload)
+
+    def _handle(self, kind: int, payload: tuple):
+        try:
+            if kind == DELIVER:
+                self.server.send_to(*payload)
+            elif kind == FORWARD:
+                player_id, request = payload
+                self._proxy(player_id).handle_request(request)
+            elif kind == PRESENCE:
+                presence, player_id = payload
+                self.server.lobby.apply(presence, player_id)
+                if presence == LEFT:
+                    self._left(player_id)
+        except Exception as e:
+            LOG.error('server', "Error handling a message of kind %d from another worker: %s", kind, e)
+
+    def _proxy(self, player_id: int) -> ClientHandler:
+        """
+        Returns the handler running the forwarded requests of a player of another worker.
+        """
+        with self._lock:
+            proxy = self._proxies.get(player_id)
+            if proxy is None:
+                proxy = ClientHandler(self.remote(player_id), ('worker', self.home(player_id)), self.server)
+                proxy.client_id = player_id
+                proxy.limiter = None  # Limited by the worker of the player already
+                self._proxies[player_id] = proxy
+        return proxy
+
+    def _left(self, player_id: int):
+        """
+        Ends the games of this worker with a player of another worker which disconnected.
+        """
+        proxy = self._proxy(player_id)
+        proxy.leave_game()
+        self.server.spectators.unwatch(player_id)
+        with self._lock:
+            self._proxies.pop(player_id, None)
+            self._remotes.pop(player_id, None)
+
+    def remote(self, player_id: int) -> RemoteConnection:
+        """
+        Returns the connection of a player of another worker.
+        """
+        connection = self._remotes.get(player_id)
+        if connection is None:
+            connection = self._remotes.setdefault(player_id, RemoteConnection(self, player_id))
+        return connection
+
+    def relay_presence(self, kind: int, player_id: int):
+        """
+        Passes a lobby change on to the other workers, the relay of the lobby.
+        """
+        self.broadcast(PRESENCE, (kind, player_id))
+
+    def relay_outcomes(self, outcomes: List[Outcome]):
+        """
+        Passes the outcomes of finished games on to the other workers, the relay of the statistics.
+        """
+        self.broadcast(OUTCOMES, (outcomes,))
+
+    def forward(self, handler: ClientHandler, request: bytes) -> bool:
+        """
+        Forwards a request to the worker of the game it is about.
+
+        Guesses and give-ups go to the worker of the setter of the guesser's game, watching a game
+        to the worker of its setter, stopping to watch all games to every worker.
+
+        Args:
+            handler (ClientHandler): The handler of the client which sent the request.
+            request: The request, bytes or a view into the read data.
+
+        Returns:
+            bool: True if the request is handled by another worker only.
+        """
+        if handler.client_id is None or not request or isinstance(handler.client_socket, RemoteConnection):
+            return False
+        opcode = request[0]
+        if opcode in FORWARDED_OPCODES:
+            game_key = self.server.registry.find_game_key(handler.client_id)
+            owner = game_key[0] if game_key is not None else None
+        elif opcode in SPECTATOR_OPCODES and len(request) >= 9:
+            owner = read_id(request, 1)
+        elif opcode == 0x1D:  # Stop watching everywhere, including here
+            self.broadcast(FORWARD, (handler.client_id, to_bytes(request)))
+            return False
+        else:
+            return False
+        if owner is None or self.is_local(owner):
+            return False
+        self.post(self.home(owner), FORWARD, (handler.client_id, to_bytes(request)))
+        return True
+
+    def reserve(self, game_key: GameKey, done: Callable[[bool], None]):
+        """
+        Reserves the players of other workers for a game of this worker.
+
+        The threaded engine waits for the replies on the handler thread, `done` runs before `reserve`
+        returns. The event loop of the asyncio engine (`dispatch` is set) must not wait, `done` runs
+        on the loop once the replies arrived.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            done (Callable[[bool], None]): Called with False if one of them is in a game already or
+                its worker didn't reply in time, nothing is reserved then.
+        """
+        self._reserve([player_id for player_id in game_key if not self.is_local(player_id)], game_key, done)
+
+    def _reserve(self, players: List[int], game_key: GameKey, done: Callable[[bool], None]):
+        """
+        Reserves the first of the players, then the rest.
+        """
+        if not players:
+            done(True)
+            return
+
+        def replied(reserved: Optional[bool]):
+            if reserved:
+                self._reserve(players[1:], game_key, done)
+            else:
+                self.release(game_key)
+                done(False)
+
+        player_id = players[0]
+        if self.dispatch is not None:
+            self.request_later(self.home(player_id), RESERVE, (player_id, game_key), replied)
+            return
+        try:
+            reserved = self.request([self.home(player_id)], RESERVE, (player_id, game_key))[0]
+        except TimeoutError as e:
+            LOG.warning('server', "Reserving player %d failed: %s", player_id, e)
+            reserved = False
+        replied(reserved)
+
+    def release(self, game_key: GameKey):
+        for player_id in game_key:
+            if not self.is_local(player_id):
+                self.post(self.home(player_id), RELEASE, (player_id, game_key))
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Releases the players of other workers when their game finished, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        if event.kind == 'finished':
+            self.release(event.game_key)
+
+    def answer(self, name: str, *args):
+        """
+        Answers a query of the dashboard about the games of this worker.
+
+        Args:
+            name (str): 'version', 'active', 'count', 'get' (game ID), 'newest' (see `CompletedGameStore.newest`)
+                or 'export' (after ID, since, until: the next EXPORT_PAGE games of `CompletedGameStore.export`).
+
+        Returns:
+            The answer.
+        """
+        registry = self.server.registry
+        if name == 'version':
+            return registry.version
+        if name == 'active':
+            return registry.snapshot_games()
+        if name == 'count':
+            return len(registry.completed)
+        if name == 'get':
+            return registry.completed.get(*args)
+        if name == 'newest':
+            return registry.completed.newest(*args)
+        if name == 'export':
+            after_id, since, until = args
+            return list(itertools.islice(registry.completed.export(since, until, None, after_id), EXPORT_PAGE))
+        raise ValueError(f"Unknown query {name!r}")
+
+    def gather(self, name: str, *args) -> list:
+        """
+        Asks every worker, including this one, the same query.
+
+        Returns:
+            list: The answers by worker index.
+        """
+        answers = self.request(sorted(self._peers), QUERY, (name,) + args)
+        answers.insert(self.index, self.answer(name, *args))
+        return answers
+
+
+class ClusterGames:
+    """
+    The games of all workers, read by the web server in place of the registry of its own worker.
+
+    Attributes:
+        completed (ClusterCompletedGames): The completed games of all workers.
+    """
+
+    def __init__(self, cluster: Cluster):
+        self.cluster = cluster
+        self.completed = ClusterCompletedGames(cluster)
+
+    @property
+    def version(self) -> int:
+        """
+        int: The sum of the registry versions of the workers, it grows with every change of a game anywhere.
+        """
+        return sum(self.cluster.gather('version'))
+
+    def snapshot_games(self) -> Dict[GameKey, dict]:
+        games = {}
+        for worker_games in self.cluster.gather('active'):
+            games.update(worker_games)
+        return games
+
+
+class ClusterCompletedGames:
+    """
+    The completed games of all workers, with the subset of the `CompletedGameStore` interface used by the web server.
+
+    Every worker numbers its games on its own, the game of worker i with the ID n is shown as
+    (n - 1) * count + i + 1, so the IDs stay unique and stable.
+    """
+
+    def __init__(self, cluster: Cluster):
+        self.cluster = cluster
+
+    def __len__(self) -> int:
+        return sum(self.cluster.gather('count'))
+
+    def _renumber(self, index: int, game: CompletedGame) -> CompletedGame:
+        return CompletedGame((game.game_id - 1) * self.cluster.count + index + 1, game.setter_id, game.guesser_id,
+                             game.word, game.attempts, game.hints, game.result, game.started_at, game.finished_at,
+                             game.left_by)
+
+    def get(self, game_id: int) -> Optional[CompletedGame]:
+        if game_id < 1:
+            return None
+        index = (game_id - 1) % self.cluster.count
+        game = self._ask(index, 'get', (game_id - 1) // self.cluster.count + 1)
+        return self._renumber(index, game) if game is not None else None
+
+    def _ask(self, index: int, name: str, *args):
+        """
+        Returns the answer of one worker to a query, this one included.
+        """
+        if index == self.cluster.index:
+            return self.cluster.answer(name, *args)
+        return self.cluster.request([index], QUERY, (name,) + args)[0]
+
+    def newest(self, count: int, skip: int = 0, player: Optional[int] = None,
+               result: Optional[str] = None) -> Tuple[List[CompletedGame], bool]:
+        """
+        Returns a page of the most recently finished games of all workers, see `CompletedGameStore.newest`.
+
+        Every worker returns its newest skip + count matching games, the page is cut from them
+        merged by the time they finished.
+        """
+        games = []
+        has_older = False
+        for index, (worker_games, worker_has_older) in enumerate(self.cluster.gather('newest', skip + count, 0, player, result)):
+            games.extend(self._renumber(index, game) for game in worker_games)
+            has_older = has_older or worker_has_older
+        games.sort(key=lambda game: game.finished_at, reverse=True)
+        return games[skip:skip + count], has_older or len(games) > skip + count
+
+    def export(self, since: Optional[float] = None, until: Optional[float] = None,
+               player: Optional[int] = None) -> Iterator[CompletedGame]:
+        """
+        Iterates over the games of all workers finished in a period, see `CompletedGameStore.export`.
+
+        The games of every worker are fetched EXPORT_PAGE at a time and merged by the time they
+        finished, so one page per worker is in memory at a time. The player is filtered here, a
+        query of another worker reads one page whether the player is rare or not.
+        """
+        return heapq.merge(*(self._export(index, since, until, player) for index in range(self.cluster.count)),
+                           key=lambda game: game.finished_at)
+
+    def _export(self, index: int, since: Optional[float], until: Optional[float],
+                player: Optional[int]) -> Iterator[CompletedGame]:
+        after_id = 0
+        while True:
+            games = self._ask(index, 'export', after_id, since, until)
+            for game in games:
+                if player is None or player == game.setter_id or player == game.guesser_id:
+                    yield self._renumber(index, game)
+            if len(games) < EXPORT_PAGE:
+                return
+            after_id = games[-1].game_id
+
+
+def run_workers(count: int, command: List[str], unix_path: Optional[str] = None, backlog: int = 128) -> int:
+    """
+    Runs the server as `count` worker processes and waits until one of them exits.
+
+    The workers are connected pairwise by socket pairs. In the local mode they share one
+    listening Unix socket created here, in the network mode every worker binds the port itself
+    with SO_REUSEPORT and the kernel spreads the connections. When a worker exits or the
+    supervisor is stopped, all workers are stopped.
+
+    Args:
+        count (int): The number of workers.
+        command (List[str]): The command line of the server, `--worker` is appended.
+        unix_path (Optional[str]): The Unix socket in the local mode, None in the network mode.
+        backlog (int): The listen backlog of the shared Unix socket.
+
+    Returns:
+        int: The exit code, the one of the first worker which exited.
+    """
+    pairs: Dict[Tuple[int, int], socket.socket] = {}
+    for first in range(count):
+        for second in range(first + 1, count):
+            pairs[first, second], pairs[second, first] = socket.socketpair()
+
+    listener = None
+    if unix_path is not None:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(unix_path)
+        listener.listen(backlog)
+
+    workers = []
+    for index in range(count):
+        peer_fds = {other: pairs[index, other].fileno() for other in range(count) if other != index}
+        spec = WorkerSpec(index, count, listener.fileno() if listener else -1, peer_fds)
+        inherited = list(peer_fds.values()) + ([listener.fileno()] if listener else [])
+        workers.append(subprocess.Popen(command + ['--worker', spec.format()], pass_fds=inherited))
+        LOG.info('server', "Started worker %d (pid %d).", index, workers[-1].pid)
+    for sock in pairs.values():
+        sock.close()  # The workers have their copies
+
+    def stop(signum, frame):
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    code = 0
+    try:
+        while all(worker.poll() is None for worker in workers):
+            time.sleep(0.2)
+        code = next(worker.returncode for worker in workers if worker.returncode is not None)
+        LOG.error('server', "A worker exited with %d, stopping the others.", code)
+    except (KeyboardInterrupt, SystemExit):
+        LOG.info('server', "Stopping the workers...")
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(5)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        if listener is not None:
+            listener.close()
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+    return code
@@ -0,0 +1,150 @@
+import struct  # Import struct for the precompiled message layouts
+from itertools import chain  # Import chain to pack the records of a leaderboard with one call
+from functools import lru_cache  # Import lru_cache to compile the layouts of the ID lists once per length
+from typing import Callable, Dict, List, Optional, Sequence, Tuple  # Import type hints for better code readability
+
+# Requests are bytes (unframed protocol) or memoryviews into the data read from the socket (framed
+# protocol, see `FrameDecoder.feed`). Both are decoded in place: numbers with `unpack_from`, text
+# with a single UTF-8 decode of a view, no intermediate slices are copied.
+
+PLAYER_ID = struct.Struct('>I')  # A 4-byte player ID, e.g. the opponent of 0x07
+GAME_KEY = struct.Struct('>II')  # Setter ID, guesser ID, e.g. the game of 0x1B and 0x1D
+CLIENT_ID = struct.Struct('>BI')  # 0x03, the ID of the authorized client
+PLAYER_STATS = struct.Struct('>B9I')  # 0x20, the fields of a PlayerStats record
+
+# Fixed server messages, encoded once
+WELCOME = b'\x01Welcome to the server!'
+WRONG_PASSWORD = b'\x04'
+MATCH_CONFIRMED = b'\x08'
+OPPONENT_BUSY = b'\x09Opponent is currently in another game.'
+OPPONENT_UNAVAILABLE = b'\x09Opponent not available.'
+VERSION_IN_EFFECT = (b'\x13\x00', b'\x13\x01')  # By protocol version
+NOT_QUEUED = b'\x19\x00'
+SELF_MATCH = b'\x0FYou cannot play against yourself.'
+UNKNOWN_WORD = b'\x0FThe word is not in the dictionary.'
+FOLLOW_UNAUTHORIZED = b'\x0FAuthorize before following the lobby.'
+QUEUE_UNAUTHORIZED = b'\x0FAuthorize before joining the queue.'
+ALREADY_IN_GAME = b'\x0FYou are already in a game.'
+ALREADY_QUEUED = b'\x0FYou are already in the queue.'
+QUEUE_ROLE_INVALID = b'\x0FJoin the queue as setter (0x01) with a word or as guesser (0x02).'
+WATCH_UNAUTHORIZED = b'\x0FAuthorize before watching a game.'
+NO_GAME_TO_WATCH = b'\x0FNo such game to watch.'
+TOO_MANY_WATCHED = b'\x0FYou are watching too many games.'
+NO_MORE_HINTS = b'\x0FOnly one letter is hidden, no more hints.'
+NO_GAME_FOR_HINT = b'\x10No game found for sending hint.'
+GAVE_UP = b'\x0CYou gave up. The game is over. You lose.'
+OPPONENT_GAVE_UP = b'\x0CThe player has given up. The game is over. You won.'
+ONLY_GUESSER_GIVES_UP = b'\x0FOnly the player who is guessing can give up.'
+NO_GAME_TO_GIVE_UP = b'\x0FNo active game found to give up.'
+OPPONENT_LOST_CONNECTION = b'\x0CYour opponent lost connection. You win.'
+STATS_UNAUTHORIZED = b'\x0FAuthorize or name a player to read statistics.'
+UNKNOWN_ORDER = b'\x0FOrder the leaderboard by wins (0x01) or win rate (0x02).'
+
+
+def read_id(request, offset: int = 1) -> int:
+    """
+    Reads a 4-byte big endian player ID, a shorter rest of the request is read as a shorter number.
+
+    e.g. (b'\\x07\\x00\\x00\\x00\\x02test', 1) ==> 2
+    """
+    if len(request) >= offset + PLAYER_ID.size:
+        return PLAYER_ID.unpack_from(request, offset)[0]
+    return int.from_bytes(request[offset:offset + PLAYER_ID.size], 'big')
+
+
+def read_text(request, offset: int = 1) -> str:
+    """
+    Decodes the UTF-8 text from the offset to the end of the request.
+
+    Raises:
+        UnicodeDecodeError: If the text is not valid UTF-8.
+    """
+    return str(request[offset:], 'utf-8')
+
+
+def to_bytes(request) -> bytes:
+    """
+    Returns a request as bytes, e.g. to queue it for another client. Bytes are returned as they are.
+    """
+    return request if type(request) is bytes else bytes(request)
+
+
+@lru_cache(maxsize=256)
+def _opponents_layout(count: int) -> struct.Struct:
+    return struct.Struct(f'>BI{count}I')  # 0x06, number of IDs, the IDs
+
+
+@lru_cache(maxsize=256)
+def _lobby_page_layout(count: int) -> struct.Struct:
+    return struct.Struct(f'>BIII{count}I')  # 0x15, number of matching players, cursor of the next page, number of IDs, the IDs
+
+
+@lru_cache(maxsize=128)
+def _leaderboard_layout(count: int) -> struct.Struct:
+    return struct.Struct(f'>BBB{count * 9}I')  # 0x22, order, number of records, the records
+
+
+def encode_client_id(client_id: int) -> bytes:
+    return CLIENT_ID.pack(0x03, client_id)
+
+
+def encode_opponents(ids: Sequence[int]) -> bytes:
+    """
+    Encodes the 0x06 list of opponents with one pack into a single buffer.
+    """
+    return _opponents_layout(len(ids)).pack(0x06, len(ids), *ids)
+
+
+def encode_lobby_page(ids: Sequence[int], total: int, next_id: int) -> bytes:
+    """
+    Encodes the 0x15 page of the lobby with one pack into a single buffer.
+    """
+    return _lobby_page_layout(len(ids)).pack(0x15, total, next_id, len(ids), *ids)
+
+
+def encode_player_stats(stats: Sequence[int]) -> bytes:
+    """
+    Encodes the 0x20 statistics of a player, the nine fields of a `PlayerStats` record.
+    """
+    return PLAYER_STATS.pack(0x20, *stats)
+
+
+def encode_leaderboard(order: int, players: Sequence[Sequence[int]]) -> bytes:
+    """
+    Encodes the 0x22 leaderboard with one pack into a single buffer, a 0x20 record without control byte per player.
+    """
+    return _leaderboard_layout(len(players)).pack(0x22, order, len(players), *chain.from_iterable(players))
+
+
+def encode_guess_results(guess, correct: bool) -> Tuple[bytes, bytes]:
+    """
+    Encodes the answers to a guess, from the UTF-8 bytes of the guess as they were received.
+
+    Args:
+        guess: The UTF-8 encoded guess, e.g. a view into the request.
+        correct (bool): Whether the guess is the word.
+
+    Returns:
+        Tuple[bytes, bytes]: The message for the setter and the one for the guesser.
+    """
+    if correct:
+        return (b''.join((b'\x0CThe opponent guessed the word "', guess, b'" correctly. You lost the game.')),
+                b''.join((b'\x0CThe word "', guess, b'" is correct. You won the game.')))
+    message = b''.join((b'\x0DThe guess "', guess, b'" is incorrect.'))
+    return message, message
+
+
+def dispatch_table(handlers: Dict[int, Callable]) -> Tuple[Optional[Callable], ...]:
+    """
+    Builds the table of the request handlers, indexed by the control byte.
+
+    Args:
+        handlers (Dict[int, Callable]): The handler of every control byte the server answers.
+
+    Returns:
+        Tuple[Optional[Callable], ...]: 256 entries, None for control bytes which are ignored.
+    """
+    table: List[Optional[Callable]] = [None] * 256
+    for control_byte, handler in handlers.items():
+        table[control_byte] = handler
+    return tuple(table)
@@ -0,0 +1,501 @@
+import os  # Import the os module for positional reads of the segment file
+import struct  # Import struct for the binary record layout
+import sys  # Import sys for string interning
+import tempfile  # Import tempfile for the default anonymous segment file
+import threading  # Import threading for the store lock
+import time  # Import time for the finish time of the stored games
+from array import array  # Import array for compact integer indexes
+from collections import OrderedDict, deque  # Import containers for the in-memory window and the page-in cache
+from typing import Dict, Iterator, List, Optional, Tuple  # Import type hints for better code readability
+
+GameKey = Tuple[int, int]  # (ID of the player who set the word, ID of the player who guesses it)
+
+DEFAULT_MEMORY_CAP = 10000  # Number of completed games kept in memory
+PAGE_CACHE_SIZE = 256  # Number of games paged back in from the segment file kept around
+
+# Record layout in the segment file:
+# game ID, setter ID, guesser ID, ID of the player who left (0 if none), started at, finished at,
+# number of attempts, number of hints
+# followed by the word, the result, the attempts and the hints, each as a 2-byte length + UTF-8 bytes
+_RECORD_HEADER = struct.Struct('>QIIIddHH')
+_STRING_LENGTH = struct.Struct('>H')
+
+
+class CompletedGame:
+    """
+    Compact, immutable record of a finished game.
+
+    Words and results repeat a lot between games, so they are interned and all games share one
+    copy of each string. Attempts and hints are stored as tuples instead of lists.
+
+    Attributes:
+        game_id (int): Sequence number of the game in the store, starting with 1.
+        setter_id (int): The ID of the player who set the word.
+        guesser_id (int): The ID of the player who guessed the word.
+        word (str): The word to guess.
+        attempts (Tuple[str, ...]): The guesses in the order they were made.
+        hints (Tuple[str, ...]): The hints in the order they were sent.
+        result (str): The result, e.g. 'success', 'gave up', 'connection lost' or 'timeout'.
+        started_at (float): Unix time when the game was created.
+        finished_at (float): Unix time when the game finished.
+        left_by (int): The player whose disconnect ended the game with 'connection lost', 0 otherwise.
+    """
+    __slots__ = ('game_id', 'setter_id', 'guesser_id', 'word', 'attempts', 'hints', 'result', 'started_at', 'finished_at',
+                 'left_by')
+
+    def __init__(self, game_id: int, setter_id: int, guesser_id: int, word: str, attempts, hints, result: str,
+                 started_at: float, finished_at: float, left_by: int = 0):
+        self.game_id = game_id
+        self.setter_id = setter_id
+        self.guesser_id = guesser_id
+        self.word = sys.intern(word)
+        self.attempts = tuple(sys.intern(attempt) for attempt in attempts)
+        self.hints = tuple(hints)
+        self.result = sys.intern(result)
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.left_by = left_by
+
+    @property
+    def key(self) -> GameKey:
+        """
+        GameKey: The (setter ID, guesser ID) pair of the game.
+        """
+        return (self.setter_id, self.guesser_id)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the game in the dictionary format of the active games.
+
+        Returns:
+            dict: e.g. {'word': 'test', 'attempts': ['a', 'test'], 'hints': ['te__'], 'result': 'success'}
+        """
+        return {
+            'word': self.word,
+            'attempts': list(self.attempts),
+            'hints': list(self.hints),
+            'result': self.result
+        }
+
+    def encode(self) -> bytes:
+        """
+        Encodes the game for the segment file.
+
+        Returns:
+            bytes: The binary record.
+        """
+        parts = [_RECORD_HEADER.pack(self.game_id, self.setter_id, self.guesser_id, self.left_by, self.started_at,
+                                     self.finished_at, len(self.attempts), len(self.hints))]
+        for text in (self.word, self.result) + self.attempts + self.hints:
+            data = text.encode('utf-8')
+            parts.append(_STRING_LENGTH.pack(len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+    @classmethod
+    def decode(cls, data, offset: int = 0) -> Tuple['CompletedGame', int]:
+        """
+        Decodes a binary record.
+
+        Args:
+            data: The buffer holding the record.
+            offset (int): The position of the record in the buffer.
+
+        Returns:
+            Tuple[CompletedGame, int]: The game and the position right after the record.
+        """
+        game_id, setter_id, guesser_id, left_by, started_at, finished_at, attempts_count, hints_count = \
+            _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+
+        texts = []
+        for _ in range(2 + attempts_count + hints_count):
+            (length,) = _STRING_LENGTH.unpack_from(data, offset)
+            offset += _STRING_LENGTH.size
+            texts.append(bytes(data[offset:offset + length]).decode('utf-8'))
+            offset += length
+
+        word, result = texts[0], texts[1]
+        attempts = texts[2:2 + attempts_count]
+        hints = texts[2 + attempts_count:]
+        return cls(game_id, setter_id, guesser_id, word, attempts, hints, result, started_at, finished_at, left_by), offset
+
+
+class CompletedGameStore:
+    """
+    Bounded store of completed games.
+
+    Every finished game is appended to a segment file right away, but only the newest `memory_cap`
+    games are also kept in memory. Older games are evicted from memory and only their file offsets
+    stay around, they are decoded from the file again when they are looked up. Because games are
+    evicted in the order they finished, the games which are only on disk always form the
+    contiguous range of IDs below the in-memory ones.
+
+    The finish times never decrease with the ID: `add` takes the time under the store lock and
+    never goes back behind the previous game, so a period of time is a contiguous range of IDs.
+
+    The memory used is therefore bounded by `memory_cap` games plus the offset index, which is the
+    only part growing with the history: 8 bytes per game, 8 MB per million games (`index_bytes`).
+    The index of the games of a pair of players only covers the in-memory games, it shrinks with
+    every eviction.
+
+    With a `spill_path`, the segment file and its offset index (`spill_path + '.idx'`, written by
+    `sync`) survive a restart and the store can be reopened with `resume_count`.
+
+    Attributes:
+        memory_cap (int): The maximum number of games kept in memory.
+        spill_path (Optional[str]): The path of the segment file, None for an anonymous temporary file.
+    """
+
+    def __init__(self, memory_cap: int = DEFAULT_MEMORY_CAP, spill_path: Optional[str] = None,
+                 resume_count: Optional[int] = None):
+        """
+        Initializes a CompletedGameStore.
+
+        Args:
+            memory_cap (int): The maximum number of games kept in memory.
+            spill_path (Optional[str]): The path of the segment file, None for an anonymous temporary file.
+            resume_count (Optional[int]): Reopen the existing segment file and keep its first
+                `resume_count` games, anything written after them is discarded. None starts empty.
+        """
+        self.memory_cap = max(1, memory_cap)
+        self.spill_path = spill_path
+        self._lock = threading.Lock()
+        self._recent: deque = deque()  # In-memory games, oldest first
+        self._next_id = 1
+        self._offsets = array('Q')  # File offset of every game, index = game ID - 1
+        self._spill_end = 0  # Size of the segment file
+        self._synced = 0  # Number of games whose offsets are in the index file
+        self._last_finished = 0.0  # finished_at of the newest game, no later game finished before it
+        self._by_player_pair: Dict[GameKey, deque] = {}  # IDs of the in-memory games of each pair of players
+        self._page_cache: 'OrderedDict[int, CompletedGame]' = OrderedDict()
+
+        if spill_path is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='completed_games_', suffix='.seg')
+        elif resume_count is not None and os.path.exists(spill_path):
+            self._spill_file = open(spill_path, 'r+b')
+            self._resume(resume_count)
+        else:
+            self._spill_file = open(spill_path, 'w+b')
+            open(spill_path + '.idx', 'wb').close()
+
+    def _resume(self, count: int):
+        """
+        Rebuilds the offsets of the first `count` games of an existing segment file.
+
+        The offsets synced to the index file are loaded as they are, only the games written after the
+        last sync are decoded from the segment file, so the work is proportional to that tail.
+        """
+        index_path = self.spill_path + '.idx'
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as index_file:
+                data = index_file.read()
+            self._offsets.frombytes(data[:len(data) - len(data) % self._offsets.itemsize])
+            if sys.byteorder != 'little':
+                self._offsets.byteswap()  # The index file is always little endian
+            del self._offsets[count:]
+
+        fd = self._spill_file.fileno()
+        size = os.fstat(fd).st_size
+        position = self._offsets[-1] if self._offsets else 0
+        if self._offsets:
+            del self._offsets[-1]  # Decode the last indexed game again to find where it ends
+
+        while len(self._offsets) < count and position < size:
+            data = os.pread(fd, min(size - position, 1 << 20), position)
+            view = memoryview(data)
+            offset = 0
+            try:
+                while len(self._offsets) < count and offset < len(view):
+                    _, end = CompletedGame.decode(view, offset)
+                    self._offsets.append(position + offset)
+                    offset = end
+            except (struct.error, UnicodeDecodeError):
+                if offset == 0:
+                    break  # Torn record at the end of the file
+            position += offset
+
+        self._spill_end = position
+        self._spill_file.truncate(position)
+        self._synced = 0  # Rewrite the index on the next sync
+        self._next_id = len(self._offsets) + 1
+        if self._offsets:
+            self._last_finished = self._read_spilled(self._next_id - 1, self._next_id)[0].finished_at
+
+    def add(self, setter_id: int, guesser_id: int, game: dict, finished_at: Optional[float] = None) -> CompletedGame:
+        """
+        Stores a finished game.
+
+        The finish time is raised to that of the previous game if it is earlier, e.g. after a step of
+        the wall clock, so the finish times follow the IDs.
+
+        Args:
+            setter_id (int): The ID of the player who set the word.
+            guesser_id (int): The ID of the player who guessed the word.
+            game (dict): The finished game in the format of the active games, including the result
+                and 'left_by' for a game ended by a disconnect.
+            finished_at (Optional[float]): Unix time when the game finished, now if None.
+
+        Returns:
+            CompletedGame: The stored record.
+        """
+        with self._lock:
+            finished_at = max(time.time() if finished_at is None else finished_at, self._last_finished)
+            self._last_finished = finished_at
+            record = CompletedGame(self._next_id, setter_id, guesser_id, game['word'], game['attempts'],
+                                   game['hints'], game['result'], game.get('started_at', finished_at), finished_at,
+                                   game.get('left_by', 0))
+            self._next_id += 1
+
+            data = record.encode()
+            os.pwrite(self._spill_file.fileno(), data, self._spill_end)
+            self._offsets.append(self._spill_end)
+            self._spill_end += len(data)
+
+            self._recent.append(record)
+            self._by_player_pair.setdefault(record.key, deque()).append(record.game_id)
+            if len(self._recent) > self.memory_cap:
+                evicted = self._recent.popleft()  # Already on disk, just drop it from memory
+                game_ids = self._by_player_pair[evicted.key]
+                game_ids.popleft()  # The oldest game of its pair
+                if not game_ids:
+                    del self._by_player_pair[evicted.key]
+            return record
+
+    def sync(self) -> int:
+        """
+        Makes the stored games durable.
+
+        Appends the offsets of the games stored since the last sync to the index file and flushes
+        both files to disk.
+
+        Returns:
+            int: The number of games which are durable.
+        """
+        with self._lock:
+            count = len(self._offsets)
+            new_offsets = self._offsets[self._synced:count]
+            synced = self._synced
+
+        os.fsync(self._spill_file.fileno())
+        if self.spill_path is not None:
+            if sys.byteorder != 'little':
+                new_offsets.byteswap()
+            with open(self.spill_path + '.idx', 'r+b' if synced else 'wb') as index_file:
+                index_file.seek(synced * new_offsets.itemsize)
+                index_file.write(new_offsets.tobytes())
+                index_file.truncate()
+                index_file.flush()
+                os.fsync(index_file.fileno())
+
+        with self._lock:
+            self._synced = max(self._synced, count)
+        return count
+
+    def __len__(self) -> int:
+        return self._next_id - 1
+
+    @property
+    def index_bytes(self) -> int:
+        """
+        int: The memory held by the offsets of all games, the part of the store growing with the history.
+        """
+        return len(self._offsets) * self._offsets.itemsize
+
+    @property
+    def spilled(self) -> int:
+        """
+        int: The number of games which live only in the segment file.
+        """
+        return len(self) - len(self._recent)
+
+    def get(self, game_id: int) -> Optional[CompletedGame]:
+        """
+        Returns a completed game, reading it from the segment file if it was evicted.
+
+        Args:
+            game_id (int): The ID of the game.
+
+        Returns:
+            Optional[CompletedGame]: The game, None if there is no such game.
+        """
+        games = self.range(game_id, game_id + 1)
+        return games[0] if games else None
+
+    def range(self, first_id: int, stop_id: int) -> List[CompletedGame]:
+        """
+        Returns the games with IDs in [first_id, stop_id), oldest first.
+
+        Evicted games of the range are read from the segment file with a single read, without holding
+        the store lock, so reading the history doesn't hold up `add`.
+
+        Args:
+            first_id (int): The ID of the first game.
+            stop_id (int): The ID after the last game.
+
+        Returns:
+            List[CompletedGame]: The games.
+        """
+        with self._lock:
+            first_id = max(first_id, 1)
+            stop_id = min(stop_id, self._next_id)
+            if first_id >= stop_id:
+                return []
+
+            first_in_memory = self._next_id - len(self._recent)
+            recent = [self._recent[game_id - first_in_memory] for game_id in range(max(first_id, first_in_memory), stop_id)]
+        if first_id >= first_in_memory:
+            return recent
+        # Evicted games stay where they are in the segment file, they can be read after the lock is released
+        return self._read_spilled(first_id, min(stop_id, first_in_memory)) + recent
+
+    def _read_spilled(self, first_id: int, stop_id: int) -> List[CompletedGame]:
+        """
+        Reads a contiguous range of evicted games, the lock is only held to look up the offsets and the cache.
+        """
+        with self._lock:
+            if stop_id - first_id == 1 and first_id in self._page_cache:
+                self._page_cache.move_to_end(first_id)
+                return [self._page_cache[first_id]]
+            start = self._offsets[first_id - 1]
+            end = self._offsets[stop_id - 1] if stop_id - 1 < len(self._offsets) else self._spill_end
+
+        data = memoryview(os.pread(self._spill_file.fileno(), end - start, start))
+        games = []
+        offset = 0
+        while offset < len(data):
+            game, offset = CompletedGame.decode(data, offset)
+            games.append(game)
+
+        if len(games) == 1:  # Single lookups tend to repeat (e.g. the game detail page), cache them
+            with self._lock:
+                self._page_cache[first_id] = games[0]
+                if len(self._page_cache) > PAGE_CACHE_SIZE:
+                    self._page_cache.popitem(last=False)
+        return games
+
+    def iter_games(self, newest_first: bool = False, page_size: int = 500) -> Iterator[CompletedGame]:
+        """
+        Iterates over all games, paging evicted ones back in `page_size` games at a time.
+
+        Args:
+            newest_first (bool): Iterate from the most recently finished game.
+            page_size (int): The number of games read at once.
+
+        Yields:
+            CompletedGame: The games.
+        """
+        stop_id = self._next_id
+        if newest_first:
+            for page_stop in range(stop_id, 1, -page_size):
+                yield from reversed(self.range(page_stop - page_size, page_stop))
+        else:
+            for page_start in range(1, stop_id, page_size):
+                yield from self.range(page_start, min(page_start + page_size, stop_id))
+
+    def export(self, since: Optional[float] = None, until: Optional[float] = None, player: Optional[int] = None,
+               after_id: int = 0, page_size: int = 500) -> Iterator[CompletedGame]:
+        """
+        Iterates over the games finished in a period, oldest first, `page_size` games in memory at a time.
+
+        The finish times never decrease with the ID (see `add`), so the first game of the period is
+        found with a binary search and the iteration stops at the first game after it. Games finished
+        after the iteration started are left out.
+
+        Args:
+            since (Optional[float]): Only games finished at this Unix time or later.
+            until (Optional[float]): Only games finished before this Unix time.
+            player (Optional[int]): Only games of this player, as setter or guesser.
+            after_id (int): Only games with a higher ID, to continue an earlier iteration.
+            page_size (int): The number of games read at once.
+
+        Yields:
+            CompletedGame: The games.
+        """
+        stop_id = self._next_id
+        first_id = after_id + 1
+        if since is not None:
+            first_id = max(first_id, self._first_finished(since))
+        for page_start in range(first_id, stop_id, page_size):
+            for game in self.range(page_start, min(page_start + page_size, stop_id)):
+                if until is not None and game.finished_at >= until:
+                    return
+                if player is None or player == game.setter_id or player == game.guesser_id:
+                    yield game
+
+    def _first_finished(self, since: float) -> int:
+        """
+        Returns the ID of the first game finished at `since` or later, a binary search over the IDs.
+        """
+        low, high = 1, self._next_id
+        while low < high:
+            middle = (low + high) // 2
+            if self.range(middle, middle + 1)[0].finished_at < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def newest(self, count: int, skip: int = 0, player: Optional[int] = None,
+               result: Optional[str] = None) -> Tuple[List[CompletedGame], bool]:
+        """
+        Returns a page of the most recently finished games, newest first.
+
+        Without filters the page is a single range read, with filters the games are scanned from
+        the newest until the page is full.
+
+        Args:
+            count (int): The number of games on the page.
+            skip (int): The number of matching newer games before the page.
+            player (Optional[int]): Only games of this player, as setter or guesser.
+            result (Optional[str]): Only games with this result.
+
+        Returns:
+            Tuple[List[CompletedGame], bool]: The games and whether there are older ones.
+        """
+        if player is None and result is None:
+            stop_id = len(self) + 1 - skip
+            games = self.range(stop_id - count, stop_id)
+            games.reverse()
+            return games, stop_id - count > 1
+
+        games = []
+        for game in self.iter_games(newest_first=True):
+            if player is not None and player not in (game.setter_id, game.guesser_id):
+                continue
+            if result is not None and game.result != result:
+                continue
+            if skip:
+                skip -= 1
+            elif len(games) == count:
+                return games, True
+            else:
+                games.append(game)
+        return games, False
+
+    def games_of_pair(self, game_key: GameKey) -> List[CompletedGame]:
+        """
+        Returns all completed games of a pair of players.
+
+        The in-memory games are found with the pair index, the evicted ones are read from the segment
+        file a page at a time, a scan proportional to the number of evicted games.
+
+        Args:
+            game_key (GameKey): The (setter ID, guesser ID) pair.
+
+        Returns:
+            List[CompletedGame]: The games, oldest first.
+        """
+        with self._lock:
+            stop_id = self._next_id - len(self._recent)  # First in-memory game
+            game_ids = list(self._by_player_pair.get(game_key, ()))
+        games = [game for page_start in range(1, stop_id, 500)
+                 for game in self.range(page_start, min(page_start + 500, stop_id)) if game.key == game_key]
+        games.extend(game for game_id in game_ids for game in self.range(game_id, game_id + 1))
+        return games
+
+    def close(self):
+        """
+        Closes the segment file.
+        """
+        self._spill_file.close()
@@ -0,0 +1,420 @@
+import asyncio  # Import asyncio for the transport type hint
+import itertools  # Import itertools to take a batch of queued messages
+import queue  # Import queue to hand connections over to the flusher thread
+import selectors  # Import selectors to wait until stalled sockets become writable
+import socket  # Import the socket module for type hints and the send flags
+import threading  # Import threading for the queue lock and the flusher thread
+from collections import deque  # Import deque for the outbound queue
+from contextlib import contextmanager  # Import contextmanager for the corked helper
+from typing import Deque, Iterator, List, Optional  # Import type hints for better code readability
+from framing import FRAME_HEADER  # Import the frame header used when the client selected the framed protocol
+from metrics import METRICS, SENT_BYTES, SEND_STALLS, DROPPED_MESSAGES  # Import the instrumentation of the outbound queues
+from log import LOG  # Import the logger, records are written by a background thread
+
+MAX_QUEUED_BYTES = 256 * 1024  # Default bound of the outbound data waiting for a client
+DISCONNECT = 'disconnect'  # Overflow policy: disconnect a client which doesn't read
+DROP = 'drop'  # Overflow policy: drop the messages which don't fit
+OVERFLOW_POLICIES = (DISCONNECT, DROP)
+MAX_IOVECS = 512  # Buffers passed to one sendmsg, below IOV_MAX of common platforms
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)  # Unix only, the write fails instead of blocking
+
+
+class Connection:
+    """
+    Base class of the objects stored in `Server.clients`.
+
+    The rest of the server only calls `send` and `close` on a connection, so the same protocol
+    code runs over a blocking socket (threaded engine) and an asyncio transport (asyncio engine).
+    Once the client selects the framed protocol, `send` prefixes every message with its length.
+
+    `send` never blocks: the message is queued and written by the I/O layer as soon as the client
+    reads. At most `max_queued_bytes` may wait for a client, a client which doesn't read is then
+    disconnected or its messages are dropped, depending on `overflow_policy`.
+
+    Attributes:
+        framed (bool): Whether outbound messages are length-prefixed.
+        max_queued_bytes (int): The bound of the outbound data waiting for the client.
+        overflow_policy (str): DISCONNECT or DROP, what happens when a message doesn't fit.
+        dropped (int): The number of messages which didn't fit.
+    """
+    __slots__ = ('framed', 'max_queued_bytes', 'overflow_policy', 'dropped')  # Thousands of these live at once, so keep them small
+
+    def __init__(self, max_queued_bytes: int = MAX_QUEUED_BYTES, overflow_policy: str = DISCONNECT):
+        """
+        Initializes a new Connection instance in the unframed (compatibility) mode.
+
+        Args:
+            max_queued_bytes (int): The bound of the outbound data waiting for the client.
+            overflow_policy (str): DISCONNECT or DROP.
+        """
+        self.framed = False
+        self.max_queued_bytes = max_queued_bytes
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+
+    def send(self, message: bytes) -> int:
+        """
+        Queues one protocol message (control byte + data) for the client.
+
+        Args:
+            message (bytes): The message to send.
+
+        Returns:
+            int: The length of the message, mirroring `socket.send`.
+        """
+        if self.framed:
+            self.enqueue([FRAME_HEADER.pack(len(message)), message])
+        else:
+            self.enqueue([message])
+        return len(message)
+
+    def fits(self, size: int) -> bool:
+        """
+        Checks the bound before `size` more bytes are queued, applies the overflow policy if they don't fit.
+
+        A single message always fits into an empty queue, whatever its size.
+
+        Returns:
+            bool: True if the data may be queued.
+        """
+        queued = self.queued_bytes
+        if queued == 0 or queued + size <= self.max_queued_bytes:
+            METRICS.count(SENT_BYTES, value=size)
+            return True
+        self.dropped += 1
+        METRICS.count(DROPPED_MESSAGES)
+        if self.overflow_policy == DISCONNECT and self.dropped == 1:
+            LOG.warning('connection', "Disconnecting a client which stopped reading, %d bytes queued.", queued)
+            self.abort()
+        return False
+
+    @contextmanager
+    def corked(self) -> Iterator[None]:
+        """
+        Holds back the messages sent within the with block and writes them together when it ends.
+
+        Used while handling a batch of pipelined requests, so their responses leave in one write.
+        """
+        self.cork()
+        try:
+            yield
+        finally:
+            self.uncork()
+
+    def cork(self):
+        pass
+
+    def uncork(self):
+        pass
+
+    @property
+    def queued_bytes(self) -> int:
+        """
+        int: The number of bytes waiting to be written to the client.
+        """
+        raise NotImplementedError
+
+    def enqueue(self, buffers: List[bytes]):
+        """
+        Queues the buffers of one message for writing.
+
+        Args:
+            buffers (List[bytes]): The buffers, written in order without copying them together.
+        """
+        raise NotImplementedError
+
+    def abort(self):
+        """
+        Closes the connection without writing the queued data, the reading side notices and cleans up.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Closes the underlying socket or transport.
+        """
+        raise NotImplementedError
+
+
+class OutboundFlusher:
+    """
+    Writes the queued data of socket connections whose socket buffer was full, used by the threaded engine.
+
+    A sender first writes its message itself without blocking. Whatever the socket didn't take
+    stays in the outbound queue of the connection, which is then handed over to this single thread.
+    It waits until the socket is writable and writes everything queued meanwhile with one vectored
+    write. So a client which doesn't read never blocks the thread of its opponent.
+    """
+
+    def __init__(self):
+        """
+        Initializes the flusher, the thread starts on the first stalled connection.
+        """
+        self._selector = selectors.DefaultSelector()
+        self._requests: 'queue.SimpleQueue[tuple]' = queue.SimpleQueue()  # (watch?, connection), applied by the thread
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def watch(self, connection: 'SocketConnection'):
+        """
+        Flushes the connection once its socket becomes writable.
+        """
+        self._request(True, connection)
+
+    def forget(self, connection: 'SocketConnection'):
+        """
+        Stops watching a closed connection.
+        """
+        self._request(False, connection)
+
+    def _request(self, watch: bool, connection: 'SocketConnection'):
+        self._requests.put((watch, connection))
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='outbound-flusher', daemon=True)
+                    self._thread.start()
+        try:
+            self._wakeup_writer.send(b'\0')
+        except BlockingIOError:
+            pass  # A wakeup is already pending
+
+    def _apply_requests(self):
+        while True:
+            try:
+                watch, connection = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if watch:
+                    self._selector.register(connection.sock, selectors.EVENT_WRITE, connection)
+                else:
+                    self._selector.unregister(connection.sock)
+            except (KeyError, ValueError, OSError):
+                pass  # Already registered, already gone or closed meanwhile
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.fileobj is self._wakeup_reader:
+                    try:
+                        while self._wakeup_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                if key.data.flush():  # Everything written (or the connection failed), stop watching
+                    try:
+                        self._selector.unregister(key.fileobj)
+                    except (KeyError, ValueError):
+                        pass
+            self._apply_requests()
+
+
+class SocketConnection(Connection):
+    """
+    Connection over a blocking socket, used by the threaded engine.
+
+    The sending thread writes with MSG_DONTWAIT, so the socket stays blocking for the reading
+    thread. Messages which don't fit into the socket buffer wait in the outbound queue, and all
+    waiting messages are written with a single sendmsg once the `OutboundFlusher` sees the socket
+    writable again.
+
+    Attributes:
+        sock (socket.socket): The socket of the connected client.
+        flusher (OutboundFlusher): The thread writing the queues of stalled sockets.
+    """
+    __slots__ = ('sock', 'flusher', '_lock', '_outbox', '_queued_bytes', '_waiting', '_corked')
+
+    def __init__(self, sock: socket.socket, flusher: OutboundFlusher, max_queued_bytes: int = MAX_QUEUED_BYTES,
+                 overflow_policy: str = DISCONNECT):
+        """
+        Initializes a new SocketConnection instance.
+
+        Args:
+            sock (socket.socket): The socket of the connected client.
+            flusher (OutboundFlusher): The thread writing the queues of stalled sockets.
+            max_queued_bytes (int): The bound of the outbound data waiting for the client.
+            overflow_policy (str): DISCONNECT or DROP.
+        """
+        super().__init__(max_queued_bytes, overflow_policy)
+        self.sock = sock
+        self.flusher = flusher
+        self._lock = threading.Lock()  # Senders of any thread and the flusher share the queue
+        self._outbox: Deque[memoryview] = deque()
+        self._queued_bytes = 0
+        self._waiting = False  # Handed over to the flusher
+        self._corked = False
+
+    def recv(self, bufsize: int) -> bytes:
+        """
+        Receives data from the client, blocks until some data is available.
+
+        Args:
+            bufsize (int): The maximum amount of data to receive.
+
+        Returns:
+            bytes: The received data, empty when the client closed the connection.
+        """
+        return self.sock.recv(bufsize)
+
+    @property
+    def queued_bytes(self) -> int:
+        return self._queued_bytes
+
+    def enqueue(self, buffers: List[bytes]):
+        with self._lock:
+            if not self.fits(sum(map(len, buffers))):
+                return
+            for buffer in buffers:
+                self._outbox.append(memoryview(buffer))
+                self._queued_bytes += len(buffer)
+            if not self._waiting and not self._corked:
+                self._write_queued()
+
+    def cork(self):
+        with self._lock:
+            self._corked = True
+
+    def uncork(self):
+        with self._lock:
+            self._corked = False
+            if not self._waiting and self._outbox:
+                self._write_queued()
+
+    def _write_queued(self):
+        """
+        Writes as much of the queue as the socket takes without blocking, the caller holds the lock.
+
+        Hands the connection over to the flusher if something is left.
+        """
+        if self._write_some():
+            return
+        METRICS.count(SEND_STALLS)
+        self._waiting = True
+        self.flusher.watch(self)
+
+    def _write_some(self) -> bool:
+        """
+        Writes the queue with vectored writes until it is empty or the socket buffer is full.
+
+        Returns:
+            bool: True if nothing is left to write, either written or discarded because the connection failed.
+        """
+        while self._outbox:
+            batch = list(itertools.islice(self._outbox, MAX_IOVECS))
+            try:
+                sent = self.sock.sendmsg(batch, (), _MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return False
+            except OSError:
+                self._outbox.clear()  # The client is gone, its reader thread cleans up
+                self._queued_bytes = 0
+                return True
+
+            self._queued_bytes -= sent
+            while sent:
+                head = self._outbox[0]
+                if sent >= len(head):
+                    sent -= len(head)
+                    self._outbox.popleft()
+                else:
+                    self._outbox[0] = head[sent:]  # Partially written, keep the rest
+                    sent = 0
+        return True
+
+    def flush(self) -> bool:
+        """
+        Called by the flusher when the socket is writable.
+
+        Returns:
+            bool: True if the queue is empty and the flusher can stop watching.
+        """
+        with self._lock:
+            if self._write_some():
+                self._waiting = False
+                return True
+            return False
+
+    def abort(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # Wakes up the reader thread, which closes the socket
+        except OSError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._outbox and not self._waiting:
+                self._write_some()  # One last attempt, e.g. the wrong password answer
+            self._outbox.clear()
+            self._queued_bytes = 0
+            if self._waiting:
+                self._waiting = False
+                self.flusher.forget(self)
+        self.sock.close()
+
+
+class TransportConnection(Connection):
+    """
+    Connection over an asyncio transport, used by the asyncio engine.
+
+    `transport.write` never blocks, the loop flushes the data when the socket becomes writable. The
+    write buffer of the transport is the outbound queue, its size is checked against the bound.
+
+    Attributes:
+        transport (asyncio.Transport): The transport of the connected client.
+    """
+    __slots__ = ('transport', '_corked')
+
+    def __init__(self, transport: asyncio.Transport, max_queued_bytes: int = MAX_QUEUED_BYTES,
+                 overflow_policy: str = DISCONNECT):
+        """
+        Initializes a new TransportConnection instance.
+
+        Args:
+            transport (asyncio.Transport): The transport of the connected client.
+            max_queued_bytes (int): The bound of the outbound data waiting for the client.
+            overflow_policy (str): DISCONNECT or DROP.
+        """
+        super().__init__(max_queued_bytes, overflow_policy)
+        self.transport = transport
+        self._corked: Optional[List[bytes]] = None
+
+    @property
+    def queued_bytes(self) -> int:
+        return self.transport.get_write_buffer_size() + sum(map(len, self._corked or ()))
+
+    def enqueue(self, buffers: List[bytes]):
+        if not self.fits(sum(map(len, buffers))):
+            return
+        if self._corked is not None:
+            self._corked.extend(buffers)
+            return
+        idle = not self.transport.get_write_buffer_size()
+        if len(buffers) == 1:
+            self.transport.write(buffers[0])
+        else:
+            self.transport.writelines(buffers)
+        if idle and self.transport.get_write_buffer_size():  # The socket didn't take it all, the loop waits until it is writable
+            METRICS.count(SEND_STALLS)
+
+    def cork(self):
+        self._corked = []
+
+    def uncork(self):
+        buffers, self._corked = self._corked, None
+        if buffers:
+            idle = not self.transport.get_write_buffer_size()
+            self.transport.writelines(buffers)  # One vectored write where the loop supports it
+            if idle and self.transport.get_write_buffer_size():
+                METRICS.count(SEND_STALLS)
+
+    def abort(self):
+        self.transport.abort()
+
+    def close(self):
+        self.transport.close()  # The loop calls connection_lost once the buffered data is flushed
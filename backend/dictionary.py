@@ -0,0 +1,316 @@
+import bisect  # Import bisect to find an edge among the sorted edges of a node
+import mmap  # Import mmap to map the index file instead of reading it
+import struct  # Import struct for the header of the index file
+import sys  # Import sys to check the byte order of the host
+from array import array  # Import array to write the node and edge tables
+from itertools import islice  # Import islice to stop a pattern query after a number of words
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple  # Import type hints for better code readability
+
+MAGIC = b'GGDAWG01'  # First bytes of an index file
+HEADER = struct.Struct('<8sIII')  # Magic, number of nodes, number of edges, number of words
+WILDCARD = '_'  # Unknown letter of a pattern, e.g. 'te__'
+LONG_WORD = 31  # Bit of the length masks shared by all words with this many letters or more
+HINT_COUNT_LIMIT = 2000  # Matching words counted per candidate hint, more are treated as equally many
+
+
+class _BuildNode:
+    """
+    A node of the word graph while it is built.
+    """
+    __slots__ = ('edges', 'terminal')
+
+    def __init__(self):
+        self.edges: Dict[str, '_BuildNode'] = {}  # letter -> child, in ascending order
+        self.terminal = False
+
+    def signature(self) -> Tuple:
+        return self.terminal, tuple((letter, id(child)) for letter, child in self.edges.items())
+
+
+def normalize(word: str) -> str:
+    """
+    Returns the form of a word stored in the index, e.g. 'Test' ==> 'test'.
+    """
+    return word.strip().lower()
+
+
+def build_index(words: Iterable[str], path: str) -> int:
+    """
+    Builds the word index file from a word list.
+
+    The words are stored as a minimal acyclic automaton (a DAWG): a trie whose equal subtrees are
+    merged, so common prefixes and common endings like '-ing' are stored once. It is built in one
+    pass over the sorted words, every finished branch is merged with an equal registered one.
+
+    Every node also stores a bit mask of the numbers of letters which lead from it to the end of
+    a word (bit 0: the node ends a word, bit LONG_WORD: LONG_WORD letters or more), so pattern
+    queries skip the branches without a word of the requested length.
+
+    Args:
+        words (Iterable[str]): The words, e.g. the lines of a word list. Words with anything but
+            letters (e.g. "don't") are skipped, the others are stored lowercase.
+        path (str): The index file to write.
+
+    Returns:
+        int: The number of stored words.
+    """
+    words = sorted({normalize(word) for word in words if normalize(word).isalpha()})
+    root = _BuildNode()
+    register: Dict[Tuple, _BuildNode] = {}
+    unchecked: List[Tuple[_BuildNode, str, _BuildNode]] = []  # (parent, letter, child) of the last word
+
+    def minimize(down_to: int):
+        while len(unchecked) > down_to:
+            parent, letter, child = unchecked.pop()
+            signature = child.signature()
+            if signature in register:
+                parent.edges[letter] = register[signature]
+            else:
+                register[signature] = child
+
+    previous = ''
+    for word in words:
+        common = 0
+        while common < min(len(word), len(previous)) and word[common] == previous[common]:
+            common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else root
+        for letter in word[common:]:
+            child = _BuildNode()
+            node.edges[letter] = child
+            unchecked.append((node, letter, child))
+            node = child
+        node.terminal = True
+        previous = word
+    minimize(0)
+
+    # Number the nodes breadth first, the root is node 0
+    numbers = {id(root): 0}
+    nodes = [root]
+    for node in nodes:
+        for child in node.edges.values():
+            if id(child) not in numbers:
+                numbers[id(child)] = len(nodes)
+                nodes.append(child)
+
+    masks = array('I', [0]) * len(nodes)
+    for index in _post_order(nodes, numbers):
+        node = nodes[index]
+        mask = 1 if node.terminal else 0
+        for child in node.edges.values():
+            child_mask = masks[numbers[id(child)]]
+            mask |= ((child_mask << 1) & 0xFFFFFFFF) | (child_mask & (1 << LONG_WORD))
+        masks[index] = mask
+
+    first = array('I')  # Index of the first edge of every node, the edges of node n end where those of n + 1 start
+    letters = array('I')  # Code point of every edge
+    targets = array('I')  # Node every edge leads to
+    for node in nodes:
+        first.append(len(letters))
+        for letter, child in node.edges.items():
+            letters.append(ord(letter))
+            targets.append(numbers[id(child)])
+    first.append(len(letters))
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(nodes), len(letters), len(words)))
+        for table in (first, masks, letters, targets):
+            if sys.byteorder == 'big':
+                table.byteswap()  # The file is little endian on every host
+            table.tofile(file)
+    return len(words)
+
+
+def _post_order(nodes: List[_BuildNode], numbers: Dict[int, int]) -> Iterator[int]:
+    """
+    Yields the node numbers so that every node comes after all of its children.
+    """
+    done = set()
+    stack = [(0, False)]
+    while stack:
+        index, expanded = stack.pop()
+        if expanded:
+            yield index
+        elif index not in done:
+            done.add(index)
+            stack.append((index, True))
+            stack.extend((numbers[id(child)], False) for child in nodes[index].edges.values())
+
+
+class WordIndex:
+    """
+    Read-only view of an index file written by `build_index`.
+
+    The file is memory mapped and its tables are used in place, so opening it costs the same for
+    ten words or a million and every process opening the same file shares one copy in the page
+    cache. Looking up a word follows one edge per letter (a binary search among the edges of a
+    node), independent of the number of words.
+
+    Attributes:
+        path (str): The index file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Maps an index file.
+
+        Args:
+            path (str): The index file.
+
+        Raises:
+            ValueError: If the file is not a word index.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, node_count, edge_count, self._words = HEADER.unpack_from(self._map)
+        if magic != MAGIC or len(self._map) != HEADER.size + 4 * (2 * node_count + 1 + 2 * edge_count):
+            self._map.close()
+            raise ValueError(f"{path} is not a word index, build it with 'python dictionary.py build'")
+
+        offset = HEADER.size
+        tables = []
+        for count in (node_count + 1, node_count, edge_count, edge_count):
+            tables.append(self._table(offset, count))
+            offset += 4 * count
+        self._first, self._masks, self._letters, self._targets = tables
+
+    def _table(self, offset: int, count: int):
+        view = memoryview(self._map)[offset:offset + 4 * count]
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        table = array('I', view)  # A copy on big endian hosts
+        table.byteswap()
+        view.release()
+        return table
+
+    def __len__(self) -> int:
+        return self._words
+
+    def __contains__(self, word: str) -> bool:
+        node = 0
+        for letter in normalize(word):
+            node = self._child(node, letter)
+            if node < 0:
+                return False
+        return bool(self._masks[node] & 1)
+
+    def _child(self, node: int, letter: str) -> int:
+        """
+        Returns the node the letter leads to from the node, -1 if there is none.
+        """
+        low, high = self._first[node], self._first[node + 1]
+        code = ord(letter)
+        index = bisect.bisect_left(self._letters, code, low, high)
+        if index < high and self._letters[index] == code:
+            return self._targets[index]
+        return -1
+
+    def _walk(self, pattern: str) -> Iterator[str]:
+        """
+        Yields the words matching the pattern in ascending order.
+        """
+        length = len(pattern)
+        masks, first, letters, targets = self._masks, self._first, self._letters, self._targets
+        stack = [(0, 0, '')]  # (node, depth, prefix)
+        while stack:
+            node, depth, prefix = stack.pop()
+            if not masks[node] & (1 << min(length - depth, LONG_WORD)):  # No word of the right length below
+                continue
+            if depth == length:
+                yield prefix
+                continue
+            letter = pattern[depth]
+            if letter != WILDCARD:
+                child = self._child(node, letter)
+                if child >= 0:
+                    stack.append((child, depth + 1, prefix + letter))
+            else:
+                for edge in range(first[node + 1] - 1, first[node] - 1, -1):  # Reversed, the stack pops the lowest first
+                    stack.append((targets[edge], depth + 1, prefix + chr(letters[edge])))
+
+    def matches(self, pattern: str, limit: int = 100) -> List[str]:
+        """
+        Returns the words matching a pattern.
+
+        Args:
+            pattern (str): Letters at their positions and WILDCARD for any letter, e.g. 'te__'.
+            limit (int): The most words returned.
+
+        Returns:
+            List[str]: The first matching words in ascending order, e.g. ['teal', 'team', 'tear'].
+        """
+        return list(islice(self._walk(normalize(pattern)), limit))
+
+    def count(self, pattern: str, limit: int = HINT_COUNT_LIMIT) -> int:
+        """
+        Returns the number of words matching a pattern, at most the limit.
+        """
+        return sum(1 for _ in islice(self._walk(normalize(pattern)), limit))
+
+    def close(self):
+        for table in (self._first, self._masks, self._letters, self._targets):
+            if isinstance(table, memoryview):
+                table.release()
+        self._map.close()
+
+
+def auto_hint(word: str, hints: List[str], index: Optional[WordIndex] = None) -> Optional[str]:
+    """
+    Reveals one more letter of the word, e.g. ('test', ['t___']) ==> 'te__'.
+
+    The letters revealed by earlier hints of this form stay revealed. With an index, the letter
+    which leaves the fewest dictionary words matching the hint is revealed, otherwise the first
+    hidden one. The last hidden letter is never revealed.
+
+    Args:
+        word (str): The word to guess.
+        hints (List[str]): The hints given so far, hints of another form are ignored.
+        index (Optional[WordIndex]): The dictionary.
+
+    Returns:
+        Optional[str]: The hint, None if only one letter is hidden.
+    """
+    pattern = [WILDCARD] * len(word)
+    for hint in hints:
+        if len(hint) == len(word) and all(shown in (WILDCARD, letter) for shown, letter in zip(hint, word)):
+            for position, shown in enumerate(hint):
+                if shown != WILDCARD:
+                    pattern[position] = shown
+    hidden = [position for position, shown in enumerate(pattern) if shown == WILDCARD]
+    if len(hidden) < 2:
+        return None
+
+    def revealed(position: int) -> str:
+        return ''.join(pattern[:position]) + word[position] + ''.join(pattern[position + 1:])
+
+    if index is None:
+        return revealed(hidden[0])
+    return min((revealed(position) for position in hidden), key=index.count)  # min keeps the first of equal counts
+
+
+if __name__ == "__main__":
+    import argparse  # Import the argparse module for command-line argument handling
+    import time  # Import time to report the build duration
+    parser = argparse.ArgumentParser(description='Build or query the word index of the guess game server')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build an index from a word list with one word per line')
+    build.add_argument('words', help='the word list, e.g. /usr/share/dict/words')
+    build.add_argument('index', help='the index file to write')
+    query = commands.add_parser('query', help='look up a word or a pattern like te__')
+    query.add_argument('index', help='the index file')
+    query.add_argument('pattern', help='a word, or a pattern with _ for unknown letters')
+    query.add_argument('--limit', type=int, default=100, help='the most words listed (default: 100)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        with open(args.words, encoding='utf-8', errors='ignore') as word_list:
+            count = build_index(word_list, args.index)
+        print(f"Indexed {count} words into {args.index} in {time.perf_counter() - started:.1f} s")
+    else:
+        dictionary = WordIndex(args.index)
+        if WILDCARD in args.pattern:
+            print('\n'.join(dictionary.matches(args.pattern, args.limit)))
+        else:
+            print(f"{args.pattern!r} is {'' if args.pattern in dictionary else 'not '}in the dictionary")
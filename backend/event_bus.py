@@ -0,0 +1,146 @@
+import itertools  # Import itertools for the event IDs
+import json  # Import json to encode the events once for all subscribers
+import queue  # Import queue for the per subscriber queues
+import threading  # Import threading for the subscriber lock
+from typing import List, Optional  # Import type hints for better code readability
+from completed_store import CompletedGame  # Import the CompletedGame record of the 'finished' events
+from game_registry import GameEvent, GameKey  # Import the events published by the registry
+
+SUBSCRIBER_QUEUE_SIZE = 1000  # Events a subscriber may fall behind before it is dropped
+
+
+def game_event_json(event: GameEvent) -> dict:
+    """
+    Converts a game event to its JSON form.
+
+    Args:
+        event (GameEvent): The event.
+
+    Returns:
+        dict: e.g. {'kind': 'attempt', 'setter_id': 1, 'guesser_id': 2, 'value': 'tent', 'timestamp': 1700000000.0},
+        the value of a 'finished' event is the completed game, see `completed_game_json`.
+    """
+    value = completed_game_json(event.value) if isinstance(event.value, CompletedGame) else event.value
+    return {'kind': event.kind, 'setter_id': event.game_key[0], 'guesser_id': event.game_key[1],
+            'value': value, 'timestamp': event.timestamp}
+
+
+def completed_game_json(game: CompletedGame) -> dict:
+    """
+    Converts a completed game to its JSON form, e.g. {'game_id': 7, 'setter_id': 1, 'guesser_id': 2, 'word': 'test', ...}.
+    """
+    data = {'game_id': game.game_id, 'setter_id': game.setter_id, 'guesser_id': game.guesser_id}
+    data.update(game.to_dict())
+    data['started_at'] = game.started_at
+    data['finished_at'] = game.finished_at
+    data['left_by'] = game.left_by or None
+    return data
+
+
+class Subscription:
+    """
+    The queue of encoded events of one subscriber.
+
+    Attributes:
+        player (Optional[int]): Only events of games of this player, all events if None.
+        dropped (bool): Set when the subscriber fell too far behind, it gets no more events.
+    """
+    __slots__ = ('player', 'dropped', '_queue')
+
+    def __init__(self, player: Optional[int] = None, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.player = player
+        self.dropped = False
+        self._queue: 'queue.Queue[bytes]' = queue.Queue(queue_size)
+
+    def offer(self, game_key: GameKey, message: bytes):
+        """
+        Queues an event of the game without blocking, drops the subscriber if its queue is full.
+
+        Args:
+            game_key (GameKey): The key of the game the event belongs to.
+            message (bytes): The encoded event.
+        """
+        if self.dropped or (self.player is not None and self.player not in game_key):
+            return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped = True
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        """
+        Waits for the next event.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            Optional[bytes]: The encoded event, None on timeout.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    Fans the game events of the registry out to any number of subscribers, e.g. Server-Sent Events streams.
+
+    `publish` is registered as a registry listener, so it runs in the handler thread which changed
+    the game. It encodes the event once as an SSE message and only puts the same bytes on the queue
+    of every subscriber, it never blocks: a subscriber whose queue is full is dropped and has to
+    reconnect.
+    """
+
+    def __init__(self):
+        """
+        Initializes an EventBus without subscribers.
+        """
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, player: Optional[int] = None) -> Subscription:
+        """
+        Adds a subscriber.
+
+        Args:
+            player (Optional[int]): Only events of games of this player, all events if None.
+
+        Returns:
+            Subscription: The subscription, to be removed with `unsubscribe`.
+        """
+        subscription = Subscription(player)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]  # Copy on write, publish iterates without the lock
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Removes a subscriber.
+
+        Args:
+            subscription (Subscription): The subscription returned by `subscribe`.
+        """
+        with self._lock:
+            self._subscriptions = [other for other in self._subscriptions if other is not subscription]
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, event: GameEvent):
+        """
+        Delivers a game event to all subscribers, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        subscriptions = self._subscriptions
+        if not subscriptions:
+            return
+
+        message = (f"id: {next(self._ids)}\nevent: {event.kind}\n"
+                   f"data: {json.dumps(game_event_json(event), separators=(',', ':'))}\n\n").encode('utf-8')
+        for subscription in subscriptions:
+            subscription.offer(event.game_key, message)
@@ -0,0 +1,94 @@
+import csv  # Import csv to quote the fields of the CSV export
+import io  # Import io for the line buffer of the CSV writer
+import json  # Import json for the NDJSON export and the lists within CSV fields
+import math  # Import math to reject bounds which are not finite
+from datetime import datetime, timezone  # Import datetime to parse the ISO 8601 bounds of an export
+from typing import Iterable, Iterator  # Import type hints for better code readability
+from completed_store import CompletedGame  # Import the CompletedGame record which is exported
+from event_bus import completed_game_json  # Import the JSON form of completed games, one NDJSON line each
+
+# Content types of the export formats
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_COLUMNS = ('game_id', 'setter_id', 'guesser_id', 'word', 'result', 'attempts', 'hints', 'started_at', 'finished_at',
+               'left_by')
+CHUNK_SIZE = 64 * 1024  # Bytes of lines collected before they are written as one chunk
+
+
+def parse_time(text: str) -> float:
+    """
+    Parses a bound of an export, Unix time or ISO 8601 (UTC unless the offset is given).
+
+    Args:
+        text (str): e.g. '1700000000', '2026-10-16' or '2026-10-16T08:00:00+02:00'.
+
+    Returns:
+        float: The Unix time.
+
+    Raises:
+        ValueError: If the text is neither, or not finite (e.g. 'nan' or 'inf').
+    """
+    try:
+        value = float(text)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(value):
+            raise ValueError(f"{text} is not a finite time")
+        return value
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def ndjson_lines(games: Iterable[CompletedGame]) -> Iterator[str]:
+    """
+    Yields one JSON object per game and line, in the form of /api/completed.
+    """
+    for game in games:
+        yield json.dumps(completed_game_json(game), separators=(',', ':')) + '\n'
+
+
+def csv_lines(games: Iterable[CompletedGame]) -> Iterator[str]:
+    """
+    Yields the header and one line per game, the attempts and hints as JSON arrays.
+    """
+    yield ','.join(CSV_COLUMNS) + '\n'
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for game in games:
+        writer.writerow((game.game_id, game.setter_id, game.guesser_id, game.word, game.result,
+                         json.dumps(game.attempts), json.dumps(game.hints), game.started_at, game.finished_at,
+                         game.left_by or ''))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_chunks(games: Iterable[CompletedGame], export_format: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encodes games for an export, lazily: only the lines of one chunk are held at a time.
+
+    Args:
+        games (Iterable[CompletedGame]): The games, e.g. `CompletedGameStore.export`.
+        export_format (str): 'ndjson' or 'csv'.
+        chunk_size (int): The size a chunk reaches before it is yielded.
+
+    Yields:
+        bytes: The chunks, every one ends with a complete line.
+    """
+    lines = ndjson_lines(games) if export_format == 'ndjson' else csv_lines(games)
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
@@ -0,0 +1,116 @@
+import struct  # Import struct for packing the frame header
+from typing import List, Union  # Import type hints for better code readability
+
+# Protocol versions a client can select with the 0x12 message
+PROTOCOL_VERSION_UNFRAMED = 0  # Compatibility mode, every read from the socket is one message
+PROTOCOL_VERSION_FRAMED = 1  # Every message is prefixed with its length
+SUPPORTED_VERSIONS = (PROTOCOL_VERSION_UNFRAMED, PROTOCOL_VERSION_FRAMED)
+
+# Frame header, 4-byte unsigned integer in big endian format holding the length of the message which follows
+FRAME_HEADER = struct.Struct('>I')
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+MAX_FRAME_SIZE = 64 * 1024  # Upper bound for a single inbound message, protects the server from huge allocations
+VIEW_MIN_SIZE = 256  # Smaller messages are copied, a memoryview object (184 bytes) outweighs the copy of a short message
+
+
+class FrameError(ValueError):
+    """
+    Raised when the peer sends a frame which violates the framing rules, e.g. an oversized frame.
+    The connection cannot be resynchronized afterwards and has to be closed.
+    """
+
+
+def encode_frame(message: bytes) -> bytes:
+    """
+    Prefixes the message with its length.
+
+    Args:
+        message (bytes): The message (control byte + data).
+
+    Returns:
+        bytes: The framed message, e.g. b'\x08' ==> b'\x00\x00\x00\x01\x08'
+    """
+    return FRAME_HEADER.pack(len(message)) + message
+
+
+class FrameDecoder:
+    """
+    Streaming decoder for length-prefixed frames.
+
+    TCP does not preserve message boundaries, one read may contain several messages or only a part
+    of one. The decoder buffers the incomplete tail and returns every complete message in the order
+    they were sent.
+
+    Attributes:
+        max_frame_size (int): The largest accepted message.
+    """
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        """
+        Initializes a new FrameDecoder instance.
+
+        Args:
+            max_frame_size (int): The largest accepted message, larger frames raise FrameError.
+        """
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()  # Incomplete frame left over from the previous reads
+
+    def feed(self, data: bytes) -> List[Union[bytes, memoryview]]:
+        """
+        Feeds received data into the decoder.
+
+        If nothing was buffered, messages of VIEW_MIN_SIZE bytes and more are read-only views into
+        the data, they are not copied. Messages completing a buffered frame are copied out of the
+        buffer, which changes with the next read.
+
+        Args:
+            data (bytes): The data read from the socket.
+
+        Returns:
+            List[Union[bytes, memoryview]]: The complete messages (without the header), empty frames are skipped.
+
+        Raises:
+            FrameError: If a frame exceeds the maximum frame size.
+        """
+        buffered = bool(self._buffer)
+        if buffered:
+            self._buffer += data
+            view = memoryview(self._buffer)
+        else:
+            view = memoryview(data)  # Fast path, nothing buffered so parse the read directly without copying it
+
+        frames = []
+        offset = 0
+        end = len(view)
+        while end - offset >= FRAME_HEADER_SIZE:
+            (length,) = FRAME_HEADER.unpack_from(view, offset)
+            if length > self.max_frame_size:
+                view.release()
+                raise FrameError(f"Frame of {length} bytes exceeds the limit of {self.max_frame_size} bytes")
+
+            start = offset + FRAME_HEADER_SIZE
+            if end - start < length:  # The rest of the frame has not arrived yet
+                break
+            if length:
+                if length >= VIEW_MIN_SIZE and not buffered:
+                    frames.append(view[start:start + length])
+                else:
+                    frames.append(bytes(view[start:start + length]))
+            offset = start + length
+
+        if buffered:
+            view.release()  # The bytearray can't be resized while a view is exported
+            del self._buffer[:offset]  # Drop the consumed frames, keep the incomplete tail
+        else:
+            if offset < end:
+                self._buffer += view[offset:]  # Keep only the incomplete tail
+            view.release()  # The views of the frames keep the data alive on their own
+        return frames
+
+    @property
+    def pending(self) -> int:
+        """
+        int: The number of buffered bytes which do not form a complete frame yet.
+        """
+        return len(self._buffer)
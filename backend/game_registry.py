@@ -0,0 +1,367 @@
+import itertools  # Import itertools for the version counter
+import threading  # Import threading for the shard and game locks
+import time  # Import time for the game timestamps
+from contextlib import contextmanager  # Import contextmanager for the locked_game helper
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from completed_store import CompletedGame, CompletedGameStore  # Import the bounded store of completed games
+
+GameKey = Tuple[int, int]  # (ID of the player who set the word, ID of the player who guesses it)
+
+DEFAULT_SHARDS = 16  # Number of independently locked shards
+
+
+class GameEvent(NamedTuple):
+    """
+    A change of a game, passed to the registry listeners.
+
+    Attributes:
+        kind (str): 'created' (value: the word), 'attempt' (value: the guess), 'hint' (value: the hint)
+            or 'finished' (value: the CompletedGame).
+        game_key (GameKey): The key of the game.
+        value (object): The kind specific value.
+        timestamp (float): Unix time of the change.
+    """
+    kind: str
+    game_key: GameKey
+    value: object
+    timestamp: float
+
+
+class _Shard:
+    """
+    One independently locked part of the registry.
+
+    A game lives in the shard of the player who set the word, the index entry of a player lives in
+    the shard of that player. The lock only guards the dictionaries, it is held for a few dictionary
+    operations at a time.
+    """
+    __slots__ = ('lock', 'games', 'players', 'game_locks')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.games: Dict[GameKey, dict] = {}
+        self.players: Dict[int, GameKey] = {}
+        self.game_locks: Dict[GameKey, threading.RLock] = {}
+
+
+class GameRegistry:
+    """
+    Owns the active and completed games and keeps an index of which player is in which game.
+
+    Every lookup the ClientHandler needs (the game of a player, whether a player is busy) is a
+    single dictionary access instead of a scan over all active games.
+
+    The state is split into shards, each with its own lock, so handler threads working on unrelated
+    games don't wait for each other. On top of that every active game has its own lock which a
+    handler holds for the whole read-check-update of a request (see `locked_game`), so two requests
+    of the same game are applied one after another. Readers such as the web dashboard get
+    consistent copies of the active games from `snapshot_games`. Finished games are handed over to
+    the bounded `CompletedGameStore`.
+
+    `version` changes with every change of a game, readers can keep anything derived from the
+    games until it changes. Read it before reading the games.
+
+    Lock order: game lock, then shard locks in ascending shard index.
+    """
+
+    def __init__(self, shards: int = DEFAULT_SHARDS, completed: Optional[CompletedGameStore] = None):
+        """
+        Initializes an empty GameRegistry.
+
+        Args:
+            shards (int): The number of independently locked shards.
+            completed (Optional[CompletedGameStore]): The store of completed games, a default store if None.
+        """
+        self._shards = [_Shard() for _ in range(shards)]
+        self.completed = completed if completed is not None else CompletedGameStore()
+        self._listeners: List[Callable[[GameEvent], None]] = []
+        self._versions = itertools.count(1)  # next() is atomic, no lock needed
+        self.version = 0
+
+    def add_listener(self, listener: Callable[[GameEvent], None]):
+        """
+        Registers a callable which receives a GameEvent for every change of a game.
+
+        Listeners are called synchronously by the thread which made the change, with the game lock
+        held, so events of one game arrive in order. They must be quick, e.g. put the event on a queue.
+
+        Args:
+            listener (Callable[[GameEvent], None]): The listener.
+        """
+        self._listeners.append(listener)
+
+    def _changed(self):
+        self.version = next(self._versions)  # Unique per change, so a cached version never matches a later state
+
+    def _emit(self, kind: str, game_key: GameKey, value: object, timestamp: Optional[float] = None):
+        self._changed()
+        if self._listeners:
+            event = GameEvent(kind, game_key, value, time.time() if timestamp is None else timestamp)
+            for listener in self._listeners:
+                listener(event)
+
+    def _shard(self, player_id: int) -> _Shard:
+        return self._shards[player_id % len(self._shards)]
+
+    def _lock_shards(self, *player_ids: int) -> List[_Shard]:
+        """
+        Acquires the locks of the shards of the given players in ascending shard index.
+
+        Returns:
+            List[_Shard]: The locked shards, to be released with `_unlock_shards`.
+        """
+        indexes = sorted({player_id % len(self._shards) for player_id in player_ids})
+        shards = [self._shards[index] for index in indexes]
+        for shard in shards:
+            shard.lock.acquire()
+        return shards
+
+    def _lock_all_shards(self) -> List[_Shard]:
+        return self._lock_shards(*range(len(self._shards)))
+
+    @staticmethod
+    def _unlock_shards(shards: List[_Shard]):
+        for shard in reversed(shards):
+            shard.lock.release()
+
+    def create(self, setter_id: int, guesser_id: int, word: str) -> Optional[dict]:
+        """
+        Creates a new active game if neither of the players is in a game.
+
+        The check and the creation are atomic, two players can't be matched with the same opponent
+        at the same time. 'created' is emitted with the lock of the new game held, so no other event
+        of the game overtakes it.
+
+        Args:
+            setter_id (int): The ID of the player who set the word.
+            guesser_id (int): The ID of the player who guesses the word.
+            word (str): The word to guess.
+
+        Returns:
+            Optional[dict]: The new game, or None if one of the players is already in a game.
+        """
+        game_key = (setter_id, guesser_id)
+        game_lock = threading.RLock()
+        with game_lock:  # Taken before the shard locks, like every game lock
+            shards = self._lock_shards(setter_id, guesser_id)
+            try:
+                if setter_id in self._shard(setter_id).players or guesser_id in self._shard(guesser_id).players:
+                    return None
+
+                game = {
+                    'word': word,
+                    'attempts': [],  # list for attempts
+                    'hints': [],  # list for hints
+                    'started_at': time.time()
+                }
+                self._insert(game_key, game, game_lock)
+            finally:
+                self._unlock_shards(shards)
+
+            self._emit('created', game_key, word, game['started_at'])
+        return game
+
+    def _insert(self, game_key: GameKey, game: dict, game_lock: Optional[threading.RLock] = None):
+        """
+        Stores an active game and indexes its players, the caller holds the shard locks of both players.
+        """
+        shard = self._shard(game_key[0])
+        shard.games[game_key] = game
+        shard.game_locks[game_key] = game_lock if game_lock is not None else threading.RLock()
+        shard.players[game_key[0]] = game_key
+        self._shard(game_key[1]).players[game_key[1]] = game_key
+
+    def restore(self, game_key: GameKey, game: dict):
+        """
+        Puts back an active game recovered after a restart, no events are emitted.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            game (dict): The game with its word, attempts, hints and start time.
+        """
+        shards = self._lock_shards(*game_key)
+        try:
+            self._insert(game_key, game)
+        finally:
+            self._unlock_shards(shards)
+        self._changed()
+
+    def reserve(self, player_id: int, game_key: GameKey) -> bool:
+        """
+        Marks a player as in a game which is kept by another worker process, see `cluster.Cluster`.
+
+        The player is indexed without a game of this registry: `find_game_key` returns the key,
+        `locked_game` yields (None, None) and `create` refuses further games until `release`.
+
+        Args:
+            player_id (int): The ID of the player.
+            game_key (GameKey): The key of the game.
+
+        Returns:
+            bool: False if the player is already in a game.
+        """
+        shard = self._shard(player_id)
+        with shard.lock:
+            if player_id in shard.players:
+                return False
+            shard.players[player_id] = game_key
+            return True
+
+    def release(self, player_id: int, game_key: GameKey):
+        """
+        Removes the reservation of a player made by `reserve` once the game finished elsewhere.
+
+        Args:
+            player_id (int): The ID of the player.
+            game_key (GameKey): The key of the game.
+        """
+        shard = self._shard(player_id)
+        with shard.lock:
+            if shard.players.get(player_id) == game_key:
+                del shard.players[player_id]
+
+    def find_game_key(self, player_id: int) -> Optional[GameKey]:
+        """
+        Returns the key of the active game of the player.
+
+        Args:
+            player_id (int): The ID of the player.
+
+        Returns:
+            Optional[GameKey]: The game key, or None if the player is not in a game.
+        """
+        shard = self._shard(player_id)
+        with shard.lock:
+            return shard.players.get(player_id)
+
+    def is_player_in_game(self, player_id: int) -> bool:
+        """
+        Checks if a given player is currently in an active game.
+
+        Args:
+            player_id (int): The ID of the player to check.
+
+        Returns:
+            bool: True if the player is in an active game, False otherwise.
+        """
+        return self.find_game_key(player_id) is not None
+
+    @contextmanager
+    def locked_game(self, player_id: int) -> Iterator[Tuple[Optional[GameKey], Optional[dict]]]:
+        """
+        Finds the active game of the player and holds its lock for the duration of the with block.
+
+        e.g.
+            with registry.locked_game(client_id) as (game_key, game):
+                if game is not None:
+                    ...
+
+        Args:
+            player_id (int): The ID of the player.
+
+        Yields:
+            Tuple[Optional[GameKey], Optional[dict]]: The game key and the game, (None, None) if the
+            player is not in a game (or the game finished while waiting for the lock).
+        """
+        game_key = self.find_game_key(player_id)
+        game = game_lock = None
+        if game_key is not None:
+            shard = self._shard(game_key[0])
+            with shard.lock:
+                game = shard.games.get(game_key)
+                game_lock = shard.game_locks.get(game_key)
+
+        if game_lock is None:
+            yield None, None
+            return
+
+        with game_lock:
+            with shard.lock:
+                still_active = shard.games.get(game_key) is game  # The same pair may have started a new game meanwhile
+            if still_active:
+                yield game_key, game
+            else:
+                yield None, None
+
+    def add_attempt(self, game_key: GameKey, guess: str):
+        """
+        Records a guess of an active game, the caller holds the game lock.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            guess (str): The guess.
+        """
+        shard = self._shard(game_key[0])
+        with shard.lock:
+            shard.games[game_key]['attempts'].append(guess)
+        self._emit('attempt', game_key, guess)
+
+    def add_hint(self, game_key: GameKey, hint: str):
+        """
+        Records a hint of an active game, the caller holds the game lock.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            hint (str): The hint.
+        """
+        shard = self._shard(game_key[0])
+        with shard.lock:
+            shard.games[game_key]['hints'].append(hint)
+        self._emit('hint', game_key, hint)
+
+    def finish(self, game_key: GameKey, result: str, left_by: int = 0) -> Optional[CompletedGame]:
+        """
+        Sets the result of an active game and moves it to the completed games.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            result (str): The result, e.g. 'success', 'gave up', 'connection lost' or 'timeout'.
+            left_by (int): The player whose disconnect ended the game, for 'connection lost'.
+
+        Returns:
+            Optional[CompletedGame]: The finished game, None if the game was already finished.
+        """
+        shards = self._lock_shards(*game_key)
+        try:
+            shard = self._shard(game_key[0])
+            game = shard.games.pop(game_key, None)
+            if game is None:
+                return None
+            del shard.game_locks[game_key]
+            game['result'] = result
+            if left_by:
+                game['left_by'] = left_by
+
+            for player_id in game_key:
+                players = self._shard(player_id).players
+                if players.get(player_id) == game_key:
+                    del players[player_id]
+        finally:
+            self._unlock_shards(shards)
+
+        record = self.completed.add(game_key[0], game_key[1], game)  # Timed by the store, in the order of the IDs
+        self._emit('finished', game_key, record, record.finished_at)
+        return record
+
+    def __len__(self) -> int:
+        """
+        Returns the number of active games, without locking as the shards may change meanwhile anyway.
+        """
+        return sum(len(shard.games) for shard in self._shards)
+
+    def snapshot_games(self) -> Dict[GameKey, dict]:
+        """
+        Returns a consistent copy of all active games.
+
+        Returns:
+            Dict[GameKey, dict]: Copies of the active games, safe to iterate while the games change.
+        """
+        shards = self._lock_all_shards()
+        try:
+            return {
+                game_key: {'word': game['word'], 'attempts': list(game['attempts']), 'hints': list(game['hints']),
+                           'started_at': game['started_at']}
+                for shard in shards for game_key, game in shard.games.items()
+            }
+        finally:
+            self._unlock_shards(shards)
@@ -0,0 +1,395 @@
+import json  # Import json for the event payloads and the snapshots
+import os  # Import the os module for low level file operations and fsync
+import queue  # Import queue to hand the events over to the writer thread
+import struct  # Import struct for the record header
+import threading  # Import threading for the writer thread
+import zlib  # Import zlib for the CRC32 of the records
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from game_registry import GameEvent, GameKey, GameRegistry  # Import the registry whose changes are journaled
+from log import LOG  # Import the logger, records are written by a background thread
+
+# Every journal record is a header (length of the payload, CRC32 of the payload) followed by the payload,
+# a JSON list, e.g. ['created', 1, 2, 'test', 1700000000.0]
+_RECORD_HEADER = struct.Struct('>II')
+
+SNAPSHOT_INTERVAL = 10000  # Number of journaled events after which a new snapshot is written
+MAX_BATCH = 4096  # Maximum number of events written with one fsync
+COMPLETED_SEGMENT = 'completed.seg'  # Segment file of the completed games inside the journal directory
+
+_fsync = getattr(os, 'fdatasync', os.fsync)  # fdatasync skips the metadata update where available
+
+
+def journal_path(directory: str, epoch: int) -> str:
+    return os.path.join(directory, f'journal-{epoch:08d}.log')
+
+
+def snapshot_path(directory: str, epoch: int) -> str:
+    return os.path.join(directory, f'snapshot-{epoch:08d}.json')
+
+
+def file_epoch(name: str) -> Optional[Tuple[str, int]]:
+    """
+    Parses the name of a journal or snapshot file.
+
+    Args:
+        name (str): The file name, e.g. 'snapshot-00000003.json'.
+
+    Returns:
+        Optional[Tuple[str, int]]: The kind ('journal' or 'snapshot') and the epoch, None for other files.
+    """
+    for kind, suffix in (('journal', '.log'), ('snapshot', '.json')):
+        prefix = kind + '-'
+        if name.startswith(prefix) and name.endswith(suffix) and name[len(prefix):-len(suffix)].isdigit():
+            return kind, int(name[len(prefix):-len(suffix)])
+    return None
+
+
+class RecoveredState(NamedTuple):
+    """
+    The state rebuilt from the latest snapshot and the journal written after it.
+
+    Attributes:
+        epoch (int): The epoch of the snapshot, 0 if there was none.
+        active (Dict[GameKey, dict]): The active games.
+        completed_count (int): The number of completed games of the segment file which belong to
+            the recovered state, anything after them is discarded.
+        finished (List[Tuple[GameKey, dict, float]]): Games which finished after them, in the order
+            of their IDs, as (game key, game with result, finished at).
+        max_player_id (int): The highest player ID seen, new clients have to get higher IDs.
+    """
+    epoch: int
+    active: Dict[GameKey, dict]
+    completed_count: int
+    finished: List[Tuple[GameKey, dict, float]]
+    max_player_id: int
+
+
+def event_payload(event: GameEvent) -> list:
+    """
+    Converts a game event to its journal payload.
+
+    Args:
+        event (GameEvent): The event.
+
+    Returns:
+        list: e.g. ['created', 1, 2, 'test', 1700000000.0], ['attempt', 1, 2, 'tent'], ['hint', 1, 2, 'te__']
+        or ['finished', 1, 2, 'success', 1700000042.0, 7, 0] (the completed game ID and the player who left, see
+        `CompletedGame.left_by`).
+    """
+    setter_id, guesser_id = event.game_key
+    if event.kind == 'created':
+        return [event.kind, setter_id, guesser_id, event.value, event.timestamp]
+    if event.kind == 'finished':
+        return [event.kind, setter_id, guesser_id, event.value.result, event.timestamp, event.value.game_id,
+                event.value.left_by]
+    return [event.kind, setter_id, guesser_id, event.value]  # 'attempt' or 'hint'
+
+
+def encode_payload(payload: list) -> bytes:
+    """
+    Encodes a journal payload as a record.
+
+    Args:
+        payload (list): The payload.
+
+    Returns:
+        bytes: The record, header + JSON.
+    """
+    data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return _RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def read_journal(path: str) -> Iterator[list]:
+    """
+    Reads the payloads of a journal file, stops at the first torn or corrupted record.
+
+    Args:
+        path (str): The journal file.
+
+    Yields:
+        list: The decoded payloads in the order they were written.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as journal_file:
+        data = journal_file.read()
+
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        length, checksum = _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            LOG.warning('journal', "Journal %s ends with a torn record at offset %d, ignoring the rest.", path, offset)
+            return
+        yield json.loads(payload)
+        offset = start + length
+
+
+def apply_payload(active: Dict[GameKey, dict], payload: list) -> Optional[Tuple[GameKey, dict, float, int]]:
+    """
+    Applies one journaled event to a dictionary of active games.
+
+    Args:
+        active (Dict[GameKey, dict]): The active games, modified in place.
+        payload (list): The decoded journal payload.
+
+    Returns:
+        Optional[Tuple[GameKey, dict, float, int]]: For a 'finished' event the (game key, game with
+        result, finished at, completed game ID), None otherwise.
+    """
+    kind, game_key = payload[0], (payload[1], payload[2])
+    if kind == 'created':
+        active[game_key] = {'word': payload[3], 'attempts': [], 'hints': [], 'started_at': payload[4]}
+    elif kind == 'attempt' and game_key in active:
+        active[game_key]['attempts'].append(payload[3])
+    elif kind == 'hint' and game_key in active:
+        active[game_key]['hints'].append(payload[3])
+    elif kind == 'finished':
+        game = active.pop(game_key, None)
+        if game is not None:
+            game['result'] = payload[3]
+            if payload[6]:
+                game['left_by'] = payload[6]
+            return game_key, game, payload[4], payload[5]
+    return None
+
+
+def recover(directory: str) -> RecoveredState:
+    """
+    Rebuilds the games from the latest snapshot in the directory and the journal written after it.
+
+    Only the journal tail since the last snapshot is replayed, the completed games written before
+    the snapshot stay in the segment file and are not read at all.
+
+    Args:
+        directory (str): The journal directory.
+
+    Returns:
+        RecoveredState: The recovered state, empty if the directory holds no snapshot.
+    """
+    epochs = sorted(parsed[1] for parsed in map(file_epoch, os.listdir(directory))
+                    if parsed is not None and parsed[0] == 'snapshot')
+    if not epochs:
+        return RecoveredState(0, {}, 0, [], 0)
+
+    epoch = epochs[-1]
+    with open(snapshot_path(directory, epoch), 'r', encoding='utf-8') as snapshot_file:
+        snapshot = json.load(snapshot_file)
+
+    active = {
+        (setter_id, guesser_id): {'word': word, 'attempts': attempts, 'hints': hints, 'started_at': started_at}
+        for setter_id, guesser_id, word, attempts, hints, started_at in snapshot['active']
+    }
+    completed_count = snapshot['completed_count']
+    max_player_id = snapshot['max_player_id']
+    finished = [  # Journaled before the snapshot, but after a game with a lower ID which was still active
+        ((setter_id, guesser_id), {'word': word, 'attempts': attempts, 'hints': hints, 'started_at': started_at,
+                                   'result': result, 'left_by': left_by}, finished_at, game_id)
+        for setter_id, guesser_id, word, attempts, hints, started_at, result, finished_at, game_id, left_by
+        in snapshot.get('finished', ())
+    ]
+    replayed = 0
+
+    for payload in read_journal(journal_path(directory, epoch)):
+        replayed += 1
+        max_player_id = max(max_player_id, payload[1], payload[2])
+        result = apply_payload(active, payload)
+        if result is not None and result[3] > completed_count:  # Not in the snapshot's part of the segment file
+            finished.append(result)
+    finished.sort(key=lambda item: item[3])  # Added again in the order of their IDs
+
+    LOG.info('journal', "Recovered snapshot %d and %d journaled events: %d active games, %d completed games",
+             epoch, replayed, len(active), completed_count + len(finished))
+    return RecoveredState(epoch, active, completed_count, [item[:3] for item in finished], max_player_id)
+
+
+class GameJournal:
+    """
+    Write-ahead journal of game events with group commit.
+
+    The registry hands every event to `on_game_event`, which only puts it on a queue, so journaling
+    stays off the per-message latency path. A writer thread takes everything queued, writes it with
+    a single write and makes it durable with a single fsync. While one fsync is running the next
+    events pile up in the queue and are committed together, the busier the server the larger the
+    batches. An event is durable shortly after the request was answered, a crash loses at most the
+    batch which was being written.
+
+    Every `snapshot_interval` events the writer stores a snapshot of the active games and the
+    number of completed games, and starts a new journal file, so a restart only replays the events
+    written since the last snapshot. Both are taken from the journaled events, not from the
+    registry: a game whose 'finished' event is still queued is active in the snapshot, even though
+    the completed game store already holds it.
+
+    Attributes:
+        directory (str): The journal directory.
+        registry (GameRegistry): The registry whose events are journaled.
+        epoch (int): The epoch of the current snapshot and journal file.
+    """
+
+    def __init__(self, directory: str, registry: GameRegistry, epoch: int, snapshot_interval: int = SNAPSHOT_INTERVAL,
+                 max_player_id: int = 0):
+        """
+        Initializes a new GameJournal instance.
+
+        Args:
+            directory (str): The journal directory.
+            registry (GameRegistry): The registry whose events are journaled.
+            epoch (int): The epoch of the first snapshot written by `start`.
+            snapshot_interval (int): Number of events after which a new snapshot is written.
+            max_player_id (int): The highest player ID seen so far.
+        """
+        self.directory = directory
+        self.registry = registry
+        self.epoch = epoch
+        self.snapshot_interval = snapshot_interval
+        self._queue: 'queue.SimpleQueue[Optional[GameEvent]]' = queue.SimpleQueue()
+        self._active: Dict[GameKey, dict] = {}  # The active games as of the last written event
+        self._completed_count = 0  # Completed games up to which every 'finished' event was written
+        self._finished_ahead: Dict[int, Optional[list]] = {}  # Written 'finished' events above `_completed_count`
+        self._max_player_id = max_player_id
+        self._events_since_snapshot = 0
+        self._fd: Optional[int] = None
+        self._thread = threading.Thread(target=self._run, name='game-journal', daemon=True)
+
+    def start(self):
+        """
+        Writes the initial snapshot of the registry, starts the writer thread and subscribes to the registry.
+
+        Must be called before clients are served.
+        """
+        self._active = self.registry.snapshot_games()
+        self._completed_count = len(self.registry.completed)
+        for game_key in self._active:
+            self._max_player_id = max(self._max_player_id, *game_key)
+        self._write_snapshot()
+        self._thread.start()
+        self.registry.add_listener(self.on_game_event)
+        LOG.info('journal', "Journaling games to %s", self.directory)
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Queues a game event for the writer thread.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        self._queue.put(event)
+
+    def _run(self):
+        """
+        The writer thread, commits the queued events in batches.
+        """
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]  # Wait for the first event
+            while len(batch) < MAX_BATCH:  # Take everything else which piled up meanwhile
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            payloads = [event_payload(event) for event in batch if event is not None]
+            stopping = len(payloads) < len(batch)
+            try:
+                if payloads:
+                    os.write(self._fd, b''.join(map(encode_payload, payloads)))
+                    _fsync(self._fd)
+                    self._apply(payloads)
+                if stopping or self._events_since_snapshot >= self.snapshot_interval:
+                    self._write_snapshot()
+            except OSError as e:
+                LOG.error('journal', "Error writing the game journal: %s", e)
+
+    def _apply(self, payloads: List[list]):
+        """
+        Updates the copy of the active games which goes into the next snapshot.
+        """
+        for payload in payloads:
+            result = apply_payload(self._active, payload)
+            if payload[0] == 'created':
+                self._max_player_id = max(self._max_player_id, payload[1], payload[2])
+            elif payload[0] == 'finished':
+                self._finish(payload[5], result)
+        self._events_since_snapshot += len(payloads)
+
+    def _finish(self, game_id: int, result: Optional[Tuple[GameKey, dict, float, int]]):
+        """
+        Counts a written 'finished' event. Games of different shards may finish out of the order of
+        their IDs, the count only moves past a game once the events of all lower IDs are written.
+        """
+        if result is None:
+            self._finished_ahead[game_id] = None
+        else:
+            game_key, game, finished_at, _ = result
+            self._finished_ahead[game_id] = [game_key[0], game_key[1], game['word'], game['attempts'], game['hints'],
+                                             game['started_at'], game['result'], finished_at, game_id,
+                                             game.get('left_by', 0)]
+        while self._completed_count + 1 in self._finished_ahead:
+            self._completed_count += 1
+            del self._finished_ahead[self._completed_count]
+
+    def _write_snapshot(self):
+        """
+        Writes a snapshot of the journaled state and starts a new journal file.
+
+        The snapshot is written to a temporary file and renamed, so a crash leaves either the old or
+        the new snapshot. The journal and snapshot files of older epochs are removed afterwards.
+        """
+        self.registry.completed.sync()  # Every journaled completed game is durable now, and maybe a few more
+        epoch = self.epoch if self._fd is None else self.epoch + 1
+        snapshot = {
+            'epoch': epoch,
+            'completed_count': self._completed_count,
+            'max_player_id': self._max_player_id,
+            'active': [
+                [game_key[0], game_key[1], game['word'], game['attempts'], game['hints'], game['started_at']]
+                for game_key, game in self._active.items()
+            ],
+            'finished': [game for game in self._finished_ahead.values() if game is not None]
+        }
+
+        path = snapshot_path(self.directory, epoch)
+        with open(path + '.tmp', 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(',', ':'))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(path + '.tmp', path)
+
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(journal_path(self.directory, epoch), os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        self._sync_directory()
+
+        self.epoch = epoch
+        self._events_since_snapshot = 0
+        for name in os.listdir(self.directory):
+            parsed = file_epoch(name)
+            if parsed is not None and parsed[1] < epoch:
+                os.remove(os.path.join(self.directory, name))
+
+    def _sync_directory(self):
+        """
+        Makes the renamed and created files durable, where the platform supports it.
+        """
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """
+        Commits the queued events, writes a final snapshot and stops the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,252 @@
+import bisect  # Import bisect to keep the player lists sorted and to find a page
+import struct  # Import struct to pack the player IDs
+import threading  # Import threading for the lobby lock
+from typing import Callable, Dict, List, Optional, Tuple  # Import type hints for better code readability
+from connection import Connection  # Import the Connection type of the subscribers
+from game_registry import GameEvent  # Import the events which make players busy or idle
+
+# Kinds of a presence delta (0x17)
+JOINED = 0x01
+LEFT = 0x02
+BUSY = 0x03
+IDLE = 0x04
+
+# Filters of a lobby page (0x14)
+ALL_PLAYERS = 0x00
+IDLE_PLAYERS = 0x01
+
+DEFAULT_PAGE_SIZE = 100  # Players per page if the client asks for 0
+MAX_PAGE_SIZE = 1000  # Largest page, 4 KB of IDs
+
+PAGE_REQUEST = struct.Struct('>BIH')  # Filter, cursor (the last ID of the previous page), page size
+PAGE_HEADER = struct.Struct('>III')  # Number of matching players, cursor of the next page, number of IDs
+PRESENCE = struct.Struct('>BBI')  # 0x17, kind, player ID
+
+
+def pack_ids(ids: List[int]) -> bytes:
+    """
+    Packs player IDs as 4-byte big endian integers with one call, e.g. [1, 2] ==> b'\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x02'
+    """
+    return struct.pack(f'>{len(ids)}I', *ids)
+
+
+class Lobby:
+    """
+    The authorized players, which of them are idle (not in a game) and who follows their presence.
+
+    Both the list of all players and the list of idle players are kept sorted by ID, so a page
+    after a cursor is a binary search and a slice. IDs are handed out in ascending order, so a
+    joining player is appended at the end.
+
+    Every change (joined, left, busy, idle) is encoded once as a 0x17 message and queued for every
+    subscriber. The messages are queued with the lobby lock held, so every subscriber sees the
+    changes of a player in the order they happened. Queuing never blocks, a subscriber which
+    doesn't read is handled by the overflow policy of its connection.
+
+    In the cluster mode every worker process keeps a copy of the whole lobby: the changes of the
+    own players are passed to `relay`, those of the other workers arrive through `apply`.
+    """
+
+    def __init__(self, relay: Optional[Callable[[int, int], None]] = None):
+        """
+        Initializes an empty lobby.
+
+        Args:
+            relay (Optional[Callable[[int, int], None]]): Called with the kind and the player of
+                every change made here, the cluster mode passes them on to the other workers.
+        """
+        self._lock = threading.Lock()
+        self._players: List[int] = []  # Sorted IDs of all authorized players
+        self._idle: List[int] = []  # Sorted IDs of the players which are not in a game
+        self._subscribers: Dict[int, Connection] = {}  # player ID -> connection
+        self.relay: Optional[Callable[[int, int], None]] = relay
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    @property
+    def idle_count(self) -> int:
+        """
+        int: The number of players which are not in a game.
+        """
+        return len(self._idle)
+
+    @property
+    def subscriber_count(self) -> int:
+        """
+        int: The number of players following the presence deltas.
+        """
+        return len(self._subscribers)
+
+    def join(self, player_id: int, busy: bool = False):
+        """
+        Adds a freshly authorized player.
+
+        Args:
+            player_id (int): The ID of the player.
+            busy (bool): Whether the player is already in a game.
+        """
+        with self._lock:
+            self._change(JOINED, player_id)
+            if busy:
+                self._change(BUSY, player_id)
+
+    def leave(self, player_id: int):
+        """
+        Removes a disconnected player, including its subscription.
+
+        Args:
+            player_id (int): The ID of the player.
+        """
+        with self._lock:
+            self._subscribers.pop(player_id, None)
+            self._change(LEFT, player_id)
+
+    def set_busy(self, player_id: int):
+        with self._lock:
+            self._change(BUSY, player_id)
+
+    def set_idle(self, player_id: int):
+        with self._lock:
+            self._change(IDLE, player_id)
+
+    def apply(self, kind: int, player_id: int):
+        """
+        Applies a change relayed by another worker process of the server, it is not relayed again.
+
+        Args:
+            kind (int): JOINED, LEFT, BUSY or IDLE.
+            player_id (int): The ID of the player.
+        """
+        with self._lock:
+            if kind == LEFT:
+                self._subscribers.pop(player_id, None)
+            self._change(kind, player_id, relay=False)
+
+    def __contains__(self, player_id: int) -> bool:
+        with self._lock:
+            return _contains(self._players, player_id)
+
+    def player_ids(self) -> List[int]:
+        """
+        Returns a snapshot of the IDs of all players in ascending order.
+        """
+        with self._lock:
+            return list(self._players)
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Marks the players of a created game busy and of a finished game idle, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        if event.kind == 'created':
+            for player_id in event.game_key:
+                self.set_busy(player_id)
+        elif event.kind == 'finished':
+            for player_id in event.game_key:
+                self.set_idle(player_id)
+
+    def page(self, idle_only: bool, after_id: int, limit: int) -> Tuple[List[int], int, int]:
+        """
+        Returns one page of players in ascending ID order.
+
+        Args:
+            idle_only (bool): Only players which are not in a game.
+            after_id (int): The cursor, the page starts with the first ID above it, 0 for the first page.
+            limit (int): The number of IDs on the page.
+
+        Returns:
+            Tuple[List[int], int, int]: The IDs, the number of matching players and the cursor of
+            the next page (0 if this is the last page).
+        """
+        with self._lock:
+            players = self._idle if idle_only else self._players
+            start = bisect.bisect_right(players, after_id)
+            ids = players[start:start + limit]
+            more = start + limit < len(players)
+            return ids, len(players), ids[-1] if more and ids else 0
+
+    def subscribe(self, player_id: int, connection: Connection):
+        """
+        Queues the presence deltas for the player from now on.
+
+        Args:
+            player_id (int): The ID of the subscribing player.
+            connection (Connection): The connection of the player.
+        """
+        with self._lock:
+            if _contains(self._players, player_id):
+                self._subscribers[player_id] = connection
+
+    def unsubscribe(self, player_id: int):
+        with self._lock:
+            self._subscribers.pop(player_id, None)
+
+    def _change(self, kind: int, player_id: int, relay: bool = True):
+        """
+        Applies a change and publishes it unless it changed nothing, the caller holds the lock.
+        """
+        if kind == JOINED:
+            changed = _insert(self._players, player_id)
+            if changed:
+                _insert(self._idle, player_id)
+        elif kind == LEFT:
+            changed = _remove(self._players, player_id)
+            if changed:
+                _remove(self._idle, player_id)
+        elif kind == BUSY:
+            changed = _remove(self._idle, player_id)
+        else:
+            changed = _contains(self._players, player_id) and _insert(self._idle, player_id)
+        if changed:
+            self._publish(kind, player_id)
+            if relay and self.relay is not None:
+                self.relay(kind, player_id)
+
+    def _publish(self, kind: int, player_id: int):
+        """
+        Queues a presence delta for every subscriber, the caller holds the lock.
+        """
+        if not self._subscribers:
+            return
+        message = PRESENCE.pack(0x17, kind, player_id)  # Encoded once for all subscribers
+        for connection in self._subscribers.values():
+            connection.send(message)
+
+
+def _contains(items: List[int], item: int) -> bool:
+    index = bisect.bisect_left(items, item)
+    return index < len(items) and items[index] == item
+
+
+def _insert(items: List[int], item: int) -> bool:
+    """
+    Inserts an item into a sorted list unless it is there already.
+
+    Returns:
+        bool: True if the item was inserted.
+    """
+    if not items or items[-1] < item:  # The common case, the newest ID
+        items.append(item)
+        return True
+    index = bisect.bisect_left(items, item)
+    if index < len(items) and items[index] == item:
+        return False
+    items.insert(index, item)
+    return True
+
+
+def _remove(items: List[int], item: int) -> bool:
+    """
+    Removes an item from a sorted list.
+
+    Returns:
+        bool: True if the item was there.
+    """
+    index = bisect.bisect_left(items, item)
+    if index < len(items) and items[index] == item:
+        del items[index]
+        return True
+    return False
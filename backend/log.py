@@ -0,0 +1,256 @@
+import atexit  # Import atexit to write the pending records when the program exits
+import sys  # Import sys for the default output stream
+import threading  # Import threading for the writer thread
+import time  # Import time for the timestamps and the rate limit windows
+from collections import deque  # Import deque for the lock-free hand-off to the writer
+from typing import Deque, Dict, Optional, TextIO, Tuple  # Import type hints for better code readability
+
+# Levels, a record is written if its level is at least the configured one
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+LEVEL_NAMES = {level: name.upper() for name, level in LEVELS.items()}
+
+MAX_PENDING = 65536  # Records waiting for the writer, further records are dropped
+FLUSH_INTERVAL = 0.05  # Seconds between two writes of the writer thread
+DEFAULT_RATE_LIMIT = 1000  # Records per category and second, 0 for no limit
+
+Record = Tuple[float, int, str, str, tuple]  # (Unix time, level, category, message, format arguments)
+
+
+class _Category:
+    """
+    The sampling and rate limit state of one category.
+
+    The counters are updated without a lock, a lost update between two threads only shifts a
+    sample or lets one record more through, which is fine for logging.
+    """
+    __slots__ = ('sample_every', 'seen', 'rate_limit', 'window', 'in_window', 'suppressed')
+
+    def __init__(self, sample_every: int, rate_limit: int):
+        self.sample_every = sample_every  # Keep every n-th record, 1 keeps all
+        self.seen = 0
+        self.rate_limit = rate_limit
+        self.window = 0  # The second the in_window count belongs to
+        self.in_window = 0
+        self.suppressed = 0
+
+
+class AsyncLogger:
+    """
+    Leveled logger which hands the records off to a background writer thread.
+
+    The calling thread only checks the level, applies the sampling and the rate limit of the
+    category and appends a tuple to a deque, the message is formatted with its arguments (as with
+    the % operator) and written by the writer thread. So a handler never waits for the terminal,
+    e.g.
+
+        LOG.debug('request', "Received request: %r", data)
+
+    Every record belongs to a category, e.g. 'request' or 'game'. A category can be sampled
+    (only a fraction of its records is kept) and each category is limited to a number of records
+    per second, the number of suppressed records is reported once the second is over. If the
+    writer falls behind by more than `max_pending` records, further records are dropped and counted.
+
+    Attributes:
+        level (int): The lowest level written.
+        dropped (int): The number of records dropped because the writer fell behind.
+    """
+
+    def __init__(self, level: int = INFO, stream: Optional[TextIO] = None, rate_limit: int = DEFAULT_RATE_LIMIT,
+                 max_pending: int = MAX_PENDING):
+        """
+        Initializes a logger, the writer thread starts with the first record.
+
+        Args:
+            level (int): The lowest level written.
+            stream (Optional[TextIO]): Where the records are written, stdout if None.
+            rate_limit (int): Records per category and second, 0 for no limit.
+            max_pending (int): Records waiting for the writer before further ones are dropped.
+        """
+        self.level = level
+        self.stream = stream
+        self.rate_limit = rate_limit
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._sampling: Dict[str, float] = {}  # category -> fraction of the records kept
+        self._categories: Dict[str, _Category] = {}
+        self._pending: Deque[Record] = deque()  # append and popleft are atomic, no lock needed
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def configure(self, level: Optional[int] = None, sampling: Optional[Dict[str, float]] = None,
+                  rate_limit: Optional[int] = None, stream: Optional[TextIO] = None):
+        """
+        Changes the settings, unchanged if an argument is None.
+
+        Args:
+            level (Optional[int]): The lowest level written.
+            sampling (Optional[Dict[str, float]]): The fraction of the records kept per category, e.g. {'request': 0.01}.
+            rate_limit (Optional[int]): Records per category and second, 0 for no limit.
+            stream (Optional[TextIO]): Where the records are written.
+        """
+        if level is not None:
+            self.level = level
+        if sampling is not None:
+            self._sampling = dict(sampling)
+        if rate_limit is not None:
+            self.rate_limit = rate_limit
+        if stream is not None:
+            self.stream = stream
+        self._categories = {}  # Rebuilt with the new settings on the next record
+
+    def is_enabled(self, level: int) -> bool:
+        """
+        Checks whether records of the level are written, e.g. before building expensive arguments.
+        """
+        return level >= self.level
+
+    def _category(self, category: str) -> _Category:
+        fraction = self._sampling.get(category, 1.0)
+        state = _Category(max(1, round(1 / fraction)) if fraction > 0 else 0, self.rate_limit)
+        self._categories[category] = state
+        return state
+
+    def log(self, level: int, category: str, message: str, *args):
+        """
+        Queues a record for the writer thread unless its level, the sampling or the rate limit filters it out.
+
+        Args:
+            level (int): The level, e.g. INFO.
+            category (str): The category, e.g. 'game'.
+            message (str): The message, formatted with the arguments by the writer thread.
+            args: The arguments of the message.
+        """
+        if level < self.level:
+            return
+        state = self._categories.get(category) or self._category(category)
+        if state.sample_every != 1:
+            if not state.sample_every:  # A fraction of 0 mutes the category
+                return
+            state.seen += 1
+            if state.seen % state.sample_every:
+                return
+        if state.rate_limit:
+            window = int(time.monotonic())
+            if window != state.window:
+                if state.suppressed:
+                    self._put((time.time(), WARNING, category, "%d records suppressed by the rate limit of %d/s",
+                               (state.suppressed, state.rate_limit)))
+                state.window = window
+                state.in_window = 0
+                state.suppressed = 0
+            if state.in_window >= state.rate_limit:
+                state.suppressed += 1
+                return
+            state.in_window += 1
+        self._put((time.time(), level, category, message, args))
+
+    def debug(self, category: str, message: str, *args):
+        self.log(DEBUG, category, message, *args)
+
+    def info(self, category: str, message: str, *args):
+        self.log(INFO, category, message, *args)
+
+    def warning(self, category: str, message: str, *args):
+        self.log(WARNING, category, message, *args)
+
+    def error(self, category: str, message: str, *args):
+        self.log(ERROR, category, message, *args)
+
+    def _put(self, record: Record):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(record)
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._write_pending()
+        self._write_pending()
+
+    def _write_pending(self):
+        """
+        Formats and writes the pending records with one write.
+        """
+        lines = []
+        pending = self._pending
+        while pending:
+            lines.append(format_record(pending.popleft()))
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(''.join(lines))
+            stream.flush()
+        except (OSError, ValueError):
+            pass  # The output was closed, nothing left to report to
+
+    def close(self):
+        """
+        Stops the writer thread after it wrote the pending records.
+        """
+        self._stop.set()
+        with self._start_lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        else:
+            self._write_pending()
+
+
+def format_record(record: Record) -> str:
+    """
+    Formats a record as one line.
+
+    Args:
+        record (Record): The record.
+
+    Returns:
+        str: e.g. '2024-05-01 12:00:00.123 INFO    [game] Match confirmed with opponent_id=2\\n'
+    """
+    timestamp, level, category, message, args = record
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args!r}"
+    seconds = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+    return f"{seconds}.{int(timestamp % 1 * 1000):03d} {LEVEL_NAMES.get(level, level):<7} [{category}] {message}\n"
+
+
+def parse_sampling(text: str) -> Dict[str, float]:
+    """
+    Parses the sampling of the categories.
+
+    Args:
+        text (str): e.g. 'request=0.01,game=0.1'.
+
+    Returns:
+        Dict[str, float]: The fraction of the records kept per category.
+
+    Raises:
+        ValueError: If a fraction is not between 0 and 1.
+    """
+    sampling = {}
+    for item in filter(None, text.split(',')):
+        category, _, fraction = item.partition('=')
+        sampling[category] = float(fraction)
+        if not 0 <= sampling[category] <= 1:
+            raise ValueError(f"The sampling of '{category}' must be between 0 and 1")
+    return sampling
+
+
+LOG = AsyncLogger()  # The logger of this process
+atexit.register(LOG.close)
@@ -0,0 +1,228 @@
+import itertools  # Import itertools for the ticket sequence numbers
+import threading  # Import threading for the queue lock
+from collections import deque  # Import deque for the FIFO queues
+from typing import Deque, Dict, List, NamedTuple, Optional  # Import type hints for better code readability
+from game_registry import GameEvent  # Import the events which take queued players out of the queue
+
+SETTER = 0x01  # Role of a player who sets the word
+GUESSER = 0x02  # Role of a player who guesses it
+MAX_LENGTH = 32  # Words of this length or longer share the last queue
+COMPACT_MIN_STALE = 1024  # Stale queue entries tolerated before the queues are compacted
+
+
+class Ticket:
+    """
+    A queued player.
+
+    A guesser waits in the queue of every word length it accepts, the entries in the other queues
+    go stale once it is matched. Leaving only marks the ticket, its entries are skipped when they
+    reach the head of their queue, and dropped when too many stale entries piled up.
+
+    Attributes:
+        player_id (int): The ID of the player.
+        role (int): SETTER or GUESSER.
+        seq (int): The position in the order of arrival, lower is served first.
+        word (str): The word of a setter, empty for a guesser.
+        min_length (int): The shortest word a guesser accepts.
+        max_length (int): The longest word a guesser accepts, MAX_LENGTH for any.
+        active (bool): False once matched or removed.
+    """
+    __slots__ = ('player_id', 'role', 'seq', 'word', 'min_length', 'max_length', 'active')
+
+    def __init__(self, player_id: int, role: int, seq: int, word: str = '', min_length: int = 1,
+                 max_length: int = MAX_LENGTH):
+        self.player_id = player_id
+        self.role = role
+        self.seq = seq
+        self.word = word
+        self.min_length = min_length
+        self.max_length = max_length
+        self.active = True
+
+
+class Match(NamedTuple):
+    """
+    Two paired players, the game is created by the caller.
+
+    Attributes:
+        setter (Ticket): The ticket of the player who set the word.
+        guesser (Ticket): The ticket of the player who guesses it.
+    """
+    setter: Ticket
+    guesser: Ticket
+
+
+def length_bucket(word: str) -> int:
+    return min(len(word), MAX_LENGTH)
+
+
+class Matchmaker:
+    """
+    Pairs players who queue as setter (with their word) or as guesser (with the word lengths they accept).
+
+    Players are served in the order they arrived: a new setter gets the guesser which waits longest
+    among those accepting the length of its word, a new guesser gets the setter which waits longest
+    among the accepted lengths. There is one FIFO queue of setters and one of guessers per word
+    length, so pairing a setter takes the head of one queue and pairing a guesser compares the
+    heads of at most MAX_LENGTH queues, independent of the number of waiting players.
+    """
+
+    def __init__(self):
+        """
+        Initializes empty queues.
+        """
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._setters: List[Deque[Ticket]] = [deque() for _ in range(MAX_LENGTH + 1)]  # Index 0 unused
+        self._guessers: List[Deque[Ticket]] = [deque() for _ in range(MAX_LENGTH + 1)]
+        self._tickets: Dict[int, Ticket] = {}  # player ID -> active ticket
+        self._stale = 0  # Entries of served or removed players left in the queues, and the extra entries of guessers
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def queued(self, role: int) -> int:
+        """
+        Returns the number of players waiting in the role.
+        """
+        return sum(1 for ticket in list(self._tickets.values()) if ticket.role == role)
+
+    def is_queued(self, player_id: int) -> bool:
+        return player_id in self._tickets
+
+    def enqueue_setter(self, player_id: int, word: str) -> Optional[Match]:
+        """
+        Pairs a setter with the longest waiting guesser who accepts the word, or queues it.
+
+        Args:
+            player_id (int): The ID of the player, not queued yet.
+            word (str): The word to guess.
+
+        Returns:
+            Optional[Match]: The pair, None if the setter was queued.
+        """
+        with self._lock:
+            ticket = Ticket(player_id, SETTER, next(self._seq), word)
+            guessers = self._guessers[length_bucket(word)]
+            while guessers:
+                guesser = guessers.popleft()
+                if guesser.active:
+                    self._take(guesser)
+                    self._compact_if_needed()  # The other entries of the guesser went stale
+                    return Match(ticket, guesser)
+                self._stale -= 1
+            self._setters[length_bucket(word)].append(ticket)
+            self._tickets[player_id] = ticket
+            return None
+
+    def enqueue_guesser(self, player_id: int, min_length: int = 0, max_length: int = 0) -> Optional[Match]:
+        """
+        Pairs a guesser with the longest waiting setter whose word has an accepted length, or queues it.
+
+        Args:
+            player_id (int): The ID of the player, not queued yet.
+            min_length (int): The shortest accepted word, 0 for any.
+            max_length (int): The longest accepted word, 0 for any, MAX_LENGTH or more accepts longer words too.
+
+        Returns:
+            Optional[Match]: The pair, None if the guesser was queued.
+
+        Raises:
+            ValueError: If the shortest accepted length is above the longest one.
+        """
+        low = min(max(1, min_length), MAX_LENGTH)
+        high = min(MAX_LENGTH, max_length or MAX_LENGTH)
+        if low > high:
+            raise ValueError(f"No word is between {min_length} and {max_length} characters long")
+        with self._lock:
+            oldest = None
+            for setters in self._setters[low:high + 1]:
+                while setters and not setters[0].active:  # Left the queue meanwhile
+                    setters.popleft()
+                    self._stale -= 1
+                if setters and (oldest is None or setters[0].seq < oldest[0].seq):
+                    oldest = setters
+            ticket = Ticket(player_id, GUESSER, next(self._seq), min_length=low, max_length=high)
+            if oldest is not None:
+                setter = oldest.popleft()
+                self._take(setter)
+                return Match(setter, ticket)
+
+            for guessers in self._guessers[low:high + 1]:
+                guessers.append(ticket)
+            self._stale += high - low  # All but one entry go stale when the guesser is served
+            self._tickets[player_id] = ticket
+            return None
+
+    def requeue(self, ticket: Ticket):
+        """
+        Puts a matched player back at the head of its queues, e.g. when its opponent disconnected before the game started.
+
+        Args:
+            ticket (Ticket): The ticket returned in the Match.
+        """
+        with self._lock:
+            if ticket.player_id in self._tickets:
+                return
+            # A new ticket with the same position, stale entries of the old one must stay inactive
+            ticket = Ticket(ticket.player_id, ticket.role, ticket.seq, ticket.word, ticket.min_length, ticket.max_length)
+            self._tickets[ticket.player_id] = ticket
+            if ticket.role == SETTER:
+                self._setters[length_bucket(ticket.word)].appendleft(ticket)
+            else:
+                for guessers in self._guessers[ticket.min_length:ticket.max_length + 1]:
+                    guessers.appendleft(ticket)
+                self._stale += ticket.max_length - ticket.min_length
+
+    def remove(self, player_id: int) -> bool:
+        """
+        Takes a player out of the queue.
+
+        Args:
+            player_id (int): The ID of the player.
+
+        Returns:
+            bool: False if the player was not queued.
+        """
+        with self._lock:
+            ticket = self._tickets.get(player_id)
+            if ticket is None:
+                return False
+            self._take(ticket)
+            self._stale += 1  # Every entry of the ticket is stale now, skipped when it reaches the head
+            self._compact_if_needed()
+            return True
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Takes the players of a game out of the queue, e.g. when they started it with 0x07, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        if event.kind == 'created':
+            for player_id in event.game_key:
+                if player_id in self._tickets:
+                    self.remove(player_id)
+
+    def _take(self, ticket: Ticket):
+        """
+        Marks a ticket as served, the caller holds the lock.
+        """
+        ticket.active = False
+        self._tickets.pop(ticket.player_id, None)
+
+    def _compact_if_needed(self):
+        """
+        Drops the stale entries of the queues once they outnumber the waiting players, the caller holds the lock.
+
+        Every entry is copied at most once per compaction and a compaction needs as many stale
+        entries as there are waiting players, so the cost per operation stays constant on average.
+        """
+        if self._stale <= max(COMPACT_MIN_STALE, 2 * len(self._tickets)):
+            return
+        for queues in (self._setters, self._guessers):
+            for index, tickets in enumerate(queues):
+                queues[index] = deque(ticket for ticket in tickets if ticket.active)
+        entries = sum(len(tickets) for queues in (self._setters, self._guessers) for tickets in queues)
+        self._stale = entries - len(self._tickets)  # One entry of every waiting player is not stale
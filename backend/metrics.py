@@ -0,0 +1,232 @@
+import bisect  # Import bisect to find the histogram bucket of a sample
+import threading  # Import threading for the per thread accumulators
+import weakref  # Import weakref to notice accumulators of finished threads
+from typing import Callable, Dict, List, Tuple  # Import type hints for better code readability
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket (+Inf) is implicit
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PRUNE_INTERVAL = 256  # Accumulators of finished threads are folded in every this many new threads
+
+OPCODE_LABELS = tuple(f'0x{byte:02X}' for byte in range(256))  # Label of every control byte, built once
+
+# Metric names, e.g. METRICS.count(REQUESTS, OPCODE_LABELS[request[0]])
+REQUESTS = 'guess_game_requests_total'
+REQUEST_ERRORS = 'guess_game_request_errors_total'
+REQUEST_DURATION = 'guess_game_request_duration_seconds'
+RECEIVED_BYTES = 'guess_game_received_bytes_total'
+SENT_BYTES = 'guess_game_sent_bytes_total'
+CONNECTIONS_OPENED = 'guess_game_connections_opened_total'
+CONNECTIONS_CLOSED = 'guess_game_connections_closed_total'
+SEND_STALLS = 'guess_game_send_stalls_total'
+DROPPED_MESSAGES = 'guess_game_dropped_messages_total'
+SPECTATORS_DROPPED = 'guess_game_spectators_dropped_total'
+SHED_LOAD = 'guess_game_shed_total'
+
+_HELP = {
+    REQUESTS: 'Handled requests by control byte.',
+    REQUEST_ERRORS: 'Requests which failed with an exception, by control byte.',
+    REQUEST_DURATION: 'Time spent handling a request, by control byte.',
+    RECEIVED_BYTES: 'Bytes read from the clients.',
+    SENT_BYTES: 'Bytes queued for the clients, frame headers included.',
+    CONNECTIONS_OPENED: 'Accepted client connections.',
+    CONNECTIONS_CLOSED: 'Closed client connections.',
+    SEND_STALLS: 'Messages which had to wait because the socket buffer of the client was full.',
+    DROPPED_MESSAGES: 'Messages which did not fit into the outbound queue of a client.',
+    SPECTATORS_DROPPED: 'Spectators which fell behind and stopped watching a game.',
+    SHED_LOAD: 'Connections, authorizations and requests turned away with 0x1E, by reason.',
+}
+_LABEL_NAMES = {SHED_LOAD: 'reason'}  # Name of the label if it isn't the opcode
+
+
+class _Accumulator:
+    """
+    The counters and histograms written by one thread.
+
+    Only the owning thread writes, so the increments need no lock. A scrape copies the
+    dictionaries, which is atomic under the GIL, and merges the copies of all threads.
+    """
+    __slots__ = ('counters', 'histograms', '__weakref__')
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, str], float] = {}  # (name, label) -> value
+        self.histograms: Dict[Tuple[str, str], List[float]] = {}  # (name, label) -> bucket counts, count, sum
+
+    def merge(self, other: '_Accumulator'):
+        """
+        Adds the values of another accumulator.
+        """
+        for key, value in other.counters.copy().items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in other.histograms.copy().items():
+            values = list(values)
+            totals = self.histograms.get(key)
+            if totals is None:
+                self.histograms[key] = values
+            else:
+                self.histograms[key] = [total + value for total, value in zip(totals, values)]
+
+
+class Metrics:
+    """
+    Low overhead instrumentation of the server, rendered in the Prometheus text format.
+
+    Every thread writes to its own accumulator, so recording a request costs a few dictionary
+    operations and no lock, neither with a thread per client nor on the event loop. The
+    accumulators are merged when the metrics are rendered. Gauges are read at that time from
+    registered callables, e.g. the number of active games.
+
+    Labels are a single value per metric, e.g. the control byte, rendered as `opcode="0x0B"`, or
+    the reason of a rejection, rendered as `reason="players"`.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty Metrics instance.
+        """
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Guards the list of accumulators, taken once per thread
+        self._accumulators: List[Tuple[weakref.ref, _Accumulator]] = []  # (thread, accumulator)
+        self._retired = _Accumulator()  # The merged values of finished threads
+        self._registered = 0
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}  # name -> (help, callable)
+
+    def _accumulator(self) -> _Accumulator:
+        try:
+            return self._local.accumulator
+        except AttributeError:
+            pass
+        accumulator = self._local.accumulator = _Accumulator()
+        with self._lock:
+            self._accumulators.append((weakref.ref(threading.current_thread()), accumulator))
+            self._registered += 1
+            if self._registered % PRUNE_INTERVAL == 0:
+                self._prune()
+        return accumulator
+
+    def _prune(self):
+        """
+        Folds the accumulators of finished threads into the retired values, the caller holds the lock.
+        """
+        alive = []
+        for thread_ref, accumulator in self._accumulators:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, accumulator))
+            else:
+                self._retired.merge(accumulator)
+        self._accumulators = alive
+
+    def count(self, name: str, label: str = '', value: float = 1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The metric name, e.g. REQUESTS.
+            label (str): The label value, e.g. the opcode.
+            value (float): The increment.
+        """
+        counters = self._accumulator().counters
+        key = (name, label)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, label: str, seconds: float):
+        """
+        Adds a sample to a latency histogram.
+
+        Args:
+            name (str): The metric name, e.g. REQUEST_DURATION.
+            label (str): The label value, e.g. the opcode.
+            seconds (float): The sample.
+        """
+        histograms = self._accumulator().histograms
+        key = (name, label)
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 3)  # Buckets, +Inf, count, sum
+        values[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        values[-2] += 1
+        values[-1] += seconds
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """
+        Registers a gauge, read whenever the metrics are rendered.
+
+        Args:
+            name (str): The metric name, e.g. 'guess_game_active_games'.
+            help_text (str): The description.
+            read (Callable[[], float]): Returns the current value.
+        """
+        self._gauges[name] = (help_text, read)
+
+    def collect(self) -> _Accumulator:
+        """
+        Merges the values of all threads.
+
+        Returns:
+            _Accumulator: The totals, counters of the same name with all their labels.
+        """
+        with self._lock:
+            self._prune()
+            totals = _Accumulator()
+            totals.merge(self._retired)
+            for _, accumulator in self._accumulators:
+                totals.merge(accumulator)
+        return totals
+
+    def counter_value(self, name: str, label: str = '') -> float:
+        """
+        Returns the current total of a counter, e.g. for the tests.
+        """
+        return self.collect().counters.get((name, label), 0)
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: e.g. '# TYPE guess_game_requests_total counter\\nguess_game_requests_total{opcode="0x05"} 12\\n...'
+        """
+        totals = self.collect()
+        lines = []
+
+        by_name: Dict[str, List[Tuple[str, float]]] = {}
+        for (name, label), value in sorted(totals.counters.items()):
+            by_name.setdefault(name, []).append((label, value))
+        for name, values in by_name.items():
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            label_name = _LABEL_NAMES.get(name, 'opcode')
+            lines.extend(f"{name}{_labels(label, label_name)} {_number(value)}" for label, value in values)
+
+        histograms: Dict[str, List[Tuple[str, List[float]]]] = {}
+        for (name, label), values in sorted(totals.histograms.items()):
+            histograms.setdefault(name, []).append((label, values))
+        for name, series in histograms.items():
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for label, values in series:
+                cumulative = 0
+                for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), values):
+                    cumulative += bucket
+                    lines.append(f"{name}_bucket{_labels(label, le=bound)} {cumulative}")
+                lines.append(f"{name}_count{_labels(label)} {values[-2]}")
+                lines.append(f"{name}_sum{_labels(label)} {values[-1]!r}")
+
+        for name, (help_text, read) in self._gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(read())}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(label: str, label_name: str = 'opcode', **extra) -> str:
+    pairs = [f'{label_name}="{label}"'] if label else []
+    pairs.extend(f'{key}="{value}"' for key, value in extra.items())
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+METRICS = Metrics()  # The metrics of this process, shared by the server, the handlers and the connections
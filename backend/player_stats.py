@@ -0,0 +1,290 @@
+import bisect  # Import bisect to keep the leaderboards sorted
+import heapq  # Import heapq to refill a leaderboard from all players
+import threading  # Import threading for the lock of the statistics
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from completed_store import CompletedGame  # Import the CompletedGame record the statistics are counted from
+from game_registry import GameEvent  # Import the events which finish games
+
+# Outcomes of a game for one player
+SOLVED = 'solved'  # Guessed the word, a win
+WON = 'won'  # The guesser gave up
+LOST = 'lost'  # The word was guessed
+GAVE_UP = 'gave up'
+CONNECTION_LOST = 'connection lost'  # Left the game by disconnecting, a loss, the opponent won
+TIMEOUT = 'timeout'
+
+# Orders of a leaderboard (0x21)
+BY_WINS = 0x01
+BY_WIN_RATE = 0x02
+ORDERS = {'wins': BY_WINS, 'win_rate': BY_WIN_RATE}  # The names used by the web server
+
+DEFAULT_TOP = 10  # Players on a leaderboard if the client asks for 0
+MAX_TOP = 100  # Longest leaderboard
+TOP_CAPACITY = 2 * MAX_TOP  # Players kept per leaderboard, refilled from all players once fewer than MAX_TOP are left
+MIN_RANKED_GAMES = 5  # Games a player needs to be ranked by win rate
+RELAY_BATCH = 1000  # Outcomes relayed in one message while the history is counted
+
+Outcome = Tuple[int, str, int]  # Player ID, outcome, attempts (of a solved game)
+
+
+class PlayerStats(NamedTuple):
+    """
+    The totals of one player over all of its finished games, as setter and as guesser.
+
+    The field order is the order of the 0x20 record.
+
+    Attributes:
+        player_id (int): The ID of the player.
+        games (int): Finished games.
+        wins (int): Words guessed and games the opponent gave up or left.
+        losses (int): Words guessed by the opponent, games given up and games left.
+        give_ups (int): Games given up, counted as losses too.
+        connection_lost (int): Games left by disconnecting, counted as losses too.
+        timeouts (int): Games ended by a timeout.
+        solved (int): Words guessed.
+        solve_attempts (int): Attempts needed for the guessed words, together.
+    """
+    player_id: int
+    games: int = 0
+    wins: int = 0
+    losses: int = 0
+    give_ups: int = 0
+    connection_lost: int = 0
+    timeouts: int = 0
+    solved: int = 0
+    solve_attempts: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        """
+        float: The share of the games won, 0 without games.
+        """
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def average_attempts(self) -> Optional[float]:
+        """
+        Optional[float]: The attempts needed to guess a word on average, None if none was guessed.
+        """
+        return self.solve_attempts / self.solved if self.solved else None
+
+    def add(self, outcome: str, attempts: int = 0) -> 'PlayerStats':
+        """
+        Returns the totals with one more game.
+
+        Args:
+            outcome (str): SOLVED, WON, LOST, GAVE_UP, CONNECTION_LOST or TIMEOUT.
+            attempts (int): The attempts of a solved game.
+        """
+        return PlayerStats(self.player_id, self.games + 1,
+                           self.wins + (outcome == SOLVED or outcome == WON),
+                           self.losses + (outcome == LOST or outcome == GAVE_UP or outcome == CONNECTION_LOST),
+                           self.give_ups + (outcome == GAVE_UP),
+                           self.connection_lost + (outcome == CONNECTION_LOST),
+                           self.timeouts + (outcome == TIMEOUT),
+                           self.solved + (outcome == SOLVED),
+                           self.solve_attempts + (attempts if outcome == SOLVED else 0))
+
+    def to_dict(self) -> dict:
+        """
+        Returns the JSON form, e.g. {'player_id': 3, 'games': 4, 'wins': 3, ..., 'win_rate': 0.75, 'average_attempts': 2.5}.
+        """
+        stats = self._asdict()
+        stats['win_rate'] = round(self.win_rate, 4)
+        stats['average_attempts'] = self.average_attempts
+        return stats
+
+
+def game_outcomes(game: CompletedGame) -> List[Outcome]:
+    """
+    Returns the outcome of a finished game for its setter and its guesser.
+
+    Args:
+        game (CompletedGame): The game.
+
+    Returns:
+        List[Outcome]: e.g. [(1, 'lost', 0), (2, 'solved', 3)] for a word guessed with the third attempt.
+    """
+    if game.result == 'success':
+        return [(game.setter_id, LOST, 0), (game.guesser_id, SOLVED, len(game.attempts))]
+    if game.result == 'gave up':
+        return [(game.setter_id, WON, 0), (game.guesser_id, GAVE_UP, 0)]
+    if game.left_by:  # The player who stayed was told it won
+        opponent_id = game.guesser_id if game.left_by == game.setter_id else game.setter_id
+        return [(game.left_by, CONNECTION_LOST, 0), (opponent_id, WON, 0)]
+    return [(game.setter_id, TIMEOUT, 0), (game.guesser_id, TIMEOUT, 0)]
+
+
+def _wins_key(stats: PlayerStats) -> tuple:
+    return -stats.wins, stats.losses, stats.player_id
+
+
+def _win_rate_key(stats: PlayerStats) -> tuple:
+    return -stats.win_rate, -stats.games, stats.player_id
+
+
+def _is_ranked_by_win_rate(stats: PlayerStats) -> bool:
+    return stats.games >= MIN_RANKED_GAMES
+
+
+class _Ranking:
+    """
+    The best players of one order, at most TOP_CAPACITY of them.
+
+    The kept keys are always those of the best players, so the first MAX_TOP are the leaderboard.
+    A kept player who drops behind the last kept key leaves, a better one may be among the players
+    who are not kept; a player who moves ahead of the last kept key joins. Once fewer than MAX_TOP
+    are left, the ranking is refilled from all players. The sorted keys are replaced as a whole
+    instead of changed in place, so readers need no lock.
+    """
+    __slots__ = ('key', 'is_ranked', 'keys', 'members', 'complete')
+
+    def __init__(self, key: Callable[[PlayerStats], tuple], is_ranked: Optional[Callable[[PlayerStats], bool]] = None):
+        self.key = key
+        self.is_ranked = is_ranked  # Every player if None
+        self.keys: List[tuple] = []  # Sorted keys of the kept players
+        self.members: Dict[int, tuple] = {}  # player ID -> its key in `keys`
+        self.complete = True  # Whether every ranked player is kept
+
+    def update(self, stats: PlayerStats, players: Dict[int, PlayerStats]):
+        """
+        Moves a player whose totals changed, the caller holds the lock of the `StatsBoard`.
+        """
+        keys = self.keys
+        old = self.members.pop(stats.player_id, None)
+        if old is not None:
+            keys = keys.copy()
+            _remove(keys, old)
+        if self.is_ranked is None or self.is_ranked(stats):
+            key = self.key(stats)
+            if self.complete or (keys and key < keys[-1]):
+                if keys is self.keys:
+                    keys = keys.copy()
+                bisect.insort(keys, key)
+                self.members[stats.player_id] = key
+                if len(keys) > TOP_CAPACITY:
+                    del self.members[keys.pop()[-1]]
+                    self.complete = False
+        self.keys = keys
+        if not self.complete and len(keys) < MAX_TOP:
+            self._refill(players)
+
+    def _refill(self, players: Dict[int, PlayerStats]):
+        """
+        Keeps the best TOP_CAPACITY of all players again.
+        """
+        ranked = [self.key(stats) for stats in players.values() if self.is_ranked is None or self.is_ranked(stats)]
+        keys = heapq.nsmallest(TOP_CAPACITY, ranked)
+        self.members = {key[-1]: key for key in keys}
+        self.complete = len(ranked) <= TOP_CAPACITY
+        self.keys = keys
+
+
+class StatsBoard:
+    """
+    The statistics of every player who finished a game, kept up to date game by game.
+
+    A finished game changes the totals of its two players and their places on the leaderboards,
+    nothing is ever counted from the history again: reading the statistics of a player is a
+    dictionary lookup and a leaderboard is a slice. The totals are immutable records, so they are
+    handed out without a copy and read without the lock. Only the best TOP_CAPACITY players are
+    kept sorted per order (`_Ranking`), so a game costs the same however many players there are.
+
+    The history is counted once at startup with `add_games`. In the cluster mode a game finishes
+    in the worker of its setter; every worker keeps a copy of all statistics, the outcomes counted
+    here are passed to `relay`, those of the other workers arrive through `apply`.
+    """
+
+    def __init__(self, relay: Optional[Callable[[List[Outcome]], None]] = None):
+        """
+        Initializes empty statistics.
+
+        Args:
+            relay (Optional[Callable[[List[Outcome]], None]]): Called with the outcomes counted
+                here, the cluster mode passes them on to the other workers.
+        """
+        self._lock = threading.Lock()  # Serializes the writers
+        self._players: Dict[int, PlayerStats] = {}  # player ID -> totals
+        self._rankings = {BY_WINS: _Ranking(_wins_key), BY_WIN_RATE: _Ranking(_win_rate_key, _is_ranked_by_win_rate)}
+        self.relay: Optional[Callable[[List[Outcome]], None]] = relay
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Counts a finished game, a registry listener.
+
+        Args:
+            event (GameEvent): The event, the value of 'finished' is the CompletedGame.
+        """
+        if event.kind == 'finished':
+            self._count(game_outcomes(event.value))
+
+    def add_games(self, games: Iterable[CompletedGame]):
+        """
+        Counts the games finished before a restart, e.g. `registry.completed.iter_games()`.
+        """
+        batch: List[Outcome] = []
+        for game in games:
+            batch.extend(game_outcomes(game))
+            if len(batch) >= RELAY_BATCH:
+                self._count(batch)
+                batch = []
+        if batch:
+            self._count(batch)
+
+    def _count(self, outcomes: List[Outcome]):
+        """
+        Counts the outcomes of games of this worker and relays them.
+        """
+        self.apply(outcomes)
+        if self.relay is not None:
+            self.relay(outcomes)
+
+    def apply(self, outcomes: List[Outcome]):
+        """
+        Counts outcomes, including those relayed by another worker process, they are not relayed again.
+
+        Args:
+            outcomes (List[Outcome]): The player, the outcome and the attempts of a solved game, per game and player.
+        """
+        with self._lock:
+            players = self._players
+            for player_id, outcome, attempts in outcomes:
+                stats = players.get(player_id) or PlayerStats(player_id)
+                stats = players[player_id] = stats.add(outcome, attempts)
+                for ranking in self._rankings.values():
+                    ranking.update(stats, players)
+
+    def get(self, player_id: int) -> PlayerStats:
+        """
+        Returns the totals of a player, all 0 if it never finished a game.
+        """
+        return self._players.get(player_id) or PlayerStats(player_id)
+
+    def top(self, order: int, count: int) -> List[PlayerStats]:
+        """
+        Returns the best players.
+
+        Args:
+            order (int): BY_WINS, or BY_WIN_RATE for the players with at least MIN_RANKED_GAMES games.
+            count (int): The length of the leaderboard, at most MAX_TOP.
+
+        Returns:
+            List[PlayerStats]: The totals of the players, best first.
+
+        Raises:
+            ValueError: If the order is unknown.
+        """
+        ranking = self._rankings.get(order)
+        if ranking is None:
+            raise ValueError(f"Unknown leaderboard order {order}")
+        players = self._players
+        return [players[key[-1]] for key in ranking.keys[:min(count, MAX_TOP)]]
+
+
+def _remove(keys: List[tuple], key: tuple):
+    index = bisect.bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        del keys[index]
@@ -0,0 +1,118 @@
+import sys  # Import sys to read the current frame of every thread
+import threading  # Import threading for the sampling thread and the lock
+from collections import Counter  # Import Counter to count the sampled stacks
+from typing import Optional  # Import type hints for better code readability
+from log import LOG  # Import the logger, records are written by a background thread
+
+DEFAULT_INTERVAL = 0.005  # Seconds between two samples
+MAX_DEPTH = 64  # Frames kept of one stack, the innermost ones
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler which can be switched on and off while the server runs.
+
+    While running, a background thread takes the stack of every other thread at a fixed interval
+    and counts how often each stack was seen. Unlike cProfile nothing is hooked into the function
+    calls, so the handler threads run at full speed and the cost is bounded by the interval.
+
+    The result is in the collapsed stack format ("thread;outer;inner count" per line), which the
+    common flame graph tools read directly.
+    """
+
+    def __init__(self):
+        """
+        Initializes a stopped profiler.
+        """
+        self._lock = threading.Lock()  # Guards the counts and the thread
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = DEFAULT_INTERVAL
+
+    @property
+    def running(self) -> bool:
+        """
+        bool: Whether the profiler is sampling.
+        """
+        return self._thread is not None
+
+    def start(self, interval: float = DEFAULT_INTERVAL) -> bool:
+        """
+        Starts sampling, the counts of a previous run are discarded.
+
+        Args:
+            interval (float): Seconds between two samples.
+
+        Returns:
+            bool: False if the profiler was already running.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._stacks.clear()
+            self._samples = 0
+            self.interval = interval
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        LOG.info('server', "Sampling profiler started, interval %g ms", interval * 1000)
+        return True
+
+    def stop(self) -> bool:
+        """
+        Stops sampling, the counts are kept until the next start.
+
+        Returns:
+            bool: False if the profiler was not running.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return False
+        self._stop.set()
+        thread.join()
+        LOG.info('server', "Sampling profiler stopped after %d samples", self._samples)
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self._samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        functions = []
+        while frame is not None and len(functions) < MAX_DEPTH:
+            code = frame.f_code
+            functions.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+            frame = frame.f_back
+        functions.append(thread_name)
+        functions.reverse()
+        return ';'.join(functions)
+
+    def collapsed(self) -> str:
+        """
+        Returns the counted stacks, most frequent first.
+
+        Returns:
+            str: One 'thread;outer;...;inner count' line per distinct stack.
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self) -> dict:
+        """
+        Returns the state of the profiler, e.g. {'running': True, 'interval': 0.005, 'samples': 120, 'stacks': 14}.
+        """
+        with self._lock:
+            return {'running': self._thread is not None, 'interval': self.interval, 'samples': self._samples,
+                    'stacks': len(self._stacks)}
@@ -1,11 +1,32 @@
 import atexit  # Import atexit to register cleanup functions to be executed upon program exit
 import os  # Import the os module for interacting with the operating system
 import socket  # Import the socket module to enable networking capabilities
+import sys  # Import sys to start the worker processes with the same interpreter and arguments
 import threading  # Import the threading module to handle multiple threads
+import time  # Import time for the new turn of the recovered games
 from client_handler import ClientHandler  # Import the ClientHandler class from the client_handler module
+from connection import Connection, SocketConnection, OutboundFlusher  # Import the connection wrappers for blocking sockets
+from connection import MAX_QUEUED_BYTES, DISCONNECT, OVERFLOW_POLICIES  # Import the outbound queue limits
+from game_registry import GameRegistry  # Import the GameRegistry class which owns the games
+from completed_store import CompletedGameStore, DEFAULT_MEMORY_CAP  # Import the bounded store of completed games
+from journal import COMPLETED_SEGMENT, GameJournal, recover  # Import the game journal for crash recovery
+from event_bus import EventBus  # Import the EventBus which pushes the game events to the web clients
+from lobby import Lobby  # Import the Lobby which tracks idle players and their presence subscribers
+from player_stats import StatsBoard  # Import the StatsBoard which counts the outcomes of the finished games
+from matchmaking import GUESSER, SETTER, Matchmaker  # Import the Matchmaker which pairs queued players
+from spectators import SpectatorHub  # Import the SpectatorHub which forwards game events to watching clients
+from dictionary import WordIndex  # Import the memory mapped word index for word validation and hints
+from timers import GameDeadlines, Timeouts, TimerWheel  # Import the timer wheel which drives every timeout
+from cluster import Cluster, ClusterGames, WorkerSpec, run_workers  # Import the bus between the worker processes
+from admission import Admission, Limits, parse_rates  # Import the admission control of connections, players and requests
+from metrics import METRICS, CONNECTIONS_OPENED, CONNECTIONS_CLOSED  # Import the metrics of the process, exposed at /metrics
+from log import LOG, LEVELS, DEFAULT_RATE_LIMIT, parse_sampling  # Import the logger, records are written by a background thread
+from profiler import SamplingProfiler  # Import the sampling profiler which can be switched on at runtime
+from capture import TrafficCapture  # Import the traffic capture which records the requests for a replay
 from threading import Thread  # Import the Thread class for creating new threads
-from typing import Tuple, Dict  # Import type hints for better code readability
+from typing import Tuple, Dict, List, Optional  # Import type hints for better code readability
 from web_server import run_web_server  # Import the run_web_server function to start the web server
+from async_server import run_event_loop  # Import the run_event_loop function for the asyncio engine
 
 # from common.constants import COMMANDS, MESSAGES
 
@@ -18,14 +39,42 @@ class Server:
         HOST (str): The hostname or path to the Unix socket.
         PORT (int): The port number for the server to listen on.
         PASSWORD (bytes): The password required for clients to connect to the server.
-        clients (Dict[int, socket.socket]): A dictionary to store active client connections.
+        clients (Dict[int, Connection]): A dictionary to store active client connections.
         client_id_counter (int): A counter for assigning unique IDs to clients.
-        games (dict): A dictionary to hold active game sessions.
-        completed_games (dict): A dictionary to store completed games.
+        client_id_step (int): The increment of the counter, the number of worker processes.
+        registry (GameRegistry): Owns the active and completed games and the index of players in games.
+        games (dict): A snapshot of the active game sessions.
+        completed_games (dict): A copy of all completed games, grouped by pair of players.
         use_unix_socket (bool): A flag indicating whether to use a Unix socket or a TCP socket.
+        engine (str): The connection engine, 'threaded' (a thread per client) or 'asyncio' (a single event loop).
+        cluster (Optional[Cluster]): The bus to the other worker processes, None if the server runs as one process.
+        dashboard: The games shown by the web server, the registry or the games of all workers (`ClusterGames`).
+        journal (Optional[GameJournal]): The journal of the game events, None if journaling is disabled.
+        events (EventBus): Pushes the game events to the subscribed web clients.
+        lobby (Lobby): The authorized players, which of them are idle and who follows their presence.
+        stats (StatsBoard): The statistics of every player and the leaderboards, of the games of all workers.
+        matchmaker (Matchmaker): Pairs the players waiting in the matchmaking queue.
+        spectators (SpectatorHub): Forwards the events of active games to the clients watching them.
+        dictionary (Optional[WordIndex]): The words which may be set, any word if None.
+        timeouts (Timeouts): The authorization, idle, game and turn timeouts.
+        admission (Admission): The limits of the connections, the authorized clients and the request rates.
+        timers (TimerWheel): The scheduler of all timeouts.
+        deadlines (GameDeadlines): Ends the games which ran out of time.
+        max_queued_bytes (int): The bound of the outbound data waiting for one client.
+        overflow_policy (str): What happens to a client which doesn't read, 'disconnect' or 'drop' its messages.
+        flusher (OutboundFlusher): Writes the queued data of stalled clients, threaded engine only.
+        metrics (Metrics): The request counters and latency histograms, see `metrics.Metrics`.
+        profiler (SamplingProfiler): The sampling profiler, switched on and off at /debug/profile.
+        capture (TrafficCapture): Records the client traffic for a replay, switched on and off at /debug/capture.
     """
 
-    def __init__(self, host: str, port: int, use_unix_socket: bool = False):
+    ENGINES = ('threaded', 'asyncio')  # Supported connection engines
+
+    def __init__(self, host: str, port: int, use_unix_socket: bool = False, engine: str = 'threaded',
+                 completed_cap: int = DEFAULT_MEMORY_CAP, completed_spill_path: Optional[str] = None,
+                 journal_dir: Optional[str] = None, max_queued_bytes: int = MAX_QUEUED_BYTES,
+                 overflow_policy: str = DISCONNECT, dictionary_path: Optional[str] = None,
+                 timeouts: Timeouts = Timeouts(), worker: Optional[WorkerSpec] = None, limits: Limits = Limits()):
         """
         Initializes the Server instance with the specified host, port, and socket type.
 
@@ -33,6 +82,21 @@ class Server:
             host (str): The hostname or Unix socket path.
             port (int): The port number for the server to listen on.
             use_unix_socket (bool): A flag to use a Unix socket instead of a TCP socket.
+            engine (str): The connection engine to use, one of `Server.ENGINES`.
+            completed_cap (int): The number of completed games kept in memory, older ones are moved to disk.
+            completed_spill_path (Optional[str]): The file the older completed games are moved to, a temporary file if None.
+            journal_dir (Optional[str]): The directory of the game journal, the games are recovered from it on start
+                and every change is journaled. Overrides `completed_spill_path`. No journaling if None.
+            max_queued_bytes (int): The bound of the outbound data waiting for one client.
+            overflow_policy (str): One of `connection.OVERFLOW_POLICIES`.
+            dictionary_path (Optional[str]): The word index built with `python dictionary.py build`, any word may be
+                set if None.
+            timeouts (Timeouts): The authorization, idle, game and turn timeouts.
+            worker (Optional[WorkerSpec]): The sockets inherited from the supervisor when running as one of
+                several worker processes, see `cluster.run_workers`. Every worker journals to its own
+                subdirectory of `journal_dir`.
+            limits (Limits): The listen backlog, the connection and player limits and the request rates,
+                per worker process.
         """
         self.HOST = host  # Set the host address
         self.PORT = port  # Set the port number
@@ -44,47 +108,304 @@ class Server:
         # e.g. as SHA256 or SHA512, along with a salt for another security layer
         self.PASSWORD = b'mysecretpw'  # Set the password that clients must provide to connect
 
-        self.clients: Dict[int, socket.socket] = {}  # Initialize the dictionary to store client connections
+        self.clients: Dict[int, Connection] = {}  # Initialize the dictionary to store client connections
         self.client_id_counter = 1  # Initialize the client ID counter
-        self.games = {}  # Initialize the dictionary to hold active games
-        self.completed_games = {}  # Initialize the dictionary to store completed games
+        self.client_id_step = 1
+        self.clients_lock = threading.Lock()  # Guards the client ID counter and the clients dictionary
+        self.journal: Optional[GameJournal] = None
+        self.cluster: Optional[Cluster] = None
+        if worker is not None:
+            self.cluster = Cluster(self, worker)  # Worker i hands out the IDs i + 1, i + 1 + count, ...
+            self.client_id_step = worker.count
+            if journal_dir is not None:
+                journal_dir = os.path.join(journal_dir, f'worker-{worker.index}')
+            if completed_spill_path is not None:
+                completed_spill_path = f'{completed_spill_path}.worker-{worker.index}'
+        if journal_dir is None:
+            # Initialize the registry of active and completed games
+            self.registry = GameRegistry(completed=CompletedGameStore(completed_cap, completed_spill_path))
+        else:
+            self.registry = self.recover_registry(journal_dir, completed_cap)  # Rebuild the games journaled before a restart
+        if self.cluster is not None:
+            self.client_id_counter += (worker.index + 1 - self.client_id_counter) % worker.count  # The next ID of this worker
+            self.registry.add_listener(self.cluster.on_game_event)  # Release the guessers of other workers
+        self.dashboard = self.registry if self.cluster is None else ClusterGames(self.cluster)
+        self.events = EventBus()  # Initialize the bus which pushes the game events to the web clients
+        self.registry.add_listener(self.events.publish)  # Publish every change of a game
+        self.lobby = Lobby(self.cluster.relay_presence if self.cluster is not None else None)  # Initialize the lobby of the authorized players
+        self.registry.add_listener(self.lobby.on_game_event)  # Players become busy and idle with their games
+        self.stats = StatsBoard(self.cluster.relay_outcomes if self.cluster is not None else None)  # Initialize the player statistics
+        self.stats.add_games(self.registry.completed.iter_games())  # Count the games finished before a restart once
+        self.registry.add_listener(self.stats.on_game_event)  # Every finished game updates the statistics of its players
+        self.matchmaker = Matchmaker()  # Initialize the matchmaking queue
+        self.registry.add_listener(self.matchmaker.on_game_event)  # Players who start a game leave the queue
+        self.spectators = SpectatorHub()  # Initialize the hub of the clients watching games
+        self.registry.add_listener(self.spectators.publish)  # Forward the hints, guesses and results
+        self.dictionary = WordIndex(dictionary_path) if dictionary_path else None  # Map the word index, shared with other processes
+        if self.dictionary is not None:
+            LOG.info('server', "Dictionary %s with %d words mapped.", dictionary_path, len(self.dictionary))
+        self.timeouts = timeouts
+        self.admission = Admission(limits)
+        self.timers = TimerWheel()  # One thread for all timeouts, started with the first timer
+        self.deadlines = GameDeadlines(self.registry, self.timers, timeouts, self.send_to)
+        self.registry.add_listener(self.deadlines.on_game_event)  # Every game gets a deadline
+        for game_key, game in self.registry.snapshot_games().items():  # The recovered games get a new turn
+            self.deadlines.track(game_key, game['started_at'], time.time())
         self.use_unix_socket = use_unix_socket  # Set whether to use a Unix socket or TCP socket
+        self.engine = engine  # Set the connection engine
+        self.max_queued_bytes = max_queued_bytes  # Set the bound of the outbound queues
+        self.overflow_policy = overflow_policy  # Set what happens to clients which don't read
+        self.flusher = OutboundFlusher()  # Writes the queues of stalled sockets, its thread starts when first needed
+        self.server_socket = None  # The listening socket, created in start()
+        self.profiler = SamplingProfiler()  # Stopped until switched on from the web server
+        self.capture = TrafficCapture()  # Stopped until switched on with --capture or from the web server
+        self.metrics = METRICS
+        self.metrics.gauge('guess_game_connections', 'Open client connections.',
+                           lambda: self.metrics.counter_value(CONNECTIONS_OPENED) - self.metrics.counter_value(CONNECTIONS_CLOSED))
+        self.metrics.gauge('guess_game_admitted_connections', 'Client connections counted against --max-connections.',
+                           lambda: self.admission.connections)
+        self.metrics.gauge('guess_game_authorized_clients', 'Connected clients which submitted the password.',
+                           lambda: len(self.clients))
+        self.metrics.gauge('guess_game_idle_players', 'Authorized clients which are not in a game.',
+                           lambda: self.lobby.idle_count)
+        self.metrics.gauge('guess_game_presence_subscribers', 'Clients following the presence deltas.',
+                           lambda: self.lobby.subscriber_count)
+        self.metrics.gauge('guess_game_queued_setters', 'Players waiting in the matchmaking queue as setter.',
+                           lambda: self.matchmaker.queued(SETTER))
+        self.metrics.gauge('guess_game_queued_guessers', 'Players waiting in the matchmaking queue as guesser.',
+                           lambda: self.matchmaker.queued(GUESSER))
+        self.metrics.gauge('guess_game_spectators', 'Clients watching at least one game.', lambda: len(self.spectators))
+        self.metrics.gauge('guess_game_timers', 'Scheduled timeouts, cancelled ones until their slot comes up.',
+                           lambda: len(self.timers))
+        self.metrics.gauge('guess_game_active_games', 'Games in progress.', lambda: len(self.registry))
+        self.metrics.gauge('guess_game_players_with_stats', 'Players with at least one finished game.',
+                           lambda: len(self.stats))
+        self.metrics.gauge('guess_game_completed_games', 'Completed games, in memory and on disk.',
+                           lambda: len(self.registry.completed))
+        self.metrics.gauge('guess_game_completed_index_bytes', 'Memory held by the file offsets of the completed games.',
+                           lambda: self.registry.completed.index_bytes)
+        self.metrics.gauge('guess_game_queued_bytes', 'Outbound data waiting for the clients.',
+                           lambda: self.outbound_stats()['queued_bytes'])
+        self.metrics.gauge('guess_game_event_subscribers', 'Open event streams of the web clients.',
+                           lambda: len(self.events))
+        self.metrics.gauge('guess_game_log_records_dropped', 'Log records dropped because the writer fell behind.',
+                           lambda: LOG.dropped)
 
         # Register a cleanup function to run when the program exits
         atexit.register(self.cleanup)
 
+    def recover_registry(self, journal_dir: str, completed_cap: int) -> GameRegistry:
+        """
+        Rebuilds the registry from the journal directory and prepares the journal of the new run.
+
+        The recovered active games keep the IDs of their players, new clients get higher IDs.
+
+        Args:
+            journal_dir (str): The journal directory, created if missing.
+            completed_cap (int): The number of completed games kept in memory.
+
+        Returns:
+            GameRegistry: The registry with the recovered active and completed games.
+        """
+        os.makedirs(journal_dir, exist_ok=True)
+        state = recover(journal_dir)
+        completed = CompletedGameStore(completed_cap, os.path.join(journal_dir, COMPLETED_SEGMENT),
+                                       resume_count=state.completed_count)
+        registry = GameRegistry(completed=completed)
+        for game_key, game in state.active.items():
+            registry.restore(game_key, game)
+        for game_key, game, finished_at in state.finished:  # Finished after the last sync of the segment file
+            completed.add(game_key[0], game_key[1], game, finished_at)
+
+        self.client_id_counter = state.max_player_id + 1
+        self.journal = GameJournal(journal_dir, registry, state.epoch + 1, max_player_id=state.max_player_id)
+        return registry
+
+    @property
+    def games(self) -> dict:
+        """
+        dict: A consistent copy of the active games, see `GameRegistry.snapshot_games`.
+        """
+        return self.registry.snapshot_games()
+
+    @property
+    def completed_games(self) -> dict:
+        """
+        dict: A copy of all completed games grouped by pair of players, e.g. {(1, 2): [{'word': 'test', ...}]}.
+        Reads every game including those moved to disk, prefer `registry.completed` for lookups.
+        """
+        completed_games = {}
+        for game in self.registry.completed.iter_games():
+            completed_games.setdefault(game.key, []).append(game.to_dict())
+        return completed_games
+
+    def register_client(self, connection: Connection) -> Optional[int]:
+        """
+        Assigns a unique ID to an authorized client and stores its connection.
+
+        The ID allocation and the insertion are atomic, so concurrent authorizations never get the same ID.
+
+        Args:
+            connection (Connection): The connection of the client.
+
+        Returns:
+            Optional[int]: The ID of the client, None if the server has the maximum number of authorized clients.
+        """
+        with self.clients_lock:
+            if not self.admission.admit_player(len(self.clients)):
+                return None
+            client_id = self.client_id_counter
+            self.client_id_counter += self.client_id_step  # Increment the counter for the next client
+            self.lobby.join(client_id)  # Before the client can be matched, so it is never marked idle while busy
+            self.clients[client_id] = connection
+        return client_id
+
+    def unregister_client(self, client_id: int):
+        """
+        Removes a client from the clients dictionary and the lobby.
+
+        Args:
+            client_id (int): The ID of the client.
+        """
+        with self.clients_lock:
+            self.clients.pop(client_id, None)
+        self.lobby.leave(client_id)
+
+    def connection(self, client_id: int) -> Optional[Connection]:
+        """
+        Returns the connection of an authorized client, including clients of the other worker processes.
+
+        Args:
+            client_id (int): The ID of the client.
+
+        Returns:
+            Optional[Connection]: The connection, None if the client is not connected.
+        """
+        connection = self.clients.get(client_id)
+        if connection is None and self.cluster is not None and not self.cluster.is_local(client_id) and client_id in self.lobby:
+            connection = self.cluster.remote(client_id)
+        return connection
+
+    def send_to(self, client_id: int, message: bytes):
+        """
+        Sends a message to an authorized client, nothing happens if it is not connected.
+
+        Args:
+            client_id (int): The ID of the client.
+            message (bytes): The message.
+        """
+        connection = self.connection(client_id)
+        if connection is not None:
+            connection.send(message)
+
+    def client_ids(self) -> List[int]:
+        """
+        Returns a snapshot of the IDs of all authorized clients, of all worker processes.
+
+        Returns:
+            List[int]: The client IDs.
+        """
+        if self.cluster is not None:
+            return self.lobby.player_ids()
+        with self.clients_lock:
+            return list(self.clients)
+
+    def outbound_stats(self) -> dict:
+        """
+        Returns the depth of the outbound queues of the authorized clients.
+
+        Returns:
+            dict: e.g. {'clients': 12, 'queued_bytes': 310, 'max_queued_bytes': 250, 'stalled_clients': 1, 'dropped_messages': 0}
+        """
+        with self.clients_lock:
+            connections = list(self.clients.values())
+        depths = [connection.queued_bytes for connection in connections]
+        return {
+            'clients': len(connections),
+            'queued_bytes': sum(depths),
+            'max_queued_bytes': max(depths, default=0),
+            'stalled_clients': sum(1 for depth in depths if depth),
+            'dropped_messages': sum(connection.dropped for connection in connections),
+        }
+
     def start(self):
         """
         Starts the server to listen for client connections.
 
         This method sets up the server socket, binds it to the specified host and port,
         and starts listening for incoming client connections. It also starts a web server
-        in a separate thread.
-        """
-        # Create a socket (either Unix or TCP depending on the configuration)
-        self.server_socket = socket.socket(socket.AF_UNIX if self.use_unix_socket else socket.AF_INET, socket.SOCK_STREAM)
-        if self.use_unix_socket:
-            # If using a Unix socket, remove the existing socket file if it exists
-            if os.path.exists(self.HOST):
-                os.remove(self.HOST)
-            self.server_socket.bind(self.HOST)  # Bind the Unix socket to the specified path
+        in a separate thread. Accepted clients are served either by a thread per client or,
+        with the 'asyncio' engine, by a single event loop.
+        """
+        if self.journal is not None:
+            self.journal.start()  # Snapshot the recovered games and journal every change from now on
+
+        if self.cluster is not None and self.use_unix_socket:
+            self.server_socket = socket.socket(fileno=self.cluster.listen_fd)  # Created by the supervisor, shared by all workers
         else:
-            self.server_socket.bind((self.HOST, self.PORT))  # Bind the TCP socket to the specified host and port
-        self.server_socket.listen(5)  # Start listening for client connections with a backlog of 5
-        print(f"[*] Listening on {self.HOST}:{self.PORT if not self.use_unix_socket else ''}")
+            # Create a socket (either Unix or TCP depending on the configuration)
+            self.server_socket = socket.socket(socket.AF_UNIX if self.use_unix_socket else socket.AF_INET, socket.SOCK_STREAM)
+            if self.use_unix_socket:
+                # If using a Unix socket, remove the existing socket file if it exists
+                if os.path.exists(self.HOST):
+                    os.remove(self.HOST)
+                self.server_socket.bind(self.HOST)  # Bind the Unix socket to the specified path
+            else:
+                if self.cluster is not None:  # Every worker binds the port, the kernel spreads the connections over them
+                    self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self.server_socket.bind((self.HOST, self.PORT))  # Bind the TCP socket to the specified host and port
+            self.server_socket.listen(self.admission.limits.backlog)  # Start listening for client connections
+        LOG.info('server', "Listening on %s:%s", self.HOST, self.PORT if not self.use_unix_socket else '')
+
+        if self.cluster is not None:
+            LOG.info('server', "Running as worker %d of %d.", self.cluster.index, self.cluster.count)
+            if self.engine != 'asyncio':
+                self.cluster.start()  # The asyncio engine starts it once the loop runs, see async_server.serve
 
-        # Start the web server in a separate thread
-        web_server_thread = threading.Thread(target=run_web_server, args=(self,))
-        web_server_thread.start()  # Start the web server thread
+        if self.cluster is None or self.cluster.index == 0:  # One web server shows the games of all workers
+            # Start the web server in a separate thread
+            web_server_thread = threading.Thread(target=run_web_server, args=(self,))
+            web_server_thread.start()  # Start the web server thread
 
-        print(f"[*] Web server available at http://localhost:8080/games")
+            LOG.info('server', "Web server available at http://localhost:8080/games")
+
+        if self.engine == 'asyncio':
+            run_event_loop(self, self.server_socket)  # Serve all clients from one event loop
+            return
 
         while True:
             # Accept new client connections in an infinite loop
             client_socket, client_address = self.server_socket.accept()
-            print(f"[*] Accepted connection from {client_address}")
+            if not self.admission.admit_connection():  # No thread for connections beyond the limit
+                self.turn_away(client_socket, client_address)
+                continue
+            LOG.info('connection', "Accepted connection from %s", client_address)
             client_handler = Thread(target=self.handle_client, args=(client_socket, client_address))
-            client_handler.start()  # Start a new thread to handle the connected client
+            try:
+                client_handler.start()  # Start a new thread to handle the connected client
+            except RuntimeError:  # The process can't start more threads
+                self.admission.release_connection()
+                self.turn_away(client_socket, client_address)
+
+    def turn_away(self, client_socket: socket.socket, client_address: Tuple[str, int]):
+        """
+        Tells a connection beyond the limit that the server is busy and closes it.
+
+        The socket buffer of a fresh connection has room for the short message, so the accepting
+        thread never blocks on it.
+
+        Args:
+            client_socket (socket.socket): The accepted socket.
+            client_address (Tuple[str, int]): The address of the client.
+        """
+        message = self.admission.turn_away(client_address)
+        try:
+            client_socket.setblocking(False)
+            client_socket.send(message)
+        except OSError:
+            pass
+        finally:
+            client_socket.close()
 
     def handle_client(self, client_socket: socket.socket, client_address: Tuple[str, int]):
         """
@@ -94,34 +415,107 @@ class Server:
             client_socket (socket.socket): The socket connected to the client.
             client_address (Tuple[str, int]): The address of the connected client.
         """
-        handler = ClientHandler(client_socket, client_address, self)  # Create a ClientHandler instance for the client
-        handler.handle()  # Start handling client requests
+        try:
+            connection = SocketConnection(client_socket, self.flusher, self.max_queued_bytes, self.overflow_policy)
+            handler = ClientHandler(connection, client_address, self)  # Create a ClientHandler instance for the client
+            handler.handle()  # Start handling client requests
+        finally:
+            self.admission.release_connection()
 
     def cleanup(self):
         """
         Performs cleanup tasks when the server is shutting down.
 
         This method is registered to run when the program exits. It ensures that the Unix socket file
-        is removed if it exists.
+        is removed if it exists and that the game journal is flushed.
         """
-        print("Cleaning up...")
-        
+        LOG.info('server', "Cleaning up...")
+        self.capture.stop()  # Write the records still pending
+
+        if self.journal is not None:
+            self.journal.close()  # Commit the queued events and write a final snapshot
+            self.registry.completed.close()
+
         if self.server_socket:
             self.server_socket.close()  # Close the server socket
-            print(f"Server socket on {'Unix socket' if self.use_unix_socket else 'TCP port'} cleaned up.")
+            LOG.info('server', "Server socket on %s cleaned up.", 'Unix socket' if self.use_unix_socket else 'TCP port')
 
-        if self.use_unix_socket and os.path.exists(self.HOST):
+        if self.use_unix_socket and self.cluster is None and os.path.exists(self.HOST):  # The supervisor removes a shared one
             os.remove(self.HOST)  # Remove the Unix socket file if it exists
-            print(f"Removed unix socket file: {self.HOST}")
+            LOG.info('server', "Removed unix socket file: %s", self.HOST)
 
 if __name__ == "__main__":
-    import sys  # Import the sys module for command-line argument handling
-    mode = sys.argv[1] if len(sys.argv) > 1 else 'network'  # Determine the mode from command-line arguments
-    if mode == 'local':
+    import argparse  # Import the argparse module for command-line argument handling
+    parser = argparse.ArgumentParser(description='Guess game server')
+    parser.add_argument('mode', nargs='?', default='network', help="'local' (Unix socket) or 'network' (TCP socket)")
+    parser.add_argument('--engine', choices=Server.ENGINES, default='threaded', help='connection engine (default: threaded)')
+    parser.add_argument('--completed-cap', type=int, default=DEFAULT_MEMORY_CAP, help='completed games kept in memory')
+    parser.add_argument('--completed-spill', default=None, help='file for completed games evicted from memory (default: temporary file)')
+    parser.add_argument('--journal', default=None, metavar='DIR', help='journal the games to DIR and recover them on restart')
+    parser.add_argument('--max-queued-kb', type=int, default=MAX_QUEUED_BYTES // 1024, help='outbound data allowed to wait for one client')
+    parser.add_argument('--slow-client-policy', choices=OVERFLOW_POLICIES, default=DISCONNECT,
+                        help='what happens when a client stops reading (default: disconnect)')
+    parser.add_argument('--log-level', choices=LEVELS, default='info', help='lowest level logged (default: info)')
+    parser.add_argument('--log-sample', type=parse_sampling, default={}, metavar='CATEGORY=FRACTION,...',
+                        help='log only a fraction of the records of the categories, e.g. request=0.01,game=0.1')
+    parser.add_argument('--log-rate', type=int, default=DEFAULT_RATE_LIMIT,
+                        help=f'records logged per category and second, 0 for no limit (default: {DEFAULT_RATE_LIMIT})')
+    parser.add_argument('--log-file', default=None, help='append the log to this file instead of stdout')
+    parser.add_argument('--dictionary', default=None, metavar='INDEX',
+                        help='only accept words of this index, built with `python dictionary.py build` (default: any word)')
+    default_timeouts = Timeouts()
+    parser.add_argument('--auth-timeout', type=float, default=default_timeouts.auth, metavar='SECONDS',
+                        help=f'disconnect clients which did not submit the password in time, 0 for never (default: {default_timeouts.auth:g})')
+    parser.add_argument('--idle-timeout', type=float, default=default_timeouts.idle, metavar='SECONDS',
+                        help=f'disconnect clients which neither send requests nor play, 0 for never (default: {default_timeouts.idle:g})')
+    parser.add_argument('--game-timeout', type=float, default=default_timeouts.game, metavar='SECONDS',
+                        help=f"end games running longer with the 'timeout' result, 0 for never (default: {default_timeouts.game:g})")
+    parser.add_argument('--turn-timeout', type=float, default=default_timeouts.turn, metavar='SECONDS',
+                        help=f"end games without a guess or hint for this long, 0 for never (default: {default_timeouts.turn:g})")
+    parser.add_argument('--profile', action='store_true', help='start the sampling profiler right away, see /debug/profile')
+    parser.add_argument('--capture', default=None, metavar='FILE',
+                        help='record the client traffic to this file for `python3 -m loadgen.replay`, see /debug/capture')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes sharing the listening socket and the games, to use several cores (default: 1)')
+    default_limits = Limits()
+    parser.add_argument('--backlog', type=int, default=default_limits.backlog,
+                        help=f'connections the kernel queues until they are accepted (default: {default_limits.backlog})')
+    parser.add_argument('--max-connections', type=int, default=default_limits.max_connections,
+                        help=f'open client connections per process, 0 for no limit (default: {default_limits.max_connections})')
+    parser.add_argument('--max-players', type=int, default=default_limits.max_players,
+                        help='authorized clients per process, 0 for no limit (default: 0)')
+    parser.add_argument('--rate-limit', type=parse_rates, default=default_limits.rates, metavar='CLASS=RATE[/BURST],...',
+                        help='requests per second and burst of one connection, e.g. lobby=10/20,play=0 (0 for no limit, '
+                             'a burst of at least 1), classes: auth, lobby, match, play, watch')
+    parser.add_argument('--worker', type=WorkerSpec.parse, default=None, help=argparse.SUPPRESS)  # Set for the workers by the supervisor
+    args = parser.parse_args()  # Determine the mode and the options from command-line arguments
+    LOG.configure(level=LEVELS[args.log_level], sampling=args.log_sample, rate_limit=args.log_rate,
+                  stream=open(args.log_file, 'a', encoding='utf-8') if args.log_file else None)
+
+    timeouts = Timeouts(args.auth_timeout, args.idle_timeout, args.game_timeout, args.turn_timeout)
+    limits = Limits(args.backlog, args.max_connections, args.max_players, args.rate_limit)
+
+    if args.workers > 1 and args.worker is None:
+        # Run as supervisor of the worker processes, which get the same arguments
+        sys.exit(run_workers(args.workers, [sys.executable] + sys.argv, '/tmp/unix_socket' if args.mode == 'local' else None,
+                             backlog=args.backlog))
+
+    if args.mode == 'local':
         # Run the server in local mode using a Unix socket
-        server = Server('/tmp/unix_socket', 0, True)
+        server = Server('/tmp/unix_socket', 0, True, engine=args.engine,
+                        completed_cap=args.completed_cap, completed_spill_path=args.completed_spill,
+                        journal_dir=args.journal, max_queued_bytes=args.max_queued_kb * 1024,
+                        overflow_policy=args.slow_client_policy, dictionary_path=args.dictionary, timeouts=timeouts,
+                        worker=args.worker, limits=limits)
     else:
         # Run the server in network mode using a TCP socket
-        server = Server('0.0.0.0', 9999)
+        server = Server('0.0.0.0', 9999, engine=args.engine,
+                        completed_cap=args.completed_cap, completed_spill_path=args.completed_spill,
+                        journal_dir=args.journal, max_queued_bytes=args.max_queued_kb * 1024,
+                        overflow_policy=args.slow_client_policy, dictionary_path=args.dictionary, timeouts=timeouts,
+                        worker=args.worker, limits=limits)
+    if args.profile:
+        server.profiler.start()
+    if args.capture:
+        server.capture.start(args.capture if server.cluster is None else f'{args.capture}.worker-{server.cluster.index}')
     server.start()  # Start the server
-    
\ No newline at end of file
@@ -0,0 +1,158 @@
+import struct  # Import struct for the header of the spectator events
+import threading  # Import threading for the subscription lock
+from typing import Dict, Iterable, Optional, Set, Tuple  # Import type hints for better code readability
+from connection import Connection  # Import the Connection type of the spectators
+from game_registry import GameEvent, GameKey  # Import the events which are forwarded to the spectators
+from metrics import METRICS, SPECTATORS_DROPPED  # Import the metrics to count the dropped spectators
+
+# Kinds of a spectator event (0x1C)
+GAME = 0x01  # The game being watched, value: the word
+ATTEMPT = 0x02  # value: the guess
+HINT = 0x03  # value: the hint
+FINISHED = 0x04  # value: the result, the spectators stop watching the game
+DROPPED = 0x05  # The spectator fell behind and stopped watching the game, no value
+
+EVENT_KINDS = {'attempt': ATTEMPT, 'hint': HINT, 'finished': FINISHED}
+EVENT_HEADER = struct.Struct('>BBII')  # 0x1C, kind, setter ID, guesser ID
+SPECTATOR_MAX_QUEUED = 64 * 1024  # Outbound data a spectator may fall behind before it stops watching
+MAX_WATCHED_GAMES = 16  # Games one client may watch at the same time
+
+
+def encode_event(kind: int, game_key: GameKey, value: str = '') -> bytes:
+    """
+    Encodes a spectator event, e.g. (HINT, (1, 2), 'te__') ==> b'\\x1c\\x03\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x02te__'
+    """
+    return EVENT_HEADER.pack(0x1C, kind, game_key[0], game_key[1]) + value.encode('utf-8')
+
+
+class SpectatorHub:
+    """
+    Forwards the hints, guesses and the result of active games to the clients watching them.
+
+    `publish` is a registry listener and runs in the thread of the player who changed the game. It
+    encodes the event once and queues the same bytes object for every spectator, the connections
+    only add their frame header in front of it. A spectator whose outbound queue holds more than
+    `max_queued` bytes stops watching the game instead of growing its queue, so slow spectators
+    never cost the players more than the queuing itself.
+
+    The spectators of a game are kept in a tuple which is replaced on every change, `publish`
+    iterates it without taking the lock.
+    """
+
+    def __init__(self, max_queued: int = SPECTATOR_MAX_QUEUED):
+        """
+        Initializes a hub without spectators.
+
+        Args:
+            max_queued (int): Outbound data a spectator may fall behind before it stops watching.
+        """
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._spectators: Dict[GameKey, Tuple[Tuple[int, Connection], ...]] = {}  # game -> (spectator ID, connection)
+        self._watching: Dict[int, Set[GameKey]] = {}  # spectator ID -> watched games
+
+    def __len__(self) -> int:
+        return len(self._watching)
+
+    def is_watching(self, spectator_id: int) -> bool:
+        return spectator_id in self._watching
+
+    def watch(self, spectator_id: int, connection: Connection, game_key: GameKey, game: dict) -> bool:
+        """
+        Starts forwarding the events of a game, the current state is sent first.
+
+        The caller holds the game lock, so no event of the game can slip in between the state and the subscription.
+
+        Args:
+            spectator_id (int): The ID of the watching client.
+            connection (Connection): The connection of the client.
+            game_key (GameKey): The key of the game.
+            game (dict): The game.
+
+        Returns:
+            bool: False if the client already watches the maximum number of games.
+        """
+        with self._lock:
+            watched = self._watching.setdefault(spectator_id, set())
+            if game_key not in watched:
+                if len(watched) >= MAX_WATCHED_GAMES:
+                    return False
+                watched.add(game_key)
+                self._spectators[game_key] = self._spectators.get(game_key, ()) + ((spectator_id, connection),)
+
+        with connection.corked():
+            connection.send(encode_event(GAME, game_key, game['word']))
+            for attempt in game['attempts']:
+                connection.send(encode_event(ATTEMPT, game_key, attempt))
+            for hint in game['hints']:
+                connection.send(encode_event(HINT, game_key, hint))
+        return True
+
+    def unwatch(self, spectator_id: int, game_keys: Optional[Iterable[GameKey]] = None):
+        """
+        Stops forwarding the events of the games to the client.
+
+        Args:
+            spectator_id (int): The ID of the client.
+            game_keys (Optional[Iterable[GameKey]]): The games, all watched games if None.
+        """
+        with self._lock:
+            watched = self._watching.get(spectator_id)
+            if not watched:
+                return
+            for game_key in list(watched if game_keys is None else game_keys):
+                if game_key in watched:
+                    watched.discard(game_key)
+                    self._remove(game_key, spectator_id)
+            if not watched:
+                del self._watching[spectator_id]
+
+    def _remove(self, game_key: GameKey, spectator_id: int):
+        """
+        Removes a spectator of a game, the caller holds the lock.
+        """
+        spectators = tuple(entry for entry in self._spectators.get(game_key, ()) if entry[0] != spectator_id)
+        if spectators:
+            self._spectators[game_key] = spectators
+        else:
+            self._spectators.pop(game_key, None)
+
+    def publish(self, event: GameEvent):
+        """
+        Forwards a game event to the spectators of the game, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        spectators = self._spectators.get(event.game_key)
+        kind = EVENT_KINDS.get(event.kind)
+        if not spectators or kind is None:
+            return
+
+        value = event.value.result if kind == FINISHED else event.value
+        message = encode_event(kind, event.game_key, value)  # Encoded once, every connection queues this object
+        slow = []
+        for spectator in spectators:
+            if spectator[1].queued_bytes > self.max_queued:
+                slow.append(spectator)
+            else:
+                spectator[1].send(message)
+
+        if kind == FINISHED:
+            with self._lock:
+                for spectator_id, _ in self._spectators.pop(event.game_key, ()):
+                    watched = self._watching.get(spectator_id)
+                    if watched is not None:
+                        watched.discard(event.game_key)
+                        if not watched:
+                            del self._watching[spectator_id]
+        for spectator_id, connection in slow:
+            self.drop(spectator_id, connection, event.game_key)
+
+    def drop(self, spectator_id: int, connection: Connection, game_key: GameKey):
+        """
+        Stops forwarding a game to a spectator which fell behind and tells it so.
+        """
+        self.unwatch(spectator_id, [game_key])
+        METRICS.count(SPECTATORS_DROPPED)
+        connection.send(encode_event(DROPPED, game_key))
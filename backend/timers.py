@@ -0,0 +1,283 @@
+import math  # Import math to round delays up to whole ticks
+import threading  # Import threading for the wheel thread and its lock
+import time  # Import time for the tick clock and the game deadlines
+from typing import Callable, Dict, List, NamedTuple, Optional  # Import type hints for better code readability
+from game_registry import GameEvent, GameKey, GameRegistry  # Import the registry whose games get deadlines
+from log import LOG  # Import the logger, records are written by a background thread
+
+DEFAULT_TICK = 0.25  # Seconds per tick, the precision of every timeout
+SLOTS = 64  # Slots per wheel
+LEVELS = 4  # Wheels, the last one reaches SLOTS ** LEVELS ticks (48 days with the defaults)
+
+TIMEOUT = 'timeout'  # Result of a game which ran out of time
+
+
+class Timeouts(NamedTuple):
+    """
+    Seconds until the server gives up on a client or a game, 0 disables a timeout.
+
+    Attributes:
+        auth (float): From connecting until the password has to be submitted.
+        idle (float): Without a request before an authorized client is disconnected, unless it
+            plays, waits in the matchmaking queue or watches a game.
+        game (float): From the start of a game until it ends with the 'timeout' result.
+        turn (float): Without a guess or hint before a game ends with the 'timeout' result.
+    """
+    auth: float = 30.0
+    idle: float = 600.0
+    game: float = 3600.0
+    turn: float = 300.0
+
+
+class Timer:
+    """
+    A scheduled callback, returned by `TimerWheel.schedule`.
+
+    Attributes:
+        deadline (int): The tick the callback is due.
+        callback (Optional[Callable[[], None]]): Called once the deadline passed, None once cancelled.
+        cancelled (bool): Whether the timer was cancelled.
+    """
+    __slots__ = ('deadline', 'callback', 'cancelled')
+
+    def __init__(self, deadline: int, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback: Optional[Callable[[], None]] = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancels the timer, it is dropped from the wheel when its slot comes up.
+        """
+        self.cancelled = True
+        self.callback = None  # Don't keep e.g. the handler of a closed connection alive until then
+
+
+class TimerWheel:
+    """
+    One scheduler thread for all timeouts of the server, however many there are.
+
+    Timers are kept in a hierarchy of wheels (like the timers of the Linux kernel): the first wheel
+    has a slot per tick for the next SLOTS ticks, every further wheel has a slot per full turn of
+    the previous one. Scheduling appends the timer to one slot and cancelling only marks it, both
+    independent of the number of timers. When a wheel completes a turn, the next slot of the wheel
+    above is spread over the wheels below, so every timer is moved at most LEVELS - 1 times.
+
+    Callbacks run on the wheel thread, or are handed to `dispatch`, e.g. `loop.call_soon_threadsafe`
+    of the asyncio engine, whose transports must only be used from the loop.
+
+    Attributes:
+        tick (float): Seconds per tick.
+        dispatch (Optional[Callable[[Callable[[], None]], None]]): Runs a due callback, on the wheel thread if None.
+    """
+
+    def __init__(self, tick: float = DEFAULT_TICK):
+        """
+        Initializes an empty wheel, the thread starts with the first timer.
+
+        Args:
+            tick (float): Seconds per tick.
+        """
+        self.tick = tick
+        self.dispatch: Optional[Callable[[Callable[[], None]], None]] = None
+        self._lock = threading.Lock()
+        self._wheels: List[List[List[Timer]]] = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._now = 0  # Ticks since the start
+        self._started = time.monotonic()
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        Calls the callback after the delay, rounded up to the next tick.
+
+        Args:
+            delay (float): Seconds from now.
+            callback (Callable[[], None]): The callback, exceptions are logged.
+
+        Returns:
+            Timer: The timer, to cancel it.
+        """
+        with self._lock:
+            timer = Timer(self._now + max(1, math.ceil(delay / self.tick)), callback)
+            self._place(timer)
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+                self._thread.start()
+        return timer
+
+    def _place(self, timer: Timer):
+        """
+        Puts a timer into the slot of the lowest wheel reaching its deadline, the caller holds the lock.
+        """
+        ticks = timer.deadline - self._now
+        span = 1
+        for level in range(LEVELS):
+            if ticks < span * SLOTS or level == LEVELS - 1:  # The last wheel takes the rest, it is spread again on every turn
+                self._wheels[level][(timer.deadline // span) % SLOTS].append(timer)
+                return
+            span *= SLOTS
+
+    def _advance(self) -> List[Timer]:
+        """
+        Moves on by one tick, the caller holds the lock.
+
+        Returns:
+            List[Timer]: The timers due now.
+        """
+        self._now += 1
+        span = SLOTS
+        for level in range(1, LEVELS):  # Spread the next slot of every wheel which completed a turn
+            if self._now % span:
+                break
+            index = (self._now // span) % SLOTS
+            timers, self._wheels[level][index] = self._wheels[level][index], []
+            for timer in timers:
+                if timer.cancelled:
+                    self._pending -= 1
+                else:
+                    self._place(timer)
+            span *= SLOTS
+
+        index = self._now % SLOTS
+        timers, self._wheels[0][index] = self._wheels[0][index], []
+        self._pending -= len(timers)
+        return [timer for timer in timers if not timer.cancelled]
+
+    def _run(self):
+        while True:
+            time.sleep(max(0.0, self._started + (self._now + 1) * self.tick - time.monotonic()))
+            due = []
+            with self._lock:
+                while self._started + (self._now + 1) * self.tick <= time.monotonic():  # Catch up after a stall
+                    due.extend(self._advance())
+            for timer in due:
+                if self.dispatch is not None:
+                    try:
+                        self.dispatch(self._fire(timer))
+                    except RuntimeError:  # The event loop is closed, the server is shutting down
+                        return
+                else:
+                    self._fire(timer)()
+
+    @staticmethod
+    def _fire(timer: Timer) -> Callable[[], None]:
+        def fire():
+            callback = timer.callback
+            if callback is None:  # Cancelled after it was taken from the wheel
+                return
+            try:
+                callback()
+            except Exception as e:
+                LOG.error('server', "Timer callback %r failed: %s", callback, e)
+        return fire
+
+
+class _Deadline:
+    """
+    The deadline of one active game.
+    """
+    __slots__ = ('started_at', 'last_move_at', 'timer')
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.last_move_at = started_at
+        self.timer: Optional[Timer] = None
+
+
+class GameDeadlines:
+    """
+    Ends the games which ran too long or where the guesser stopped playing with the 'timeout' result.
+
+    Every game has one timer at a time. A guess or a hint only records the time, the timer checks
+    when it fires whether the game is really overdue and otherwise schedules itself for the new
+    deadline, so the moves of the players never touch the wheel.
+    """
+
+    def __init__(self, registry: GameRegistry, timers: TimerWheel, timeouts: Timeouts,
+                 notify: Callable[[int, bytes], None]):
+        """
+        Initializes the deadlines of the registry's games.
+
+        Args:
+            registry (GameRegistry): The registry of the games.
+            timers (TimerWheel): The scheduler.
+            timeouts (Timeouts): The game and turn timeouts.
+            notify (Callable[[int, bytes], None]): Sends a message to a player if it is connected.
+        """
+        self.registry = registry
+        self.timers = timers
+        self.timeouts = timeouts
+        self.notify = notify
+        self._deadlines: Dict[GameKey, _Deadline] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def track(self, game_key: GameKey, started_at: float, last_move_at: Optional[float] = None):
+        """
+        Starts the deadline of a game, e.g. of a game recovered after a restart.
+
+        Args:
+            game_key (GameKey): The key of the game.
+            started_at (float): The start of the game (time.time()).
+            last_move_at (Optional[float]): The last guess or hint, the start if None.
+        """
+        if not self.timeouts.game and not self.timeouts.turn:
+            return
+        deadline = _Deadline(started_at)
+        deadline.last_move_at = last_move_at or started_at
+        self._deadlines[game_key] = deadline
+        self._schedule(game_key, deadline)
+
+    def on_game_event(self, event: GameEvent):
+        """
+        Starts, moves and stops the deadlines of the games, a registry listener.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        if event.kind == 'created':
+            self.track(event.game_key, event.timestamp)
+        elif event.kind == 'finished':
+            deadline = self._deadlines.pop(event.game_key, None)
+            if deadline is not None and deadline.timer is not None:
+                deadline.timer.cancel()
+        else:
+            deadline = self._deadlines.get(event.game_key)
+            if deadline is not None:
+                deadline.last_move_at = event.timestamp
+
+    def _due(self, deadline: _Deadline) -> float:
+        """
+        Returns the time the game is overdue at.
+        """
+        due = math.inf
+        if self.timeouts.game:
+            due = deadline.started_at + self.timeouts.game
+        if self.timeouts.turn:
+            due = min(due, deadline.last_move_at + self.timeouts.turn)
+        return due
+
+    def _schedule(self, game_key: GameKey, deadline: _Deadline):
+        deadline.timer = self.timers.schedule(self._due(deadline) - time.time(), lambda: self._expire(game_key, deadline))
+
+    def _expire(self, game_key: GameKey, deadline: _Deadline):
+        if self._deadlines.get(game_key) is not deadline:  # Finished meanwhile, maybe the same players play again
+            return
+
+        with self.registry.locked_game(game_key[0]) as (active_key, game):  # The moves are made with the game lock held
+            if active_key != game_key or game.get('started_at') != deadline.started_at:
+                self._deadlines.pop(game_key, None)  # Finished before the deadline was tracked
+                return
+            if time.time() < self._due(deadline):  # A move since the timer was scheduled
+                self._schedule(game_key, deadline)
+                return
+            self.registry.finish(game_key, TIMEOUT)
+        for player_id in game_key:
+            self.notify(player_id, b'\x0F' + b'The game timed out.')
+        LOG.info('game', "Game %s timed out.", game_key)
@@ -1,16 +1,112 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer  # Import modules for handling HTTP requests and creating a server
+import html  # Import html to escape the filter values echoed back in the page
+import json  # Import json for the JSON API
+import threading  # Import threading for the cache lock
+import time  # Import time for the ETag prefix of this server run
+from collections import OrderedDict  # Import OrderedDict for the LRU caches
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Import modules for handling HTTP requests and creating a server
+from typing import List, NamedTuple, Optional, Tuple  # Import type hints for better code readability
+from urllib.parse import parse_qs, urlencode, urlsplit  # Import URL helpers for the query parameters
+from completed_store import CompletedGame  # Import the CompletedGame record for type hints
+from event_bus import completed_game_json  # Import the JSON form of completed games
+from export import FORMATS, export_chunks, parse_time  # Import the streaming encoders of the export
+from player_stats import DEFAULT_TOP, MAX_TOP, ORDERS  # Import the limits and orders of the leaderboards
+from profiler import DEFAULT_INTERVAL  # Import the default sampling interval of the profiler
+from log import LOG  # Import the logger, records are written by a background thread
+
+PAGE_SIZE = 50  # Finished games per page by default
+MAX_PAGE_SIZE = 500  # Largest accepted per_page
+PAGE_CACHE_SIZE = 64  # Number of rendered pages (distinct queries) kept
+ROW_CACHE_SIZE = 4096  # Number of rendered finished game rows kept
+SSE_KEEPALIVE = 15.0  # Seconds between keep-alive comments of an idle event stream
+
+
+class GamesQuery(NamedTuple):
+    """
+    The query parameters of the /games page, e.g. /games?page=2&per_page=20&player=3&result=gave+up
+
+    Attributes:
+        page (int): The page of finished games, starting at 1.
+        per_page (int): The number of finished games per page.
+        player (Optional[int]): Only games of this player, as setter or guesser.
+        result (Optional[str]): Only finished games with this result.
+    """
+    page: int = 1
+    per_page: int = PAGE_SIZE
+    player: Optional[int] = None
+    result: Optional[str] = None
+
+    @classmethod
+    def parse(cls, query: str) -> 'GamesQuery':
+        """
+        Parses and validates a query string.
+
+        Args:
+            query (str): The query string of the request URL.
+
+        Returns:
+            GamesQuery: The query.
+
+        Raises:
+            ValueError: If a parameter is not valid.
+        """
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', PAGE_SIZE))
+        if page < 1 or not 1 <= per_page <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be >= 1 and per_page between 1 and {MAX_PAGE_SIZE}")
+        player = int(params['player']) if params.get('player') else None
+        return cls(page, per_page, player, params.get('result') or None)
+
+    def url(self, page: int) -> str:
+        """
+        Returns the URL of another page with the same filters.
+        """
+        params = {'page': page, 'per_page': self.per_page}
+        if self.player is not None:
+            params['player'] = self.player
+        if self.result is not None:
+            params['result'] = self.result
+        return '/games?' + urlencode(params)
+
 
 class GameServer(BaseHTTPRequestHandler):
     """
     GameServer class to handle HTTP GET requests and serve the current status of active and finished games.
 
+    Routes:
+        /games: The HTML dashboard.
+        /api/games: The active games as JSON, `?player=` filters by player.
+        /api/games/<setter ID>/<guesser ID>: One active game.
+        /api/completed: One page of completed games, with the query parameters of /games.
+        /api/completed/<game ID>: One completed game.
+        /api/export: All completed games as a stream, `?format=ndjson` or `csv`, `?since=` and `?until=`
+            (Unix time or ISO 8601) and `?player=` filter them.
+        /api/players/<player ID>: The statistics of a player.
+        /api/leaderboard: The best players, `?order=wins` or `win_rate` and `?count=` players.
+        /api/events: A Server-Sent Events stream of the game events, `?player=` filters by player.
+        /api/connections: The depth of the outbound queues of the clients.
+        /metrics: The request counters and latency histograms in the Prometheus text format.
+        /debug/profile: The stacks counted by the sampling profiler, POST /debug/profile/start
+            (`?interval=` seconds) and /debug/profile/stop switch it on and off.
+        /debug/capture: The state of the traffic capture, POST /debug/capture/start records to a new
+            file in the temporary directory, /debug/capture/stop ends the capture.
+
+    Rendered pages are cached per query together with the registry version they were rendered at,
+    a request for an unchanged page is answered from the cache, or with 304 Not Modified if the
+    browser sends the ETag of its copy. The rows of finished games never change and are cached
+    separately, so a change of an active game only renders the active games again.
+
     Attributes:
         server_instance (Server): The instance of the game server that holds the game data.
     """
     server_instance = None  # A class variable to store the server instance containing the game data
+    run_id = format(int(time.time() * 1000), 'x')  # Makes the ETags of different server runs differ
+    _cache_lock = threading.Lock()  # Guards both caches
+    _page_cache: 'OrderedDict[GamesQuery, Tuple[int, bytes]]' = OrderedDict()  # query -> (version, page)
+    _row_cache: 'OrderedDict[int, str]' = OrderedDict()  # finished game ID -> row
 
     @classmethod  # A decorator indicating that this method is a class method and will operate on the class itself, not on instances of the class
-    # Simply said all instances of the GS class will have access to the same game data because the server_instance variable is defined at the class level 
+    # Simply said all instances of the GS class will have access to the same game data because the server_instance variable is defined at the class level
     # and shared between all instances
     # e.g., 5 child instances of the GameServer class will share the same game data source
     def set_server_instance(cls, server_instance):
@@ -20,37 +116,354 @@ class GameServer(BaseHTTPRequestHandler):
         Args:
             server_instance (Server): An instance of the Server class that holds game information.
         """
-        
+
         cls.server_instance = server_instance  # Assign the server instance to the class variable
 
     def do_GET(self):
         """
-        Handles HTTP GET requests. Responds with the current game status in HTML format.
+        Handles HTTP GET requests.
+
+        This method is automatically called when the server receives an HTTP GET request, every
+        request is handled by its own thread.
+        If the request path is '/games', it will send an HTML page displaying the status of active and finished games.
+        """
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        try:
+            query = GamesQuery.parse(url.query)
+            if url.path == '/games':  # Check if the request path is '/games'
+                self.send_games_page(query)
+            elif parts[:2] == ['api', 'events'] and len(parts) == 2:
+                self.stream_events(query.player)
+            elif parts[:2] == ['api', 'games'] and len(parts) in (2, 4):
+                self.send_active_games(query, parts[2:])
+            elif parts[:2] == ['api', 'completed'] and len(parts) in (2, 3):
+                self.send_completed_games(query, parts[2:])
+            elif url.path == '/api/export':
+                self.send_export(url.query, query.player)
+            elif parts[:2] == ['api', 'players'] and len(parts) == 3:
+                self.send_json(self.server_instance.stats.get(int(parts[2])).to_dict())
+            elif url.path == '/api/leaderboard':
+                self.send_leaderboard(url.query)
+            elif url.path == '/api/connections':
+                self.send_json(self.server_instance.outbound_stats())
+            elif url.path == '/metrics':
+                self.send_body(self.server_instance.metrics.render().encode('utf-8'), 'text/plain; version=0.0.4')
+            elif url.path == '/debug/profile':
+                self.send_profile()
+            elif url.path == '/debug/capture':
+                self.send_json(self.server_instance.capture.status())
+            else:
+                self.send_error(404)
+        except ValueError as e:
+            self.send_error(400, str(e))
+
+    def do_POST(self):
+        """
+        Handles HTTP POST requests, which switch the sampling profiler and the traffic capture on and off.
+        """
+        url = urlsplit(self.path)
+        profiler = self.server_instance.profiler
+        try:
+            if url.path == '/debug/profile/start':
+                params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                interval = float(params.get('interval', DEFAULT_INTERVAL))
+                if not 0.0001 <= interval <= 10:
+                    raise ValueError("interval must be between 0.0001 and 10 seconds")
+                profiler.start(interval)
+                self.send_json(profiler.status())
+            elif url.path == '/debug/profile/stop':
+                profiler.stop()
+                self.send_json(profiler.status())
+            elif url.path == '/debug/capture/start':
+                self.server_instance.capture.start()
+                self.send_json(self.server_instance.capture.status())
+            elif url.path == '/debug/capture/stop':
+                self.server_instance.capture.stop()
+                self.send_json(self.server_instance.capture.status())
+            else:
+                self.send_error(404)
+        except ValueError as e:
+            self.send_error(400, str(e))
+
+    def send_profile(self):
+        """
+        Sends the stacks counted by the sampling profiler in the collapsed stack format, the state of the profiler in headers.
+        """
+        profiler = self.server_instance.profiler
+        body = profiler.collapsed().encode('utf-8')
+        status = profiler.status()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Profiler-Running', str(status['running']).lower())
+        self.send_header('X-Profiler-Samples', str(status['samples']))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        """
+        Logs a served request through the background logger instead of writing to stderr.
+        """
+        LOG.debug('web', "%s - " + format, self.address_string(), *args)
+
+    def not_modified(self, etag: str) -> bool:
+        """
+        Answers with 304 Not Modified if the client already has the current version.
+
+        Args:
+            etag (str): The ETag of the current version.
+
+        Returns:
+            bool: True if the 304 was sent.
+        """
+        if etag not in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return False
+        self.send_response(304)  # The browser's copy is still current
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return True
+
+    def send_body(self, body: bytes, content_type: str, etag: Optional[str] = None):
+        """
+        Sends a 200 OK response with the body.
+
+        Args:
+            body (bytes): The body.
+            content_type (str): The content type.
+            etag (Optional[str]): The ETag, the client revalidates the response with it.
+        """
+        self.send_response(200)  # Send an HTTP 200 OK
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # Cache, but revalidate with the ETag every time
+        self.end_headers()  # End the headers section of the response
+        self.wfile.write(body)
+
+    def send_json(self, data, etag: Optional[str] = None):
+        self.send_body(json.dumps(data, separators=(',', ':')).encode('utf-8'), 'application/json', etag)
+
+    def current_version(self) -> Tuple[int, str]:
+        """
+        Returns the registry version and its ETag, read before the games, see GameRegistry.
+        """
+        version = self.server_instance.dashboard.version
+        return version, f'"{self.run_id}-{version}"'
+
+    def send_games_page(self, query: GamesQuery):
+        """
+        Sends the HTML dashboard, from the cache if the games did not change.
+        """
+        version, etag = self.current_version()
+        if self.not_modified(etag):
+            return
+        games_html = self.cached_page(query, version)
+        self.send_body(games_html, 'text/html; charset=utf-8', etag)  # Specify that the content is HTML
 
-        This method is automatically called when the server receives an HTTP GET request.
-        If the request path is '/games', it will generate and send an HTML page displaying the status of active and finished games.
+    def send_active_games(self, query: GamesQuery, game_key: List[str]):
         """
-        
-        if self.path == '/games':  # Check if the request path is '/games'
-            self.send_response(200)  # Send an HTTP 200 OK
-            self.send_header('Content-type', 'text/html')  # Specify that the content is HTML
-            self.end_headers()  # End the headers section of the response
+        Sends all active games, or the one with the given key, as JSON.
+        """
+        _, etag = self.current_version()
+        if self.not_modified(etag):
+            return
+        games = [
+            dict(game, setter_id=key[0], guesser_id=key[1])
+            for key, game in self.server_instance.dashboard.snapshot_games().items()
+            if query.player is None or query.player in key
+        ]
+        if not game_key:
+            self.send_json({'games': games}, etag)
+            return
+
+        setter_id, guesser_id = int(game_key[0]), int(game_key[1])
+        for game in games:
+            if game['setter_id'] == setter_id and game['guesser_id'] == guesser_id:
+                self.send_json(game, etag)
+                return
+        self.send_error(404, 'No such active game')
+
+    def send_completed_games(self, query: GamesQuery, game_id: List[str]):
+        """
+        Sends one page of completed games, or the one with the given ID, as JSON.
+        """
+        if game_id:
+            game = self.server_instance.dashboard.completed.get(int(game_id[0]))
+            if game is None:
+                self.send_error(404, 'No such completed game')
+            else:
+                self.send_json(completed_game_json(game))  # Never changes, no need to revalidate
+            return
+
+        _, etag = self.current_version()
+        if self.not_modified(etag):
+            return
+        games, has_older = self.finished_games_page(query)
+        self.send_json({'page': query.page, 'per_page': query.per_page, 'has_older': has_older,
+                        'games': [completed_game_json(game) for game in games]}, etag)
+
+    def send_export(self, query: str, player: Optional[int]):
+        """
+        Streams the completed games as NDJSON or CSV, e.g. /api/export?format=csv&since=2026-10-01&player=3
+
+        The games are read a page at a time and written in chunks as they are encoded, so the memory
+        stays the same however many games are exported. HTTP/1.1 clients get a chunked response,
+        HTTP/1.0 clients a body which ends when the connection is closed.
+        """
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        export_format = params.get('format', 'ndjson')
+        if export_format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        since = parse_time(params['since']) if params.get('since') else None
+        until = parse_time(params['until']) if params.get('until') else None
+        games = self.server_instance.dashboard.completed.export(since, until, player)
+
+        chunked = self.request_version == 'HTTP/1.1'
+        if chunked:
+            self.protocol_version = 'HTTP/1.1'  # Chunked encoding needs a 1.1 status line, the connection is still closed after
+        self.send_response(200)
+        self.send_header('Content-type', FORMATS[export_format])
+        self.send_header('Content-Disposition', f'attachment; filename="completed_games.{export_format}"')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        exported = 0
+        try:
+            for chunk in export_chunks(games, export_format):
+                self.wfile.write(b'%X\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                exported += len(chunk)
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            LOG.debug('web', "Export aborted by the client after %d bytes", exported)
+            return
+        LOG.info('web', "Exported %d bytes of completed games as %s", exported, export_format)
+
+    def send_leaderboard(self, query: str):
+        """
+        Sends a leaderboard as JSON, e.g. /api/leaderboard?order=win_rate&count=20
+        """
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        order = params.get('order', 'wins')
+        count = int(params.get('count', DEFAULT_TOP))
+        if order not in ORDERS or not 1 <= count <= MAX_TOP:
+            raise ValueError(f"order must be one of {', '.join(ORDERS)} and count between 1 and {MAX_TOP}")
+        players = self.server_instance.stats.top(ORDERS[order], count)
+        self.send_json({'order': order, 'players': [stats.to_dict() for stats in players]})
+
+    def stream_events(self, player: Optional[int]):
+        """
+        Streams the game events as Server-Sent Events until the client disconnects.
+
+        Every event is sent as `event: <kind>` with the JSON of the event as data, see `game_event_json`.
+        A client which reads slower than the events arrive is dropped, EventSource reconnects by itself.
+
+        Args:
+            player (Optional[int]): Only events of games of this player, all events if None.
+        """
+        events = self.server_instance.events
+        subscription = events.subscribe(player)
+        self.connection.settimeout(2 * SSE_KEEPALIVE)  # A client which stopped reading must not hold the thread forever
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(b'retry: 1000\n\n')
+            self.wfile.flush()
+            while not subscription.dropped:
+                message = subscription.get(SSE_KEEPALIVE)
+                self.wfile.write(message if message is not None else b': keep-alive\n\n')
+                self.wfile.flush()
+        except OSError:
+            pass  # The client went away or stopped reading
+        finally:
+            events.unsubscribe(subscription)
+            self.close_connection = True
+
+    def cached_page(self, query: GamesQuery, version: int) -> bytes:
+        """
+        Returns the page for the query, rendered again only if the games changed since it was cached.
+
+        Args:
+            query (GamesQuery): The query.
+            version (int): The registry version read before rendering.
+
+        Returns:
+            bytes: The UTF-8 encoded page.
+        """
+        with self._cache_lock:
+            cached = self._page_cache.get(query)
+            if cached is not None and cached[0] == version:
+                self._page_cache.move_to_end(query)
+                return cached[1]
+
+        page = self.generate_games_html(query).encode('utf-8')
+        with self._cache_lock:
+            self._page_cache[query] = (version, page)
+            self._page_cache.move_to_end(query)
+            if len(self._page_cache) > PAGE_CACHE_SIZE:
+                self._page_cache.popitem(last=False)
+        return page
+
+    def finished_games_page(self, query: GamesQuery) -> Tuple[List[CompletedGame], bool]:
+        """
+        Returns the finished games of the requested page, newest first, see `CompletedGameStore.newest`.
 
-            games_html = self.generate_games_html()  # Generate the HTML content for the games
-            self.wfile.write(games_html.encode('utf-8'))  # Write the HTML content to the response
+        Args:
+            query (GamesQuery): The query.
+
+        Returns:
+            Tuple[List[CompletedGame], bool]: The games and whether there are older ones.
+        """
+        return self.server_instance.dashboard.completed.newest(query.per_page, (query.page - 1) * query.per_page,
+                                                               query.player, query.result)
+
+    def finished_game_row(self, game: CompletedGame) -> str:
+        """
+        Returns the table row of a finished game, rendered once per game.
+        """
+        with self._cache_lock:
+            row = self._row_cache.get(game.game_id)
+        if row is not None:
+            return row
+
+        row = f"""
+            <tr>
+                <td>Game between players with ID {game.setter_id} and {game.guesser_id}</td>
+                <td>
+                    <p>Word to guess: {game.word}</p>
+                    <p>Attempts: {', '.join(game.attempts)}</p>
+                    <p>Hints: {', '.join(game.hints)}</p>
+                    <p>Result: {game.result}</p>
+                </td>
+            </tr>
+            """
+        with self._cache_lock:
+            self._row_cache[game.game_id] = row
+            if len(self._row_cache) > ROW_CACHE_SIZE:
+                self._row_cache.popitem(last=False)
+        return row
 
-    def generate_games_html(self): # Generate HTML content
+    def generate_games_html(self, query: GamesQuery = GamesQuery()) -> str: # Generate HTML content
         """
         Generates an HTML representation of the current status of active and finished games.
 
-        This method constructs an HTML page that lists all active games and finished games with details like the word to guess, attempts, hints, and the result.
+        This method constructs an HTML page that lists all active games and one page of finished games with details like the word to guess, attempts, hints, and the result.
+
+        Args:
+            query (GamesQuery): The page and the filters, the player filter applies to the active games too.
 
         Returns:
             str: The HTML content as a string.
         """
-        
-        # Start of the HTML document with styling
-        html = """
+
+        # Start of the HTML document with styling, the parts are joined once at the end
+        parts = ["""
         <html>
         <head>
             <title>Game Status</title>
@@ -94,10 +507,21 @@ class GameServer(BaseHTTPRequestHandler):
                 .hint, .result {
                     font-weight: bold;
                 }
+                .pagination a, .pagination span {
+                    margin-right: 20px;
+                }
             </style>
         </head>
         <body>
             <h1>Game Status</h1>
+        """, f"""
+            <form method="get" action="/games">
+                Player ID: <input name="player" size="6" value="{'' if query.player is None else query.player}">
+                Result: <input name="result" size="16" value="{html.escape(query.result or '')}">
+                <input type="hidden" name="per_page" value="{query.per_page}">
+                <input type="submit" value="Filter">
+            </form>
+        """, """
             <div class="container">
                 <div class="game-section">
                     <h2>Active Games</h2>
@@ -109,12 +533,14 @@ class GameServer(BaseHTTPRequestHandler):
                             </tr>
                         </thead>
                         <tbody>
-        """
+        """]
 
         # Active games section
-        # Iterate through the games dict in the server_instance
-        for game_key, game_data in self.server_instance.games.items():
-            html += f"""
+        # Iterate through a consistent copy of the games, the handler threads keep changing the originals
+        for game_key, game_data in self.server_instance.dashboard.snapshot_games().items():
+            if query.player is not None and query.player not in game_key:
+                continue
+            parts.append(f"""
             <tr>
                 <td>Game between players with ID {game_key[0]} and {game_key[1]}</td>
                 <td>
@@ -123,9 +549,9 @@ class GameServer(BaseHTTPRequestHandler):
                     <p>Hints: {', '.join(game_data['hints'])}</p>
                 </td>
             </tr>
-            """
+            """)
 
-        html += """
+        parts.append("""
                         </tbody>
                     </table>
                 </div>
@@ -139,32 +565,30 @@ class GameServer(BaseHTTPRequestHandler):
                             </tr>
                         </thead>
                         <tbody>
-        """
+        """)
+
+        # Finished games section, one page newest first, games moved to disk are paged back in lazily
+        games, has_older = self.finished_games_page(query)
+        parts.extend(self.finished_game_row(game) for game in games)
 
-        # Finished games section
-        for game_key, game_list in self.server_instance.completed_games.items():
-            for game_data in game_list:  # Iterate over each finished game for this pair of players
-                html += f"""
-                <tr>
-                    <td>Game between players with ID {game_key[0]} and {game_key[1]}</td>
-                    <td>
-                        <p>Word to guess: {game_data['word']}</p>
-                        <p>Attempts: {', '.join(game_data['attempts'])}</p>
-                        <p>Hints: {', '.join(game_data['hints'])}</p>
-                        <p>Result: {game_data['result']}</p>
-                    </td>
-                </tr>
-                """
-        
-        html += """
+        parts.append("""
                         </tbody>
                     </table>
+                    <div class="pagination">
+        """)
+        if query.page > 1:
+            parts.append(f'<a href="{html.escape(query.url(query.page - 1))}">&laquo; Newer</a>')
+        parts.append(f'<span>Page {query.page}</span>')
+        if has_older:
+            parts.append(f'<a href="{html.escape(query.url(query.page + 1))}">Older &raquo;</a>')
+        parts.append("""
+                    </div>
                 </div>
             </div>
         </body>
         </html>
-        """
-        return html
+        """)
+        return ''.join(parts)
 
 def run_web_server(server_instance, port=8080):
     """
@@ -176,7 +600,7 @@ def run_web_server(server_instance, port=8080):
     """
 
     GameServer.set_server_instance(server_instance)  # Set the server instance for the GameServer
-    web_server = HTTPServer(('localhost', port), GameServer)  # Create the HTTP server
-    print(f'Starting web server on port {port}')  # Log the port on which the server is running
+    web_server = ThreadingHTTPServer(('localhost', port), GameServer)  # Create the HTTP server, a thread per request
+    web_server.daemon_threads = True  # Open event streams must not keep the process alive
+    LOG.info('web', "Starting web server on port %d", port)  # Log the port on which the server is running
     web_server.serve_forever()  # Start serving requests indefinitely
-    
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+Load generator for the guess game server.
+
+Simulates pairs of players speaking the binary protocol (binary_protocol.md) over TCP or Unix
+sockets and measures the throughput and the latency percentiles per request opcode.
+
+    python3 -m loadgen --players 2000 --duration 30
+    python3 -m loadgen.bench run --spawn --out results.json
+    python3 -m loadgen.replay capture.cap
+"""
+from .players import DEFAULT_MIX, LoadConfig, Mix, run_load  # The simulated players
+from .protocol import ProtocolClient, ProtocolError  # The protocol client
+from .stats import LatencyRecorder, format_report  # The measurements
+
+__all__ = ['DEFAULT_MIX', 'LoadConfig', 'Mix', 'run_load', 'ProtocolClient', 'ProtocolError', 'LatencyRecorder',
+           'format_report']
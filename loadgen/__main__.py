@@ -0,0 +1,3 @@
+from .cli import main  # Import the command line of a single load run
+
+main()
@@ -0,0 +1,226 @@
+import argparse  # Import the argparse module for command-line argument handling
+import asyncio  # Import asyncio to run the simulated players
+import datetime  # Import datetime for the date of the results
+import json  # Import json for the suite and the results
+import os  # Import the os module for the paths
+import platform  # Import platform to describe the machine of the results
+import signal  # Import signal to stop the spawned server
+import socket  # Import socket to wait until the spawned server listens
+import subprocess  # Import subprocess to spawn the server and read the git commit
+import sys  # Import sys for the Python interpreter and the exit code
+import time  # Import time to wait for the spawned server
+from typing import Dict, List, Optional  # Import type hints for better code readability
+from .cli import UNLIMITED_RATES, add_load_arguments, default_address, raise_open_file_limit, report_busy  # Import the shared load options
+from .players import DEFAULT_MIX, LoadConfig, Mix, run_load  # Import the simulated players
+from .stats import format_report  # Import the report formatting
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(PACKAGE_DIR), 'backend')
+DEFAULT_SUITE = os.path.join(PACKAGE_DIR, 'suite.json')
+DEFAULT_BASELINE = os.path.join(PACKAGE_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.2  # A throughput drop or p99 increase of more than 20 % is a regression
+FAILURE_COUNTS = ('aborted_pairs', 'server_busy', 'failed_connections')  # Sessions which failed, of a load run and of a replay
+MIN_P99_MS = 1.0  # p99 latencies below this are too noisy to compare
+
+
+def load_suite(path: str) -> List[dict]:
+    """
+    Loads the benchmark scenarios.
+
+    Args:
+        path (str): The suite file, e.g. {"scenarios": [{"name": "gameplay", "players": 200, "duration": 5, ...}]}.
+
+    Returns:
+        List[dict]: The scenarios.
+    """
+    with open(path, 'r', encoding='utf-8') as suite_file:
+        return json.load(suite_file)['scenarios']
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_server(engine: str, address: str) -> subprocess.Popen:
+    """
+    Starts backend/server.py in local mode (Unix socket) and waits until it accepts connections.
+
+    The server logs every request, its output is discarded so the terminal does not slow it down.
+    Its request rates are not limited, the suite measures the handling of the requests, not their rejection.
+
+    Args:
+        engine (str): The connection engine of the server.
+        address (str): The Unix socket path the server listens on.
+
+    Returns:
+        subprocess.Popen: The server process.
+    """
+    server = subprocess.Popen([sys.executable, 'server.py', 'local', '--engine', engine, '--rate-limit', UNLIMITED_RATES],
+                              cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(address)
+            return server
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            probe.close()
+    stop_server(server)
+    raise RuntimeError(f"The server did not start listening on {address}")
+
+
+def stop_server(server: subprocess.Popen):
+    """
+    Stops a spawned server, first with SIGINT so it cleans up its socket file.
+    """
+    server.send_signal(signal.SIGINT)
+    try:
+        server.wait(5)
+    except subprocess.TimeoutExpired:
+        server.kill()  # The web server thread keeps the process alive
+        server.wait()
+
+
+def run_suite(args) -> dict:
+    """
+    Runs every scenario of the suite, each against a freshly spawned server if requested.
+
+    Returns:
+        dict: {'meta': {...}, 'scenarios': {name: result of run_load}}.
+    """
+    mode = 'local' if args.spawn else args.mode
+    address = args.address or default_address(mode)
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'engine': args.engine if args.spawn else None,
+            'framed': not args.unframed,
+        },
+        'scenarios': {},
+    }
+
+    for scenario in load_suite(args.suite):
+        if args.only and scenario['name'] not in args.only:
+            continue
+        config = LoadConfig(mode=mode, address=address, players=scenario['players'], duration=scenario['duration'],
+                            mix=Mix.parse(scenario.get('mix', DEFAULT_MIX)), framed=not args.unframed,
+                            ramp_up=scenario.get('ramp_up', 1.0), think_time=scenario.get('think_time', 0.0),
+                            timeout=args.timeout, seed=args.seed)
+        print(f"[*] Scenario {scenario['name']}: {config.players} players for {config.duration:g}s, mix {config.mix}")
+        server = spawn_server(args.engine, address) if args.spawn else None
+        try:
+            result = asyncio.run(run_load(config))
+        finally:
+            if server is not None:
+                stop_server(server)
+        print(format_report(result['operations']))
+        print(f"[*] {result['throughput']} operations/s, {result['aborted_pairs']} of {result['pairs']} pairs aborted\n")
+        report_busy(result['server_busy'])
+        results['scenarios'][scenario['name']] = result
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """
+    Compares the throughput and the p99 latency of every operation with the baseline.
+
+    An operation of the baseline missing in the new results (it never succeeded) and more aborted
+    sessions than in the baseline are regressions regardless of the tolerance. Scenarios missing in
+    the new results are skipped, e.g. those left out with --only.
+
+    Args:
+        baseline (dict): The baseline results.
+        current (dict): The new results.
+        tolerance (float): The allowed relative change, e.g. 0.2.
+
+    Returns:
+        List[str]: The regressions, empty if there are none.
+    """
+    regressions = []
+    print(f"{'scenario / operation':<32}{'ops/s base':>12}{'ops/s now':>12}{'change':>9}"
+          f"{'p99 base':>10}{'p99 now':>10}{'change':>9}")
+    for name, base_result in baseline['scenarios'].items():
+        result = current['scenarios'].get(name)
+        if result is None:
+            continue
+        for operation, base in base_result['operations'].items():
+            if not base['count']:
+                continue
+            label = f"{name} / {operation}"
+            now = result['operations'].get(operation)
+            if now is None:
+                print(f"{label:<32}{base['throughput']:>12}{'-':>12}{'':>9}{base['p99_ms']:>10}{'-':>10}{'':>9}  missing")
+                regressions.append(f"{label}: missing")
+                continue
+            throughput_change = now['throughput'] / base['throughput'] - 1 if base['throughput'] else 0.0
+            p99_change = (now['p99_ms'] or 0) / base['p99_ms'] - 1 if base['p99_ms'] else 0.0
+
+            flags = []
+            if throughput_change < -tolerance:
+                flags.append('throughput')
+            if p99_change > tolerance and max(base['p99_ms'], now['p99_ms'] or 0) >= MIN_P99_MS:
+                flags.append('p99')
+            print(f"{label:<32}{base['throughput']:>12}{now['throughput']:>12}{throughput_change:>+9.0%}"
+                  f"{base['p99_ms']:>10}{now['p99_ms'] or 0:>10}{p99_change:>+9.0%}  {' '.join(flags)}")
+            regressions.extend(f"{label}: {flag}" for flag in flags)
+        for failures in FAILURE_COUNTS:
+            if result.get(failures, 0) > base_result.get(failures, 0):
+                print(f"{name}: {failures} {base_result.get(failures, 0)} -> {result[failures]}")
+                regressions.append(f"{name}: {failures}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m loadgen.bench', description='Benchmark suite of the guess game server')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite and write the results')
+    add_load_arguments(run_parser)
+    run_parser.add_argument('--suite', default=DEFAULT_SUITE, help='the scenarios (default: loadgen/suite.json)')
+    run_parser.add_argument('--only', nargs='+', default=None, metavar='NAME', help='run only these scenarios')
+    run_parser.add_argument('--spawn', action='store_true', help='start backend/server.py (local mode) for every scenario')
+    run_parser.add_argument('--engine', choices=('threaded', 'asyncio'), default='threaded', help='engine of the spawned server')
+    run_parser.add_argument('--out', required=True, help='the results file')
+
+    compare_parser = commands.add_parser('compare', help='compare results with a baseline')
+    compare_parser.add_argument('results', help='the new results')
+    compare_parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='the baseline (default: loadgen/baseline.json)')
+    compare_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed relative change')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        raise_open_file_limit()
+        results = run_suite(args)
+        with open(args.out, 'w', encoding='utf-8') as out_file:
+            json.dump(results, out_file, indent=2)
+        print(f"[*] Results written to {args.out}")
+        if any(result['server_busy'] for result in results['scenarios'].values()):
+            sys.exit(1)
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+        baseline: Dict = json.load(baseline_file)
+    with open(args.results, 'r', encoding='utf-8') as results_file:
+        current: Dict = json.load(results_file)
+    for key in ('engine', 'framed', 'platform'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Warning: {key} differs, baseline {baseline['meta'].get(key)}, now {current['meta'].get(key)}")
+
+    regressions = compare(baseline, current, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:\n  " + '\n  '.join(regressions))
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == '__main__':
+    main()
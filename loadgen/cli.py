@@ -0,0 +1,91 @@
+import argparse  # Import the argparse module for command-line argument handling
+import asyncio  # Import asyncio to run the simulated players
+import json  # Import json to write the results
+import sys  # Import sys for the exit status and the error output
+from .players import DEFAULT_MIX, LoadConfig, Mix, run_load  # Import the simulated players
+from .stats import format_report  # Import the report formatting
+
+try:
+    import resource  # Unix only, used to raise the open file limit
+except ImportError:  # pragma: no cover - e.g. Windows
+    resource = None
+
+UNLIMITED_RATES = 'auth=0,lobby=0,match=0,play=0,watch=0'  # The simulated players go as fast as the server answers
+
+
+def raise_open_file_limit():
+    """
+    Raises the soft limit of open file descriptors to the hard limit, every simulated player is a socket.
+    """
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard or hard == resource.RLIM_INFINITY:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the options of a load run, shared with the benchmark runner.
+    """
+    parser.add_argument('--mode', choices=('local', 'network'), default='network',
+                        help="'local' (Unix socket) or 'network' (TCP socket)")
+    parser.add_argument('--address', default=None, help='socket path or host:port (default: /tmp/unix_socket or 127.0.0.1:9999)')
+    parser.add_argument('--unframed', action='store_true', help='use the unframed compatibility protocol')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds to wait for an answer')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random choices')
+
+
+def report_busy(busy: int, counted: str = 'sessions') -> bool:
+    """
+    Prints an error if the server turned connections or requests away with 0x1E.
+
+    The measurements of such a run are those of the admission control, not of the request handling.
+
+    Args:
+        busy (int): The sessions which got a 0x1E.
+        counted (str): What `busy` counts, e.g. 'requests' for a replay.
+
+    Returns:
+        bool: True if there was any.
+    """
+    if not busy:
+        return False
+    print(f"[!] The server answered {busy} {counted} with 0x1E (server busy), the results are not valid. Start it "
+          f"without rate limits, e.g. --rate-limit {UNLIMITED_RATES}, and with enough --max-connections.", file=sys.stderr)
+    return True
+
+
+def default_address(mode: str) -> str:
+    return '/tmp/unix_socket' if mode == 'local' else '127.0.0.1:9999'
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m loadgen', description='Load generator for the guess game server')
+    add_load_arguments(parser)
+    parser.add_argument('--players', type=int, default=100, help='number of simulated players, they play in pairs')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of play after the ramp-up')
+    parser.add_argument('--ramp-up', type=float, default=1.0, help='seconds over which the players connect')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between actions in seconds')
+    parser.add_argument('--mix', type=Mix.parse, default=Mix.parse(DEFAULT_MIX),
+                        help=f'weights of the actions (default: {DEFAULT_MIX})')
+    parser.add_argument('--json', metavar='FILE', default=None, help='also write the results as JSON')
+    args = parser.parse_args()
+
+    config = LoadConfig(mode=args.mode, address=args.address or default_address(args.mode), players=args.players,
+                        duration=args.duration, mix=args.mix, framed=not args.unframed, ramp_up=args.ramp_up,
+                        think_time=args.think_time, timeout=args.timeout, seed=args.seed)
+    raise_open_file_limit()
+    print(f"[*] {config.players} players against {config.address} for {config.duration:g}s, mix {config.mix}")
+    result = asyncio.run(run_load(config))
+
+    print(format_report(result['operations']))
+    print(f"[*] {result['throughput']} operations/s, {result['aborted_pairs']} of {result['pairs']} pairs aborted")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump(result, json_file, indent=2)
+    if report_busy(result['server_busy']):
+        sys.exit(1)
@@ -0,0 +1,140 @@
+import argparse  # Import the argparse module for command-line argument handling
+import os  # Import the os module for the paths
+import struct  # Import struct for the frame header and the request layouts
+import sys  # Import sys to import the server modules of a backend directory
+import time  # Import time for the timings
+import tracemalloc  # Import tracemalloc to measure the memory allocated while handling a message
+from typing import Callable, Dict, List, Tuple  # Import type hints for better code readability
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(PACKAGE_DIR), 'backend')
+FRAME_HEADER = struct.Struct('>I')
+PASSWORD = b'mysecretpw'
+LOBBY_SIZE = 100  # Authorized clients, the 0x05 answer lists all of them
+DEFAULT_ITERATIONS = 20000
+
+
+def frame(message: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(message)) + message
+
+
+def load_backend(backend_dir: str):
+    """
+    Imports the server modules of a backend directory, e.g. of an older checkout to compare with.
+
+    Returns:
+        module: The server module.
+    """
+    sys.path.insert(0, backend_dir)
+    import server  # Import the server module of the given backend, the other modules follow from it
+    from log import LOG, WARNING  # Import the logger, the game records would dominate the timings
+    LOG.configure(level=WARNING)
+    return server
+
+
+def make_connection_class(server_module):
+    class NullConnection(server_module.Connection):
+        """
+        A connection which drops everything it is given, so only the server side is measured.
+        """
+        __slots__ = ('sent',)
+
+        def __init__(self):
+            super().__init__()
+            self.sent = 0
+
+        @property
+        def queued_bytes(self) -> int:
+            return 0
+
+        def enqueue(self, buffers: List[bytes]):
+            self.sent += 1
+
+        def abort(self):
+            pass
+
+        def close(self):
+            pass
+
+    return NullConnection
+
+
+def make_scenarios(server_module) -> Dict[str, Tuple[Callable[[bytes], None], bytes]]:
+    """
+    Builds a server with LOBBY_SIZE framed clients and one game between the first two.
+
+    Returns:
+        Dict[str, Tuple[Callable[[bytes], None], bytes]]: Per scenario the handle_data of the
+        sending client and the framed data it receives.
+    """
+    options = {}
+    if hasattr(server_module, 'Limits'):  # Measure the handling, not the rate limits
+        options['limits'] = server_module.Limits(rates={})
+    server = server_module.Server('/tmp/guess_game_microbench', 0, True,
+                                  timeouts=server_module.Timeouts(0, 0, 0, 0), **options)
+    connection_class = make_connection_class(server_module)
+    handlers = []
+    for _ in range(LOBBY_SIZE):
+        handler = server_module.ClientHandler(connection_class(), 'bench', server)
+        handler.handle_data(b'\x12\x01' + frame(b'\x02' + PASSWORD))
+        handlers.append(handler)
+    setter, guesser = handlers[0], handlers[1]
+    setter.handle_data(frame(b'\x07' + guesser.client_id.to_bytes(4, 'big') + b'benchmark'))
+    game_key = setter.client_id.to_bytes(4, 'big') + guesser.client_id.to_bytes(4, 'big')
+    watcher = handlers[2]
+    watcher.handle_data(frame(b'\x1B' + game_key))
+
+    return {
+        'guess 0x0B': (guesser.handle_data, frame(b'\x0Bbenchmarx')),
+        'hint 0x0E': (setter.handle_data, frame(b'\x0Ebench____')),
+        'hint 0x0E 1 KiB': (setter.handle_data, frame(b'\x0E' + b'_' * 1024)),
+        'list 0x05': (handlers[3].handle_data, frame(b'\x05')),
+        'page 0x14': (handlers[3].handle_data, frame(b'\x14\x00\x00\x00\x00\x00\x00\x32')),
+        'leave queue 0x1A': (handlers[3].handle_data, frame(b'\x1A')),
+        'pipelined x8': (handlers[4].handle_data, frame(b'\x1A') * 4 + frame(b'\x14\x01\x00\x00\x00\x00\x00\x0A') * 4),
+    }
+
+
+def measure(handle: Callable[[bytes], None], data: bytes, iterations: int) -> Tuple[float, float]:
+    """
+    Returns the mean time and the mean peak memory of handling the data once.
+
+    The peak is the memory allocated above the level before the call, i.e. the temporary objects
+    of one message (and what the message adds for good, e.g. a guess to the attempts of its game).
+    """
+    for _ in range(min(iterations, 1000)):  # Warm up, e.g. the caches of the struct formats
+        handle(data)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        handle(data)
+    elapsed = (time.perf_counter() - started) / iterations
+
+    samples = min(iterations, 2000)
+    tracemalloc.start()
+    peak = 0
+    for _ in range(samples):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        handle(data)
+        peak += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return elapsed, peak / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the request handling of the server, per message')
+    parser.add_argument('--backend', default=BACKEND_DIR, help='backend directory to measure, e.g. of an older checkout')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='messages per scenario')
+    args = parser.parse_args()
+
+    server_module = load_backend(os.path.abspath(args.backend))
+    scenarios = make_scenarios(server_module)
+    print(f"{'scenario':<20}{'us/msg':>10}{'peak B/msg':>12}")
+    for name, (handle, data) in scenarios.items():
+        elapsed, peak = measure(handle, data, args.iterations)
+        print(f"{name:<20}{elapsed * 1e6:>10.2f}{peak:>12.0f}")
+    os._exit(0)  # Don't wait for the threads of the server
+
+
+if __name__ == "__main__":
+    main()
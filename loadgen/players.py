@@ -0,0 +1,241 @@
+import asyncio  # Import asyncio to run thousands of players on one event loop
+import random  # Import random to pick the next action of a player
+import time  # Import time for the latency measurements
+from typing import Dict, List, NamedTuple, Optional  # Import type hints for better code readability
+from .protocol import (CLIENT_ID, GIVE_UP, GUESS, HINT, INCORRECT_GUESS, LIST_OPPONENTS, LOBBY_PAGE, LOBBY_PAGE_REPLY,
+                       MATCH_CONFIRM, MATCH_REQUEST, NEW_GAME, OPPONENTS_LIST, PASSWORD_SUBMIT, SUCCESS, ProtocolClient,
+                       ProtocolError, ServerBusy)
+from .stats import LatencyRecorder  # Import the recorder of the measured latencies
+
+ACTIONS = ('list', 'page', 'hint', 'guess', 'win', 'giveup')  # What a pair of players can do during a game
+DEFAULT_MIX = 'list=1,hint=2,guess=5,win=1,giveup=1'
+
+# The measured operations, named after the request opcode
+OPERATIONS = {
+    'connect': 'connect',  # Connect, welcome message and protocol selection
+    'auth': '0x02 auth',
+    'list': '0x05 list',
+    'page': '0x14 lobby page',
+    'match': '0x07 match',
+    'guess': '0x0B guess',
+    'hint': '0x0E hint',
+    'giveup': '0x11 give up',
+}
+
+_FAILURES = (ProtocolError, asyncio.TimeoutError, OSError)  # Anything that ends a session of a pair
+
+
+class Mix(NamedTuple):
+    """
+    Relative weights of the actions of a game, e.g. 'list=1,hint=2,guess=5,win=1,giveup=1'.
+
+    'list' reads the whole lobby (0x05), 'page' the first 100 idle players (0x14), 'guess' is a
+    wrong guess, 'win' the correct one and 'giveup' the 0x11 give up, the last two end the game
+    and the pair starts a new one with swapped roles.
+
+    Attributes:
+        weights (Dict[str, float]): The weight of every action.
+    """
+    weights: Dict[str, float]
+
+    @classmethod
+    def parse(cls, text: str) -> 'Mix':
+        """
+        Parses a mix, actions which are not mentioned get the weight 0.
+
+        Args:
+            text (str): e.g. 'list=1,guess=3,win=1'.
+
+        Returns:
+            Mix: The mix.
+
+        Raises:
+            ValueError: If an action is unknown, a weight is negative or no game ending action has a weight.
+        """
+        weights = dict.fromkeys(ACTIONS, 0.0)
+        for item in filter(None, text.split(',')):
+            action, _, weight = item.partition('=')
+            if action not in weights:
+                raise ValueError(f"Unknown action '{action}', expected one of {', '.join(ACTIONS)}")
+            weights[action] = float(weight or 1)
+            if weights[action] < 0:
+                raise ValueError(f"Negative weight of '{action}'")
+        if weights['win'] + weights['giveup'] <= 0:
+            raise ValueError("The mix needs 'win' or 'giveup', otherwise games never end")
+        return cls(weights)
+
+    def choose(self, rng: random.Random) -> str:
+        """
+        Picks the next action.
+        """
+        return rng.choices(ACTIONS, [self.weights[action] for action in ACTIONS])[0]
+
+    def __str__(self) -> str:
+        return ','.join(f"{action}={self.weights[action]:g}" for action in ACTIONS if self.weights[action])
+
+
+class LoadConfig(NamedTuple):
+    """
+    The parameters of one load run.
+
+    Attributes:
+        mode (str): 'local' (Unix socket) or 'network' (TCP socket).
+        address (str): The socket path, or host:port.
+        players (int): The number of simulated players, they play in fixed pairs.
+        duration (float): Seconds of play after the ramp-up.
+        mix (Mix): The weights of the actions.
+        framed (bool): Use the framed protocol.
+        ramp_up (float): Seconds over which the pairs connect.
+        think_time (float): Mean pause between the actions of a pair in seconds, 0 for none.
+        timeout (float): Seconds to wait for an answer before the session of the pair is aborted.
+        password (bytes): The server password.
+        seed (Optional[int]): Seed of the random choices, for repeatable runs.
+    """
+    mode: str = 'network'
+    address: str = '127.0.0.1:9999'
+    players: int = 100
+    duration: float = 10.0
+    mix: Mix = Mix.parse(DEFAULT_MIX)
+    framed: bool = True
+    ramp_up: float = 1.0
+    think_time: float = 0.0
+    timeout: float = 10.0
+    password: bytes = b'mysecretpw'
+    seed: Optional[int] = None
+
+
+async def exchange(recorder: LatencyRecorder, operation: str, sender: ProtocolClient, message: bytes,
+                   receiver: ProtocolClient, *expected: int) -> bytes:
+    """
+    Sends a request and measures the time until the expected message arrives.
+
+    Args:
+        recorder (LatencyRecorder): The recorder.
+        operation (str): The name of the operation.
+        sender (ProtocolClient): The player sending the request.
+        message (bytes): The request.
+        receiver (ProtocolClient): The player receiving the answer, e.g. the opponent for a hint.
+        expected (int): The accepted control bytes of the answer.
+
+    Returns:
+        bytes: The answer.
+    """
+    started = time.perf_counter()
+    sender.send(message)
+    try:
+        reply = await receiver.expect(*expected)
+    except _FAILURES:
+        recorder.error(operation)
+        raise
+    recorder.record(operation, time.perf_counter() - started)
+    return reply
+
+
+async def play_game(config: LoadConfig, recorder: LatencyRecorder, rng: random.Random, setter: ProtocolClient,
+                    guesser: ProtocolClient, stop_at: float):
+    """
+    Plays one game until it is won or given up, or the run is over.
+    """
+    loop = asyncio.get_running_loop()
+    word = f"word{rng.randrange(1000000)}"
+    await exchange(recorder, OPERATIONS['match'], setter,
+                   bytes([MATCH_REQUEST]) + guesser.client_id.to_bytes(4, 'big') + word.encode('utf-8'),
+                   setter, MATCH_CONFIRM)
+    await guesser.expect(NEW_GAME)
+
+    while loop.time() < stop_at:
+        if config.think_time:
+            await asyncio.sleep(rng.expovariate(1.0 / config.think_time))
+
+        action = config.mix.choose(rng)
+        if action == 'list':
+            await exchange(recorder, OPERATIONS['list'], setter, bytes([LIST_OPPONENTS]), setter, OPPONENTS_LIST)
+        elif action == 'page':
+            await exchange(recorder, OPERATIONS['page'], setter, bytes([LOBBY_PAGE, 0x01, 0, 0, 0, 0, 0, 100]), setter,
+                           LOBBY_PAGE_REPLY)
+        elif action == 'hint':
+            hint = word[:rng.randrange(1, len(word))] + '_'
+            await exchange(recorder, OPERATIONS['hint'], setter, bytes([HINT]) + hint.encode('utf-8'), guesser, HINT)
+        elif action == 'guess':
+            await exchange(recorder, OPERATIONS['guess'], guesser, bytes([GUESS]) + b'wrong', guesser, INCORRECT_GUESS)
+            await setter.expect(INCORRECT_GUESS)
+        else:  # 'win' or 'giveup', both players are informed with 0x0C
+            request = bytes([GUESS]) + word.encode('utf-8') if action == 'win' else bytes([GIVE_UP])
+            await exchange(recorder, OPERATIONS['guess' if action == 'win' else 'giveup'], guesser, request, guesser, SUCCESS)
+            await setter.expect(SUCCESS)
+            return
+
+
+async def play_pair(config: LoadConfig, recorder: LatencyRecorder, rng: random.Random, start_delay: float,
+                    stop_at: float) -> bool:
+    """
+    Connects and authorizes two players and lets them play games against each other until the run is over.
+
+    Returns:
+        bool: False if the session was aborted by an unexpected answer, a timeout or a lost connection.
+    """
+    await asyncio.sleep(start_delay)
+    players: List[ProtocolClient] = []
+    try:
+        for _ in range(2):
+            started = time.perf_counter()
+            try:
+                player = await ProtocolClient.connect(config.mode, config.address, config.framed, config.timeout)
+            except _FAILURES:
+                recorder.error(OPERATIONS['connect'])
+                raise
+            recorder.record(OPERATIONS['connect'], time.perf_counter() - started)
+            players.append(player)
+            reply = await exchange(recorder, OPERATIONS['auth'], player, bytes([PASSWORD_SUBMIT]) + config.password,
+                                   player, CLIENT_ID)
+            player.client_id = int.from_bytes(reply[1:5], 'big')
+
+        setter, guesser = players
+        while asyncio.get_running_loop().time() < stop_at:
+            await play_game(config, recorder, rng, setter, guesser, stop_at)
+            setter, guesser = guesser, setter
+        return True
+    except ServerBusy:
+        recorder.busy += 1
+        return False
+    except _FAILURES:
+        return False
+    finally:
+        for player in players:
+            await player.close()
+
+
+async def run_load(config: LoadConfig) -> dict:
+    """
+    Runs the simulated players against the server and summarizes the measurements.
+
+    Args:
+        config (LoadConfig): The parameters of the run.
+
+    Returns:
+        dict: e.g. {'elapsed': 11.0, 'pairs': 50, 'aborted_pairs': 0, 'server_busy': 0, 'throughput': 9000.0,
+        'operations': {'0x05 list': {...}, ...}}, see `LatencyRecorder.summary`. 'server_busy' counts
+        the pairs aborted because the server answered with 0x1E.
+    """
+    loop = asyncio.get_running_loop()
+    recorder = LatencyRecorder()
+    rng = random.Random(config.seed)
+    pairs = max(1, config.players // 2)
+
+    started = loop.time()
+    stop_at = started + config.ramp_up + config.duration
+    completed = await asyncio.gather(*(
+        play_pair(config, recorder, random.Random(rng.random()), config.ramp_up * index / pairs, stop_at)
+        for index in range(pairs)
+    ))
+    elapsed = loop.time() - started
+
+    operations = recorder.summary(elapsed)
+    return {
+        'elapsed': round(elapsed, 3),
+        'pairs': pairs,
+        'aborted_pairs': completed.count(False),
+        'server_busy': recorder.busy,
+        'throughput': round(sum(result['count'] for result in operations.values()) / elapsed, 1),
+        'operations': operations,
+    }
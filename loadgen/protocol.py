@@ -0,0 +1,181 @@
+import asyncio  # Import asyncio for the non-blocking client connections
+import struct  # Import struct for the frame header
+from typing import Optional  # Import type hints for better code readability
+
+# Control bytes of the binary protocol, see binary_protocol.md (same names as frontend/src/constants.ts)
+WELCOME = 0x01
+PASSWORD_SUBMIT = 0x02
+CLIENT_ID = 0x03
+WRONG_PASSWORD = 0x04
+LIST_OPPONENTS = 0x05
+OPPONENTS_LIST = 0x06
+MATCH_REQUEST = 0x07
+MATCH_CONFIRM = 0x08
+OPPONENT_UNAVAILABLE = 0x09
+NEW_GAME = 0x0A
+GUESS = 0x0B
+SUCCESS = 0x0C
+INCORRECT_GUESS = 0x0D
+HINT = 0x0E
+INFO = 0x0F
+ERROR = 0x10
+GIVE_UP = 0x11
+SELECT_VERSION = 0x12
+VERSION = 0x13
+LOBBY_PAGE = 0x14
+LOBBY_PAGE_REPLY = 0x15
+FOLLOW_LOBBY = 0x16
+PRESENCE = 0x17
+SERVER_BUSY = 0x1E
+
+BUSY_REASONS = {0x01: 'too many connections', 0x02: 'too many players', 0x03: 'rate limited'}  # Reasons of a 0x1E
+
+FRAME_HEADER = struct.Struct('>I')  # Length prefix of the framed protocol
+PROTOCOL_VERSION_FRAMED = 1
+RECV_BUFFER_SIZE = 65536
+
+
+class ProtocolError(Exception):
+    """
+    Raised when the server answers with something the player did not expect.
+    """
+
+
+class ServerBusy(ProtocolError):
+    """
+    Raised when the server turns the connection or a request away with 0x1E, the load is beyond its admission limits.
+
+    Attributes:
+        reason (int): The reason of the 0x1E message, see BUSY_REASONS.
+    """
+
+    def __init__(self, message: bytes):
+        self.reason = message[1] if len(message) > 1 else 0
+        super().__init__(f"The server is busy: {BUSY_REASONS.get(self.reason, 'unknown reason')}")
+
+
+class ProtocolClient:
+    """
+    One simulated player connection speaking the binary protocol.
+
+    In the framed mode (the default) every message is length-prefixed, so messages are never
+    merged or split. The unframed mode treats every read as one message, exactly like the
+    interactive client, which only holds as long as the player waits for each answer.
+
+    Attributes:
+        framed (bool): Whether the framed protocol was selected.
+        client_id (Optional[int]): The ID assigned by the server after authorization.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float):
+        """
+        Initializes a new ProtocolClient over an open connection, use `connect` instead.
+
+        Args:
+            reader (asyncio.StreamReader): The reading side of the connection.
+            writer (asyncio.StreamWriter): The writing side of the connection.
+            timeout (float): Seconds to wait for a message before giving up.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.framed = False
+        self.client_id: Optional[int] = None
+
+    @classmethod
+    async def connect(cls, mode: str, address: str, framed: bool = True, timeout: float = 10.0) -> 'ProtocolClient':
+        """
+        Connects to the server, reads the welcome message and selects the protocol version.
+
+        Args:
+            mode (str): 'local' (Unix socket) or 'network' (TCP socket).
+            address (str): The socket path, or host:port.
+            framed (bool): Select the framed protocol.
+            timeout (float): Seconds to wait for a message before giving up.
+
+        Returns:
+            ProtocolClient: The connected client.
+        """
+        if mode == 'local':
+            reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(address), timeout)
+        else:
+            host, port = address.rsplit(':', 1)
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+
+        client = cls(reader, writer, timeout)
+        await client.expect(WELCOME)
+        if framed:
+            client.send(bytes([SELECT_VERSION, PROTOCOL_VERSION_FRAMED]))
+            client.framed = True  # The 0x13 answer is already framed
+            reply = await client.expect(VERSION)
+            if reply[1:2] != bytes([PROTOCOL_VERSION_FRAMED]):
+                raise ProtocolError("The server does not support the framed protocol")
+        return client
+
+    def send(self, message: bytes):
+        """
+        Queues one message (control byte + data), framed if the framed protocol is selected.
+
+        Args:
+            message (bytes): The message.
+        """
+        if self.framed:
+            self.writer.write(FRAME_HEADER.pack(len(message)) + message)
+        else:
+            self.writer.write(message)
+
+    async def receive(self) -> bytes:
+        """
+        Waits for the next message.
+
+        Returns:
+            bytes: The message, control byte first.
+
+        Raises:
+            ProtocolError: If the server closed the connection.
+            ServerBusy: If the server turned the connection or the request away.
+            asyncio.TimeoutError: If no message arrived within the timeout.
+        """
+        try:
+            if self.framed:
+                header = await asyncio.wait_for(self.reader.readexactly(FRAME_HEADER.size), self.timeout)
+                (length,) = FRAME_HEADER.unpack(header)
+                message = await asyncio.wait_for(self.reader.readexactly(length), self.timeout)
+            else:
+                message = await asyncio.wait_for(self.reader.read(RECV_BUFFER_SIZE), self.timeout)
+        except asyncio.IncompleteReadError:
+            message = b''
+        if not message:
+            raise ProtocolError("The server closed the connection")
+        if message[0] == SERVER_BUSY:
+            raise ServerBusy(message)
+        return message
+
+    async def expect(self, *control_bytes: int) -> bytes:
+        """
+        Waits for the next message and checks its control byte.
+
+        Args:
+            control_bytes (int): The accepted control bytes.
+
+        Returns:
+            bytes: The message.
+
+        Raises:
+            ProtocolError: If the message has another control byte.
+        """
+        message = await self.receive()
+        if message[0] not in control_bytes:
+            raise ProtocolError(f"Expected {', '.join(hex(byte) for byte in control_bytes)}, got {message[:40]!r}")
+        return message
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
@@ -0,0 +1,383 @@
+import argparse  # Import the argparse module for command-line argument handling
+import asyncio  # Import asyncio to replay all connections on one event loop
+import datetime  # Import datetime for the date of the results
+import json  # Import json to write and read the results
+import os  # Import the os module for the paths
+import platform  # Import platform to describe the machine of the results
+import struct  # Import struct for the player IDs within the requests
+import sys  # Import sys to import the capture reader of the backend and for the exit code
+import time  # Import time for the latency measurements
+from typing import Dict, List, Optional, Set  # Import type hints for better code readability
+from .bench import DEFAULT_TOLERANCE, compare, git_commit  # Import the comparison with earlier results
+from .cli import default_address, raise_open_file_limit, report_busy  # Import the shared socket helpers
+from .protocol import (CLIENT_ID, FRAME_HEADER, PROTOCOL_VERSION_FRAMED, RECV_BUFFER_SIZE, SELECT_VERSION,
+                       SERVER_BUSY)
+from .stats import LatencyRecorder, format_report  # Import the recorder of the measured latencies
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(PACKAGE_DIR), 'backend')
+PLAYER_ID = struct.Struct('>I')
+WELCOME_MESSAGE = b'\x01Welcome to the server!'  # Sent unframed on every connection before anything else
+MAPPING_TIMEOUT = 5.0  # Seconds a request waits for the player ID of another connection
+DRAIN_WAIT = 1.0  # Seconds the last answers may take after the last record
+MAX_BUFFERED = 1 << 20  # Bytes written to a connection before the replay waits for the socket
+
+# Where the requests carry player IDs, they are mapped from the captured to the replayed IDs
+ID_OFFSETS = {
+    0x07: (1,),  # Opponent
+    0x14: (2,),  # Cursor of the lobby page
+    0x1B: (1, 5),  # Setter, guesser
+    0x1D: (1, 5),
+    0x1F: (1,),  # Player of the statistics
+}
+NO_ANSWER = (0x16,)  # Requests the server doesn't answer, they aren't timed
+
+OPERATION_NAMES = {
+    0x02: 'auth', 0x05: 'list', 0x07: 'match', 0x0B: 'guess', 0x0E: 'hint', 0x11: 'give up', 0x12: 'version',
+    0x14: 'lobby page', 0x18: 'join queue', 0x1A: 'leave queue', 0x1B: 'watch', 0x1D: 'unwatch', 0x1F: 'stats',
+    0x21: 'leaderboard',
+}
+
+
+def load_capture_module(backend_dir: str = BACKEND_DIR):
+    """
+    Imports the capture reader of the backend, the format is defined there.
+    """
+    sys.path.insert(0, backend_dir)
+    import capture  # Import the capture module of the backend
+    return capture
+
+
+def operation(opcode: int) -> str:
+    """
+    Returns the name of a measured operation, e.g. '0x0B guess'.
+    """
+    return f"0x{opcode:02X} {OPERATION_NAMES.get(opcode, '')}".rstrip()
+
+
+class PlayerIds:
+    """
+    Maps the player IDs of the capture to those the server hands out in the replay.
+
+    A mapping is known once the connection got its 0x03 answer and its PLAYER record was read.
+    A request naming a captured player whose mapping is still missing waits for it, so the
+    replay stays the same however fast it runs. IDs of players outside the capture are left as they are.
+    """
+
+    def __init__(self):
+        self.known: Dict[int, int] = {}  # Captured ID -> replayed ID
+        self._waiting: Dict[int, asyncio.Future] = {}  # Captured ID -> future of the replayed ID
+        self.captured: Set[int] = set()  # IDs of PLAYER records
+
+    def add(self, captured_id: int, replayed_id: int):
+        self.known[captured_id] = replayed_id
+        future = self._waiting.pop(captured_id, None)
+        if future is not None and not future.done():
+            future.set_result(replayed_id)
+
+    async def get(self, captured_id: int) -> int:
+        replayed_id = self.known.get(captured_id)
+        if replayed_id is not None or captured_id not in self.captured:
+            return captured_id if replayed_id is None else replayed_id
+        future = self._waiting.get(captured_id)
+        if future is None:
+            future = self._waiting[captured_id] = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), MAPPING_TIMEOUT)
+        except asyncio.TimeoutError:
+            return captured_id
+
+
+class ReplayedConnection:
+    """
+    One captured connection, replayed: its reads are sent again, with the player IDs mapped.
+
+    The captured reads are split into messages like the server does: unframed, every read is a
+    message; after the selection of the framed protocol, complete frames are sent and the rest of
+    a read waits for the next one. Mapping an ID keeps the length, so the frames stay as they are.
+
+    Attributes:
+        captured_id (Optional[int]): The player ID of the connection in the capture.
+        client_id (Optional[int]): The player ID in the replay.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, ids: PlayerIds,
+                 recorder: LatencyRecorder):
+        self.reader = reader
+        self.writer = writer
+        self.ids = ids
+        self.recorder = recorder
+        self.captured_id: Optional[int] = None
+        self.client_id: Optional[int] = None
+        self.framed = False
+        self.sent = 0  # Messages sent
+        self._pending = b''  # The incomplete frame of the last read
+        self._timed: Optional[tuple] = None  # (operation, time sent) of the request waiting for an answer
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    def authorized(self, captured_id: int):
+        """
+        Handles the PLAYER record of the connection.
+        """
+        self.captured_id = captured_id
+        self.ids.captured.add(captured_id)
+        if self.client_id is not None:
+            self.ids.add(captured_id, self.client_id)
+
+    async def replay(self, data: bytes):
+        """
+        Sends a captured read again.
+        """
+        messages: List[bytearray] = []
+        if self.framed:
+            data = self._pending + data
+            offset = 0
+            while offset + FRAME_HEADER.size <= len(data):
+                (length,) = FRAME_HEADER.unpack_from(data, offset)
+                if offset + FRAME_HEADER.size + length > len(data):
+                    break
+                messages.append(bytearray(data[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + length]))
+                offset += FRAME_HEADER.size + length
+            self._pending = data[offset:]
+        elif data[:1] == bytes([SELECT_VERSION]):
+            self.framed = data[1:2] == bytes([PROTOCOL_VERSION_FRAMED])
+            self._send(data[:2], SELECT_VERSION, 1)
+            if len(data) > 2:
+                await self.replay(data[2:])
+            return
+        else:
+            messages.append(bytearray(data))
+        if not messages:
+            return
+
+        for message in messages:
+            if not message:
+                continue
+            for offset in ID_OFFSETS.get(message[0], ()):
+                if len(message) >= offset + PLAYER_ID.size:
+                    PLAYER_ID.pack_into(message, offset, await self.ids.get(PLAYER_ID.unpack_from(message, offset)[0]))
+        if self.framed:
+            payload = b''.join(FRAME_HEADER.pack(len(message)) + message for message in messages)
+        else:
+            payload = bytes(messages[0])
+        self._send(payload, messages[0][0] if messages[0] else None, len(messages))
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            await self.writer.drain()
+
+    def _send(self, payload: bytes, opcode: Optional[int], count: int):
+        if self.writer.is_closing():
+            return
+        self.writer.write(payload)
+        self.sent += count
+        if opcode is not None and opcode not in NO_ANSWER and self._timed is None:
+            self._timed = (operation(opcode), time.perf_counter())
+
+    async def _receive(self):
+        """
+        Reads the answers, times the first one after a request and picks up the player ID.
+
+        A request answered with 0x1E (server busy) is counted as an error, not timed, so is a
+        connection the server turned away with 0x1E instead of the welcome message.
+        """
+        buffered = b''
+        welcomed = False
+        try:
+            while True:
+                data = await self.reader.read(RECV_BUFFER_SIZE)
+                if not data:
+                    break
+                received = time.perf_counter()
+                buffered += data
+                if not welcomed:  # The welcome message is never framed
+                    if buffered[:1] == bytes([SERVER_BUSY]):
+                        self.recorder.busy += 1
+                        break
+                    if len(buffered) < len(WELCOME_MESSAGE):
+                        continue
+                    buffered = buffered[len(WELCOME_MESSAGE):]
+                    welcomed = True
+                messages = []
+                if self.framed:
+                    while len(buffered) >= FRAME_HEADER.size:
+                        (length,) = FRAME_HEADER.unpack_from(buffered)
+                        if len(buffered) < FRAME_HEADER.size + length:
+                            break
+                        messages.append(buffered[FRAME_HEADER.size:FRAME_HEADER.size + length])
+                        buffered = buffered[FRAME_HEADER.size + length:]
+                elif buffered:
+                    messages.append(buffered)
+                    buffered = b''
+                if self._timed is not None and messages:
+                    name, sent = self._timed
+                    self._timed = None
+                    if messages[0][:1] == bytes([SERVER_BUSY]):
+                        self.recorder.busy += 1
+                        self.recorder.error(name)
+                    else:
+                        self.recorder.record(name, received - sent)
+                if self.client_id is not None:
+                    continue
+                for message in messages:
+                    if message[:1] == bytes([CLIENT_ID]) and len(message) >= 1 + PLAYER_ID.size:
+                        self.client_id = PLAYER_ID.unpack_from(message, 1)[0]
+                        if self.captured_id is not None:
+                            self.ids.add(self.captured_id, self.client_id)
+        except (ConnectionError, OSError):
+            pass
+        if self._timed is not None:
+            self.recorder.error(self._timed[0])  # Closed without an answer
+            self._timed = None
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+        await self._receiver
+
+
+async def connect(mode: str, address: str, timeout: float):
+    if mode == 'local':
+        return await asyncio.wait_for(asyncio.open_unix_connection(address), timeout)
+    host, port = address.rsplit(':', 1)
+    return await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+
+
+async def run_replay(path: str, mode: str, address: str, speed: float, timeout: float) -> dict:
+    """
+    Replays a capture against a server.
+
+    The records are replayed in the order they were captured, at their captured times divided by
+    `speed`, or as fast as possible with a speed of 0. The time from a request to the first message
+    read after it is recorded per opcode, a 0x1E answer counts as an error of the request.
+
+    Args:
+        path (str): The capture file.
+        mode (str): 'local' (Unix socket) or 'network' (TCP socket).
+        address (str): The socket path, or host:port.
+        speed (float): 1 for the captured pace, 2 for twice as fast, 0 for as fast as possible.
+        timeout (float): Seconds to wait for a connection.
+
+    Returns:
+        dict: {'operations': per opcode, see `LatencyRecorder.summary`, 'throughput': requests per
+        second, 'elapsed': seconds, 'captured_duration': seconds, 'connections': ..., 'failed_connections': ...,
+        'server_busy': connections and requests answered with 0x1E}.
+    """
+    capture = load_capture_module()
+    _, records = capture.read_capture(path)
+    recorder = LatencyRecorder()
+    ids = PlayerIds()
+    connections: Dict[int, ReplayedConnection] = {}
+    finished: List[ReplayedConnection] = []
+    opened = failed = 0
+    captured_duration = 0.0
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for record in records:
+        captured_duration = record.offset
+        if speed:
+            delay = started + record.offset / speed - loop.time()
+            await asyncio.sleep(max(0.0, delay))
+        else:
+            await asyncio.sleep(0)  # Let the answers be read, or every latency includes the whole replay
+        if record.kind == capture.OPEN:
+            opened += 1
+            try:
+                reader, writer = await connect(mode, address, timeout)
+            except (OSError, asyncio.TimeoutError):
+                failed += 1
+                recorder.error('connect')
+                continue
+            connections[record.connection] = ReplayedConnection(reader, writer, ids, recorder)
+            continue
+        connection = connections.get(record.connection)
+        if connection is None:  # Opened before the capture started, or the connect failed
+            continue
+        if record.kind == capture.DATA:
+            await connection.replay(record.data)
+        elif record.kind == capture.PLAYER:
+            connection.authorized(PLAYER_ID.unpack(record.data)[0])
+        elif record.kind == capture.CLOSE:
+            finished.append(connections.pop(record.connection))
+            await finished[-1].close()
+
+    sent_until = loop.time()
+    await asyncio.sleep(DRAIN_WAIT)  # The answers to the last requests
+    for connection in connections.values():
+        await connection.close()
+    elapsed = sent_until - started
+    requests = sum(connection.sent for connection in finished + list(connections.values()))
+    return {
+        'operations': recorder.summary(elapsed),
+        'throughput': round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+        'requests': requests,
+        'elapsed': round(elapsed, 3),
+        'captured_duration': round(captured_duration, 3),
+        'connections': opened,
+        'failed_connections': failed,
+        'server_busy': recorder.busy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m loadgen.replay',
+                                     description='Replays a traffic capture (server.py --capture) against a server')
+    parser.add_argument('capture', help='the capture file')
+    parser.add_argument('--mode', choices=('local', 'network'), default='network',
+                        help="'local' (Unix socket) or 'network' (TCP socket)")
+    parser.add_argument('--address', default=None, help='socket path or host:port (default: /tmp/unix_socket or 127.0.0.1:9999)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds to wait for a connection')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='1 replays at the captured pace, 2 twice as fast, 0 as fast as possible (default: 1)')
+    parser.add_argument('--json', metavar='FILE', default=None, help='also write the results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', default=None,
+                        help='compare with the results of an earlier replay of the same capture, exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed relative change')
+    args = parser.parse_args()
+    if args.speed < 0:
+        parser.error('--speed must not be negative')
+
+    address = args.address or default_address(args.mode)
+    raise_open_file_limit()
+    pace = 'as fast as possible' if not args.speed else f'at {args.speed:g}x the captured pace'
+    print(f"[*] Replaying {args.capture} against {address} {pace}")
+    result = asyncio.run(run_replay(args.capture, args.mode, address, args.speed, args.timeout))
+
+    print(format_report(result['operations']))
+    print(f"[*] {result['requests']} requests in {result['elapsed']}s (captured {result['captured_duration']}s), "
+          f"{result['throughput']} requests/s, {result['failed_connections']} of {result['connections']} connections failed")
+    busy = report_busy(result['server_busy'], 'connections and requests')
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'capture': os.path.basename(args.capture),
+            'speed': args.speed,
+        },
+        'scenarios': {'replay': result},
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        for key in ('capture', 'speed'):
+            if baseline['meta'].get(key) != results['meta'].get(key):
+                print(f"Warning: {key} differs, baseline {baseline['meta'].get(key)}, now {results['meta'].get(key)}")
+        print()
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:\n  " + '\n  '.join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+    if busy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import math  # Import math for the nearest-rank percentiles
+from array import array  # Import array to keep the samples compact
+from typing import Dict, List  # Import type hints for better code readability
+
+PERCENTILES = (('p50', 50.0), ('p99', 99.0), ('p999', 99.9))  # Reported latency percentiles
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """
+    Returns the nearest-rank percentile of sorted samples.
+
+    Args:
+        sorted_samples (List[float]): The samples in ascending order, at least one.
+        q (float): The percentile, e.g. 99.9.
+
+    Returns:
+        float: The sample at the percentile.
+    """
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class LatencyRecorder:
+    """
+    Collects the latencies and errors of the operations of all simulated players.
+
+    Every sample is kept (8 bytes each), so the percentiles are exact rather than estimated from
+    buckets. All players run on one event loop, so no locking is needed.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty recorder.
+        """
+        self.samples: Dict[str, array] = {}
+        self.errors: Dict[str, int] = {}
+        self.busy = 0  # Connections and requests the server turned away with 0x1E
+
+    def record(self, operation: str, seconds: float):
+        """
+        Records the latency of one completed operation.
+
+        Args:
+            operation (str): The operation, e.g. '0x0B guess'.
+            seconds (float): The time from sending the request to receiving the answer.
+        """
+        samples = self.samples.get(operation)
+        if samples is None:
+            samples = self.samples[operation] = array('d')
+        samples.append(seconds)
+
+    def error(self, operation: str):
+        """
+        Counts a failed operation (unexpected answer, timeout or lost connection).
+
+        Args:
+            operation (str): The operation.
+        """
+        self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        """
+        Summarizes the recorded operations.
+
+        Args:
+            elapsed (float): The duration of the measurement in seconds.
+
+        Returns:
+            Dict[str, dict]: Per operation, e.g. {'0x05 list': {'count': 1200, 'errors': 0,
+            'throughput': 240.0, 'p50_ms': 0.41, 'p99_ms': 2.3, 'p999_ms': 5.1, 'max_ms': 7.0}}.
+        """
+        summary = {}
+        for operation in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples.get(operation, ()))
+            result = {
+                'count': len(samples),
+                'errors': self.errors.get(operation, 0),
+                'throughput': round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+            for name, q in PERCENTILES:
+                result[name + '_ms'] = round(percentile(samples, q) * 1000, 3) if samples else None
+            result['max_ms'] = round(samples[-1] * 1000, 3) if samples else None
+            summary[operation] = result
+        return summary
+
+
+def format_report(summary: Dict[str, dict]) -> str:
+    """
+    Formats a summary as a text table.
+
+    Args:
+        summary (Dict[str, dict]): The result of `LatencyRecorder.summary`.
+
+    Returns:
+        str: The table.
+    """
+    columns = ('count', 'errors', 'throughput', 'p50_ms', 'p99_ms', 'p999_ms', 'max_ms')
+    lines = [f"{'operation':<18}" + ''.join(f"{column:>12}" for column in columns)]
+    for operation, result in summary.items():
+        cells = ('-' if result[column] is None else result[column] for column in columns)
+        lines.append(f"{operation:<18}" + ''.join(f"{cell:>12}" for cell in cells))
+    return '\n'.join(lines)